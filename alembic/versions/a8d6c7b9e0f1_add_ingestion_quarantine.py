@@ -0,0 +1,43 @@
+"""Add ingestion quarantine
+
+Revision ID: a8d6c7b9e0f1
+Revises: f7c5b6a8d9e0
+Create Date: 2026-10-16 15:41:27.093518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8d6c7b9e0f1'
+down_revision: Union[str, Sequence[str], None] = 'f7c5b6a8d9e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ingestion_quarantine',
+    sa.Column('quarantine_id', sa.String(), nullable=False),
+    sa.Column('job_id', sa.String(), nullable=False),
+    sa.Column('company_id', sa.String(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('line_number', sa.Integer(), nullable=True),
+    sa.Column('row_number', sa.Integer(), nullable=True),
+    sa.Column('raw_text', sa.Text(), nullable=True),
+    sa.Column('reason', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['company_id'], ['entities.company_id'], ),
+    sa.ForeignKeyConstraint(['job_id'], ['ingestion_jobs.job_id'], ),
+    sa.PrimaryKeyConstraint('quarantine_id')
+    )
+    op.create_index('idx_quarantine_job', 'ingestion_quarantine', ['job_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_quarantine_job', table_name='ingestion_quarantine')
+    op.drop_table('ingestion_quarantine')
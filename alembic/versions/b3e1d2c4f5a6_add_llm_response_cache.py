@@ -0,0 +1,46 @@
+"""Add LLM response cache
+
+Revision ID: b3e1d2c4f5a6
+Revises: 7fae4977ee93
+Create Date: 2026-10-16 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e1d2c4f5a6'
+down_revision: Union[str, Sequence[str], None] = '7fae4977ee93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('llm_response_cache',
+    sa.Column('cache_key', sa.String(), nullable=False),
+    sa.Column('company_id', sa.String(), nullable=True),
+    sa.Column('model_name', sa.String(), nullable=False),
+    sa.Column('temperature', sa.Numeric(precision=3, scale=2), nullable=True),
+    sa.Column('response_text', sa.Text(), nullable=False),
+    sa.Column('hit_count', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('last_accessed_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['company_id'], ['entities.company_id'], ),
+    sa.PrimaryKeyConstraint('cache_key')
+    )
+    op.create_index('idx_llm_cache_company', 'llm_response_cache', ['company_id'], unique=False)
+    op.create_index('idx_llm_cache_last_access', 'llm_response_cache', ['last_accessed_at'], unique=False)
+    op.create_index('idx_llm_cache_expires', 'llm_response_cache', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_llm_cache_expires', table_name='llm_response_cache')
+    op.drop_index('idx_llm_cache_last_access', table_name='llm_response_cache')
+    op.drop_index('idx_llm_cache_company', table_name='llm_response_cache')
+    op.drop_table('llm_response_cache')
@@ -0,0 +1,33 @@
+"""Add ingestion job bank_id to the duplicate-upload lookup
+
+Revision ID: b9e7d8c0f1a2
+Revises: a8d6c7b9e0f1
+Create Date: 2026-10-16 18:12:40.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9e7d8c0f1a2'
+down_revision: Union[str, Sequence[str], None] = 'a8d6c7b9e0f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ingestion_jobs', sa.Column('bank_id', sa.String(), nullable=True))
+    op.drop_index('idx_job_company_file_hash', table_name='ingestion_jobs')
+    op.create_index('idx_job_company_file_hash', 'ingestion_jobs',
+                    ['company_id', 'file_hash', 'target', 'bank_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_job_company_file_hash', table_name='ingestion_jobs')
+    op.create_index('idx_job_company_file_hash', 'ingestion_jobs', ['company_id', 'file_hash'], unique=False)
+    op.drop_column('ingestion_jobs', 'bank_id')
@@ -0,0 +1,28 @@
+"""Add reconciliation job heartbeat
+
+Revision ID: c0f8e9d1a2b3
+Revises: b9e7d8c0f1a2
+Create Date: 2026-10-16 19:05:12.604417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c0f8e9d1a2b3'
+down_revision: Union[str, Sequence[str], None] = 'b9e7d8c0f1a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('reconciliation_jobs', sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('reconciliation_jobs', 'heartbeat_at')
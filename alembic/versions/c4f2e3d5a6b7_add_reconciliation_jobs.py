@@ -0,0 +1,51 @@
+"""Add reconciliation jobs
+
+Revision ID: c4f2e3d5a6b7
+Revises: b3e1d2c4f5a6
+Create Date: 2026-10-16 10:03:11.402517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f2e3d5a6b7'
+down_revision: Union[str, Sequence[str], None] = 'b3e1d2c4f5a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('reconciliation_jobs',
+    sa.Column('job_id', sa.String(), nullable=False),
+    sa.Column('company_id', sa.String(), nullable=False),
+    sa.Column('firm_id', sa.String(), nullable=True),
+    sa.Column('requested_by', sa.String(), nullable=True),
+    sa.Column('job_type', sa.String(), nullable=False),
+    sa.Column('parameters', sa.JSON(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('progress_total', sa.Integer(), nullable=True),
+    sa.Column('progress_done', sa.Integer(), nullable=True),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('error_details', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('start_time', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('end_time', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('processing_duration', sa.Numeric(precision=10, scale=3), nullable=True),
+    sa.ForeignKeyConstraint(['company_id'], ['entities.company_id'], ),
+    sa.ForeignKeyConstraint(['firm_id'], ['ca_firms.firm_id'], ),
+    sa.PrimaryKeyConstraint('job_id')
+    )
+    op.create_index('idx_recon_job_company_status', 'reconciliation_jobs', ['company_id', 'status'], unique=False)
+    op.create_index('idx_recon_job_created', 'reconciliation_jobs', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_recon_job_created', table_name='reconciliation_jobs')
+    op.drop_index('idx_recon_job_company_status', table_name='reconciliation_jobs')
+    op.drop_table('reconciliation_jobs')
@@ -0,0 +1,54 @@
+"""Scope statement templates to a firm
+
+Revision ID: d1a9f0e2b3c4
+Revises: c0f8e9d1a2b3
+Create Date: 2026-10-16 20:11:37.218904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1a9f0e2b3c4'
+down_revision: Union[str, Sequence[str], None] = 'c0f8e9d1a2b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('statement_templates', sa.Column('firm_id', sa.String(), nullable=True))
+    # Existing templates go to the firm whose ingest taught them; any that
+    # cannot be traced are dropped and relearned on the next upload
+    op.execute(
+        "UPDATE statement_templates SET firm_id = ("
+        "SELECT entities.firm_id FROM ingestion_jobs "
+        "JOIN entities ON entities.company_id = ingestion_jobs.company_id "
+        "WHERE ingestion_jobs.job_id = statement_templates.learned_from_job_id)"
+    )
+    op.execute("DELETE FROM statement_templates WHERE firm_id IS NULL")
+    op.drop_index('idx_template_target_fingerprint', table_name='statement_templates')
+    with op.batch_alter_table('statement_templates') as batch_op:
+        batch_op.alter_column('firm_id', existing_type=sa.String(), nullable=False)
+        batch_op.create_foreign_key('fk_template_firm', 'ca_firms', ['firm_id'], ['firm_id'])
+    op.create_index('idx_template_firm_target_fingerprint', 'statement_templates',
+                    ['firm_id', 'target', 'header_fingerprint'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_template_firm_target_fingerprint', table_name='statement_templates')
+    # Keep one template per layout (the most used) before the index goes back to being global
+    op.execute(
+        "DELETE FROM statement_templates WHERE template_id NOT IN ("
+        "SELECT template_id FROM (SELECT template_id, ROW_NUMBER() OVER ("
+        "PARTITION BY target, header_fingerprint ORDER BY use_count DESC, created_at) AS rank "
+        "FROM statement_templates) ranked WHERE rank = 1)"
+    )
+    with op.batch_alter_table('statement_templates') as batch_op:
+        batch_op.drop_constraint('fk_template_firm', type_='foreignkey')
+        batch_op.drop_column('firm_id')
+    op.create_index('idx_template_target_fingerprint', 'statement_templates', ['target', 'header_fingerprint'], unique=True)
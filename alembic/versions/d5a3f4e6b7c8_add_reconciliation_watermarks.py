@@ -0,0 +1,44 @@
+"""Add reconciliation watermarks
+
+Revision ID: d5a3f4e6b7c8
+Revises: c4f2e3d5a6b7
+Create Date: 2026-10-16 11:24:47.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a3f4e6b7c8'
+down_revision: Union[str, Sequence[str], None] = 'c4f2e3d5a6b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('reconciliation_watermarks',
+    sa.Column('watermark_id', sa.String(), nullable=False),
+    sa.Column('company_id', sa.String(), nullable=False),
+    sa.Column('recon_type', sa.String(), nullable=False),
+    sa.Column('watermark_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('last_job_id', sa.String(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['company_id'], ['entities.company_id'], ),
+    sa.ForeignKeyConstraint(['last_job_id'], ['reconciliation_jobs.job_id'], ),
+    sa.PrimaryKeyConstraint('watermark_id')
+    )
+    op.create_index('idx_recon_watermark_company_type', 'reconciliation_watermarks', ['company_id', 'recon_type'], unique=True)
+    op.create_index('idx_voucher_company_recon_status', 'vouchers', ['company_id', 'reconciliation_status'], unique=False)
+    op.create_index('idx_bank_linked_voucher', 'bank_statements', ['linked_voucher_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_bank_linked_voucher', table_name='bank_statements')
+    op.drop_index('idx_voucher_company_recon_status', table_name='vouchers')
+    op.drop_index('idx_recon_watermark_company_type', table_name='reconciliation_watermarks')
+    op.drop_table('reconciliation_watermarks')
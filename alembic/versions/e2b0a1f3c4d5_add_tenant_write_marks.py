@@ -0,0 +1,32 @@
+"""Add tenant write marks
+
+Revision ID: e2b0a1f3c4d5
+Revises: d1a9f0e2b3c4
+Create Date: 2026-10-16 21:04:52.731206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b0a1f3c4d5'
+down_revision: Union[str, Sequence[str], None] = 'd1a9f0e2b3c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('tenant_write_marks',
+    sa.Column('tenant_key', sa.String(), nullable=False),
+    sa.Column('written_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('tenant_key')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('tenant_write_marks')
@@ -0,0 +1,32 @@
+"""Add ingestion job target and result
+
+Revision ID: e6b4a5f7c8d9
+Revises: d5a3f4e6b7c8
+Create Date: 2026-10-16 13:02:19.540871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b4a5f7c8d9'
+down_revision: Union[str, Sequence[str], None] = 'd5a3f4e6b7c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ingestion_jobs', sa.Column('target', sa.String(), nullable=True))
+    op.add_column('ingestion_jobs', sa.Column('result', sa.JSON(), nullable=True))
+    op.create_index('idx_job_company_file_hash', 'ingestion_jobs', ['company_id', 'file_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_job_company_file_hash', table_name='ingestion_jobs')
+    op.drop_column('ingestion_jobs', 'result')
+    op.drop_column('ingestion_jobs', 'target')
@@ -0,0 +1,43 @@
+"""Add statement templates
+
+Revision ID: f7c5b6a8d9e0
+Revises: e6b4a5f7c8d9
+Create Date: 2026-10-16 15:02:11.604392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7c5b6a8d9e0'
+down_revision: Union[str, Sequence[str], None] = 'e6b4a5f7c8d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('statement_templates',
+    sa.Column('template_id', sa.String(), nullable=False),
+    sa.Column('target', sa.String(), nullable=False),
+    sa.Column('header_fingerprint', sa.String(), nullable=False),
+    sa.Column('columns', sa.JSON(), nullable=False),
+    sa.Column('column_schema', sa.JSON(), nullable=False),
+    sa.Column('column_mapping', sa.JSON(), nullable=False),
+    sa.Column('learned_from_job_id', sa.String(), nullable=True),
+    sa.Column('use_count', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('last_used_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['learned_from_job_id'], ['ingestion_jobs.job_id'], ),
+    sa.PrimaryKeyConstraint('template_id')
+    )
+    op.create_index('idx_template_target_fingerprint', 'statement_templates', ['target', 'header_fingerprint'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_template_target_fingerprint', table_name='statement_templates')
+    op.drop_table('statement_templates')
@@ -4,17 +4,19 @@ AI-powered API endpoints for reconciliation and financial analysis
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Optional
 from datetime import datetime, date
 from pydantic import BaseModel, Field
 
-from app.core.database import get_db
+from app.core.database import get_async_db, get_async_read_db
 from app.core.tenant_context import get_tenant_context, TenantContext
 from app.core.auth import require_staff_access, get_current_user
-from app.services.ai_reconciliation import AIReconciliationService
+from app.services.ai_reconciliation import AIReconciliationService, DEFAULT_AUTO_MATCH_THRESHOLD
+from app.services.reconciliation_jobs import enqueue_bank_reconciliation
 from app.cdm.models.transaction import VoucherHeader
-from app.cdm.models.external import BankStatement
+from app.cdm.models.reconciliation import ReconciliationJob, ReconciliationLog
 
 router = APIRouter(prefix="/ai", tags=["AI Analytics"])
 
@@ -22,7 +24,8 @@ router = APIRouter(prefix="/ai", tags=["AI Analytics"])
 class ReconciliationRequest(BaseModel):
     start_date: date
     end_date: date
-    auto_match_threshold: Optional[float] = Field(default=0.85, ge=0.0, le=1.0)
+    auto_match_threshold: Optional[float] = Field(default=DEFAULT_AUTO_MATCH_THRESHOLD, ge=0.0, le=1.0)
+    incremental: bool = False  # Only process records new or changed since the last incremental run
 
 class AnomalyAnalysisRequest(BaseModel):
     voucher_ids: Optional[List[str]] = None
@@ -43,104 +46,137 @@ class ReconciliationResult(BaseModel):
     average_confidence: float
     processing_time_seconds: float
 
-@router.post("/reconcile/bank-statements", response_model=ReconciliationResult)
+class ReconciliationJobResponse(BaseModel):
+    job_id: str
+    job_type: str
+    status: str
+    progress_total: int
+    progress_done: int
+    progress_percent: float
+    result: Optional[ReconciliationResult] = None
+    error_details: Optional[Dict] = None
+    created_at: Optional[datetime] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    processing_duration: Optional[float] = None
+
+    @classmethod
+    def from_job(cls, job: ReconciliationJob) -> "ReconciliationJobResponse":
+        total = job.progress_total or 0
+        done = job.progress_done or 0
+        return cls(
+            job_id=job.job_id,
+            job_type=job.job_type,
+            status=job.status,
+            progress_total=total,
+            progress_done=done,
+            progress_percent=round(done * 100.0 / total, 1) if total else 0.0,
+            result=job.result,
+            error_details=job.error_details,
+            created_at=job.created_at,
+            start_time=job.start_time,
+            end_time=job.end_time,
+            processing_duration=float(job.processing_duration) if job.processing_duration is not None else None
+        )
+
+@router.post(
+    "/reconcile/bank-statements",
+    response_model=ReconciliationJobResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
 async def ai_bank_reconciliation(
     request: ReconciliationRequest,
     context: TenantContext = Depends(get_tenant_context),
     current_user = Depends(require_staff_access),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Perform AI-powered bank reconciliation for the specified date range
+    Queue AI-powered bank reconciliation for the specified date range.
+    Already linked vouchers and statements are skipped; with `incremental`
+    only the delta since the last incremental run is processed.
+    Poll GET /ai/jobs/{job_id} for progress and the final statistics.
     """
     try:
-        start_time = datetime.now()
-        
-        # Initialize AI service
-        ai_service = AIReconciliationService(db, context)
-        
-        # Get vouchers for the date range
-        vouchers = db.query(VoucherHeader).filter(
+        has_vouchers = await db.scalar(select(VoucherHeader.voucher_id).where(
             VoucherHeader.company_id == context.company_id,
             VoucherHeader.voucher_date >= request.start_date,
-            VoucherHeader.voucher_date <= request.end_date,
-            VoucherHeader.is_active == True
-        ).all()
+            VoucherHeader.voucher_date <= request.end_date
+        ).limit(1))
         
-        if not vouchers:
+        if not has_vouchers:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No vouchers found for the specified date range"
             )
         
-        # Get unmatched bank statements
-        bank_statements = db.query(BankStatement).filter(
-            BankStatement.company_id == context.company_id,
-            BankStatement.transaction_date >= request.start_date,
-            BankStatement.transaction_date <= request.end_date,
-            BankStatement.reconciliation_status == "Unmatched"
-        ).all()
-        
-        # Perform AI reconciliation
-        results = await ai_service.intelligent_bank_reconciliation(vouchers, bank_statements)
-        
-        # Calculate statistics
-        end_time = datetime.now()
-        processing_time = (end_time - start_time).total_seconds()
-        
-        matched_count = sum(1 for r in results if r['matched'] and not r['requires_review'])
-        review_count = sum(1 for r in results if r['matched'] and r['requires_review'])
-        unmatched_count = len(vouchers) - len(results)
-        
-        avg_confidence = (
-            sum(r['confidence'] for r in results if r['matched']) / 
-            len([r for r in results if r['matched']])
-        ) if results else 0.0
-        
-        return ReconciliationResult(
-            total_vouchers=len(vouchers),
-            matched_count=matched_count,
-            requires_review_count=review_count,
-            unmatched_count=unmatched_count,
-            average_confidence=round(avg_confidence, 4),
-            processing_time_seconds=round(processing_time, 2)
+        job = await db.run_sync(
+            enqueue_bank_reconciliation,
+            context,
+            start_date=request.start_date,
+            end_date=request.end_date,
+            auto_match_threshold=request.auto_match_threshold,
+            incremental=request.incremental
         )
+        return ReconciliationJobResponse.from_job(job)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"AI reconciliation failed: {str(e)}"
         )
 
+@router.get("/jobs/{job_id}", response_model=ReconciliationJobResponse)
+async def get_ai_job(
+    job_id: str,
+    context: TenantContext = Depends(get_tenant_context),
+    current_user = Depends(require_staff_access),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get status, progress and (once completed) results of a background AI job
+    """
+    result = await db.execute(select(ReconciliationJob).where(
+        ReconciliationJob.job_id == job_id,
+        ReconciliationJob.company_id == context.company_id
+    ))
+    job = result.scalars().first()
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return ReconciliationJobResponse.from_job(job)
+
 @router.post("/analyze/anomalies")
 async def detect_financial_anomalies(
     request: AnomalyAnalysisRequest,
     context: TenantContext = Depends(get_tenant_context),
     current_user = Depends(require_staff_access),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Use AI to detect potential anomalies in financial transactions
     """
     try:
-        ai_service = AIReconciliationService(db, context)
+        # The service only calls the LLM here; it never touches the session
+        ai_service = AIReconciliationService(db.sync_session, context)
         
         # Build query based on request
-        query = db.query(VoucherHeader).filter(
-            VoucherHeader.company_id == context.company_id,
-            VoucherHeader.is_active == True
+        query = select(VoucherHeader).where(
+            VoucherHeader.company_id == context.company_id
         )
         
         if request.voucher_ids:
-            query = query.filter(VoucherHeader.voucher_id.in_(request.voucher_ids))
+            query = query.where(VoucherHeader.voucher_id.in_(request.voucher_ids))
         
         if request.start_date:
-            query = query.filter(VoucherHeader.voucher_date >= request.start_date)
+            query = query.where(VoucherHeader.voucher_date >= request.start_date)
             
         if request.end_date:
-            query = query.filter(VoucherHeader.voucher_date <= request.end_date)
+            query = query.where(VoucherHeader.voucher_date <= request.end_date)
         
-        vouchers = query.limit(100).all()  # Limit for performance
+        vouchers = (await db.scalars(query.limit(100))).all()  # Limit for performance
         
         if not vouchers:
             return {
@@ -166,21 +202,28 @@ async def generate_reconciliation_insights(
     end_date: date,
     context: TenantContext = Depends(get_tenant_context),
     current_user = Depends(require_staff_access),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Generate AI-powered reconciliation insights report
     """
     try:
-        ai_service = AIReconciliationService(db, context)
+        ai_service = AIReconciliationService(db.sync_session, context)
         
         # Convert dates to datetime for service
         start_datetime = datetime.combine(start_date, datetime.min.time())
         end_datetime = datetime.combine(end_date, datetime.max.time())
         
+        recon_logs = (await db.scalars(select(ReconciliationLog).where(
+            ReconciliationLog.company_id == context.company_id,
+            ReconciliationLog.created_at >= start_datetime,
+            ReconciliationLog.created_at <= end_datetime
+        ))).all()
+        
         report = await ai_service.generate_reconciliation_report(
             start_datetime, 
-            end_datetime
+            end_datetime,
+            recon_logs=recon_logs
         )
         
         return {
@@ -201,20 +244,20 @@ async def submit_ai_feedback(
     request: AIFeedbackRequest,
     context: TenantContext = Depends(get_tenant_context),
     current_user = Depends(require_staff_access),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Submit feedback on AI predictions for model improvement
     """
     try:
-        ai_service = AIReconciliationService(db, context)
-        
-        feedback_id = ai_service.record_ai_feedback(
-            voucher_id=request.voucher_id,
-            original_prediction=request.original_prediction,
-            user_correction=request.user_correction,
-            feedback_type=request.feedback_type,
-            user_id=current_user.user_id
+        feedback_id = await db.run_sync(
+            lambda session: AIReconciliationService(session, context).record_ai_feedback(
+                voucher_id=request.voucher_id,
+                original_prediction=request.original_prediction,
+                user_correction=request.user_correction,
+                feedback_type=request.feedback_type,
+                user_id=current_user.user_id
+            )
         )
         
         return {
@@ -239,7 +282,7 @@ async def ai_service_health():
         
         # Test LLM connectivity
         llm = make_llm()
-        test_response = llm.invoke("Test connection. Respond with 'OK'.")
+        test_response = await llm.ainvoke("Test connection. Respond with 'OK'.")
         
         return {
             "status": "healthy",
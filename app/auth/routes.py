@@ -4,12 +4,13 @@ Authentication routes: login, register, logout, token refresh
 """
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any
 import secrets
 from datetime import datetime, timezone
 
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.auth import (
     authenticate_user, 
     create_tokens_for_user, 
@@ -19,6 +20,7 @@ from app.core.auth import (
     AuthenticatedUser,
     TokenResponse
 )
+from app.core.auth_cache import invalidate_user
 from app.tenant.models.user import User, UserRole
 from app.tenant.models.firm import CAFirm
 from app.auth.schemas import (
@@ -40,12 +42,12 @@ blacklisted_tokens = set()
 @router.post("/login", response_model=TokenResponse)
 async def login(
     login_request: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Authenticate user and return JWT tokens
     """
-    user = authenticate_user(db, login_request.email, login_request.password)
+    user = await authenticate_user(db, login_request.email, login_request.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -64,13 +66,14 @@ async def login(
 @router.post("/register", response_model=Dict[str, Any], status_code=status.HTTP_201_CREATED)
 async def register(
     register_request: RegisterRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Register a new user within a CA firm
     """
     # Check if email already exists
-    existing_user = db.query(User).filter(User.email == register_request.email).first()
+    result = await db.execute(select(User).where(User.email == register_request.email))
+    existing_user = result.scalars().first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -86,10 +89,11 @@ async def register(
             )
         
         # Validate firm exists and is active
-        firm = db.query(CAFirm).filter(
+        result = await db.execute(select(CAFirm).where(
             CAFirm.firm_id == register_request.firm_id,
             CAFirm.is_active == True
-        ).first()
+        ))
+        firm = result.scalars().first()
         if not firm:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -110,8 +114,8 @@ async def register(
     )
     
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     return {
         "message": "User registered successfully",
@@ -125,7 +129,7 @@ async def register(
 @router.post("/refresh", response_model=TokenResponse)
 async def refresh_token(
     refresh_request: TokenRefreshRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Refresh access token using refresh token
@@ -146,7 +150,8 @@ async def refresh_token(
         )
     
     user_id = payload.get("user_id")
-    user = db.query(User).filter(User.user_id == user_id, User.is_active == True).first()
+    result = await db.execute(select(User).where(User.user_id == user_id, User.is_active == True))
+    user = result.scalars().first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -172,12 +177,12 @@ async def logout(
 @router.get("/me", response_model=UserProfile)
 async def get_profile(
     current_user: AuthenticatedUser = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get current user profile
     """
-    user = db.query(User).filter(User.user_id == current_user.user_id).first()
+    user = await db.get(User, current_user.user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -199,12 +204,12 @@ async def get_profile(
 async def change_password(
     password_request: PasswordChangeRequest,
     current_user: AuthenticatedUser = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Change user password
     """
-    user = db.query(User).filter(User.user_id == current_user.user_id).first()
+    user = await db.get(User, current_user.user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -221,7 +226,8 @@ async def change_password(
     # Update password
     user.password_hash = get_password_hash(password_request.new_password)
     user.updated_at = datetime.now(timezone.utc)
-    db.commit()
+    await db.commit()
+    invalidate_user(user.user_id)
     
     return {"message": "Password changed successfully"}
 
@@ -229,12 +235,13 @@ async def change_password(
 async def reset_password(
     reset_request: PasswordResetRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Request password reset (sends email with reset token)
     """
-    user = db.query(User).filter(User.email == reset_request.email).first()
+    result = await db.execute(select(User).where(User.email == reset_request.email))
+    user = result.scalars().first()
     if not user:
         # Don't reveal if email exists or not
         return {"message": "If the email exists, a reset link has been sent"}
@@ -253,7 +260,7 @@ async def reset_password(
 @router.post("/reset-password/confirm")
 async def confirm_password_reset(
     confirm_request: PasswordResetConfirmRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Confirm password reset with token
@@ -35,6 +35,7 @@ class BankStatement(Base):
         Index('idx_bank_company_date', 'company_id', 'txn_date'),
         Index('idx_bank_reconciliation', 'reconciliation_status'),
         Index('idx_bank_hash', 'txn_hash'),
+        Index('idx_bank_linked_voucher', 'linked_voucher_id'),
     )
 
     def generate_hash(self):
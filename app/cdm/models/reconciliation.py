@@ -1,5 +1,5 @@
 # app/cdm/models/reconciliation.py
-from sqlalchemy import Column, String, Numeric, Text, DateTime, JSON, Index, ForeignKey
+from sqlalchemy import Column, String, Numeric, Integer, Text, DateTime, JSON, Index, ForeignKey
 from sqlalchemy.sql import func
 from app.core.database import Base
 import uuid
@@ -39,10 +39,13 @@ class IngestionJob(Base):
     file_type = Column(String, nullable=False)  # csv, xlsx, pdf, etc.
     file_size = Column(Numeric(15,0))  # bytes
     file_hash = Column(String)  # SHA256 of file content
+    target = Column(String)  # bank_statements, gst_sales, gst_purchases
+    bank_id = Column(String)  # Bank ledger a statement was loaded against
     status = Column(String, default="Started")  # Started, Processing, Completed, Failed
     records_processed = Column(Numeric(10,0), default=0)
     records_failed = Column(Numeric(10,0), default=0)
     error_details = Column(JSON)  # Store errors and warnings
+    result = Column(JSON)  # Response summary, replayed for repeat uploads of the same file
     start_time = Column(DateTime(timezone=True), server_default=func.now())
     end_time = Column(DateTime(timezone=True))
     processing_duration = Column(Numeric(10,3))  # seconds
@@ -51,6 +54,86 @@ class IngestionJob(Base):
     __table_args__ = (
         Index('idx_job_company_status', 'company_id', 'status'),
         Index('idx_job_file_hash', 'file_hash'),
+        Index('idx_job_company_file_hash', 'company_id', 'file_hash', 'target', 'bank_id'),
+    )
+
+class IngestionQuarantine(Base):
+    __tablename__ = "ingestion_quarantine"
+
+    quarantine_id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    job_id = Column(String, ForeignKey("ingestion_jobs.job_id"), nullable=False)
+    company_id = Column(String, ForeignKey("entities.company_id"), nullable=False)
+    kind = Column(String, nullable=False)  # malformed_line, invalid_row
+    line_number = Column(Integer)  # Physical line in the file, when the parser reports it
+    row_number = Column(Integer)  # 1-based position among the parsed data rows
+    raw_text = Column(Text)
+    reason = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Indexes
+    __table_args__ = (
+        Index('idx_quarantine_job', 'job_id'),
+    )
+
+class StatementTemplate(Base):
+    __tablename__ = "statement_templates"
+
+    template_id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    firm_id = Column(String, ForeignKey("ca_firms.firm_id"), nullable=False)  # Firm whose ingests taught it
+    target = Column(String, nullable=False)  # bank_statements, gst_sales, gst_purchases
+    header_fingerprint = Column(String, nullable=False)  # schema_detector.header_signature of the header row
+    columns = Column(JSON, nullable=False)  # Header row as first seen
+    column_schema = Column(JSON, nullable=False)  # Type label per column position
+    column_mapping = Column(JSON, nullable=False)  # CDM field -> column position
+    learned_from_job_id = Column(String, ForeignKey("ingestion_jobs.job_id"))
+    use_count = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True))
+
+    # Indexes
+    __table_args__ = (
+        Index('idx_template_firm_target_fingerprint', 'firm_id', 'target', 'header_fingerprint', unique=True),
+    )
+
+class ReconciliationJob(Base):
+    __tablename__ = "reconciliation_jobs"
+
+    job_id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    company_id = Column(String, ForeignKey("entities.company_id"), nullable=False)
+    firm_id = Column(String, ForeignKey("ca_firms.firm_id"), nullable=True)
+    requested_by = Column(String)  # user_id that enqueued the job
+    job_type = Column(String, nullable=False, default="bank_reconciliation")
+    parameters = Column(JSON)  # Date range and options the job was submitted with
+    status = Column(String, default="Queued")  # Queued, Processing, Completed, Failed
+    progress_total = Column(Integer, default=0)
+    progress_done = Column(Integer, default=0)
+    result = Column(JSON)  # Summary statistics once completed
+    error_details = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    start_time = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))  # Last progress write by the worker running it
+    end_time = Column(DateTime(timezone=True))
+    processing_duration = Column(Numeric(10,3))  # seconds
+
+    # Indexes
+    __table_args__ = (
+        Index('idx_recon_job_company_status', 'company_id', 'status'),
+        Index('idx_recon_job_created', 'created_at'),
+    )
+
+class ReconciliationWatermark(Base):
+    __tablename__ = "reconciliation_watermarks"
+
+    watermark_id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    company_id = Column(String, ForeignKey("entities.company_id"), nullable=False)
+    recon_type = Column(String, nullable=False, default="bank")  # bank, gst_sales, gst_purchases
+    watermark_at = Column(DateTime(timezone=True), nullable=False)  # Start time of the last successful incremental run
+    last_job_id = Column(String, ForeignKey("reconciliation_jobs.job_id"))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Indexes
+    __table_args__ = (
+        Index('idx_recon_watermark_company_type', 'company_id', 'recon_type', unique=True),
     )
 
 class AuditEvent(Base):
@@ -93,4 +176,24 @@ class AIFeedback(Base):
     __table_args__ = (
         Index('idx_feedback_company_type', 'company_id', 'feedback_type'),
         Index('idx_feedback_voucher', 'voucher_id'),
-    )
\ No newline at end of file
+    )
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_response_cache"
+
+    cache_key = Column(String, primary_key=True)  # SHA256 of company, model, temperature and normalized prompt
+    company_id = Column(String, ForeignKey("entities.company_id"), nullable=True)
+    model_name = Column(String, nullable=False)
+    temperature = Column(Numeric(3,2))
+    response_text = Column(Text, nullable=False)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_accessed_at = Column(DateTime(timezone=True), server_default=func.now())  # LRU eviction order
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    # Indexes
+    __table_args__ = (
+        Index('idx_llm_cache_company', 'company_id'),
+        Index('idx_llm_cache_last_access', 'last_accessed_at'),
+        Index('idx_llm_cache_expires', 'expires_at'),
+    )
@@ -53,6 +53,7 @@ class VoucherHeader(Base):
         Index('idx_voucher_company_date', 'company_id', 'voucher_date'),
         Index('idx_voucher_type_status', 'voucher_type', 'status'),
         Index('idx_voucher_external_key', 'external_match_key'),
+        Index('idx_voucher_company_recon_status', 'company_id', 'reconciliation_status'),
     )
 
 class VoucherLine(Base):
@@ -1,15 +1,22 @@
 # app/cdm/routes.py
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.auth import (
     get_current_active_user,
     require_staff_access,
     require_firm_admin,
     AuthenticatedUser,
-    UserRole
+    UserRole,
+    get_user_accessible_firms
+)
+from app.core.pagination import paginate_query
+from app.core.tenant_access import (
+    can_access_company,
+    get_user_accessible_companies,
+    invalidate_access
 )
 from app.cdm.models.entity import Entity
 from app.cdm.models.master import Group, Ledger, StockItem, TaxLedger
@@ -20,16 +27,6 @@ from app.cdm.models.reconciliation import ReconciliationLog
 from app.cdm.schemas.entity import EntityCreate, EntityUpdate, EntityResponse
 from app.cdm.schemas.transaction import VoucherHeaderCreate, VoucherHeaderResponse, VoucherLineCreate
 
-def get_user_accessible_firms(db: Session, user: AuthenticatedUser) -> List[str]:
-    """Get list of firm IDs that user has access to"""
-    if user.role == UserRole.TRENOR_ADMIN:
-        # Admin has access to all firms
-        return []  # Empty list means no restriction
-    elif user.firm_id:
-        return [user.firm_id]
-    else:
-        return []
-
 from app.cdm.schemas.master import (
     GroupCreate, GroupUpdate, GroupResponse,
     LedgerCreate, LedgerUpdate, LedgerResponse,
@@ -42,19 +39,11 @@ from app.cdm.schemas.transaction import (
 
 router = APIRouter(prefix="/cdm", tags=["CDM - Common Data Model"])
 
-
-def get_user_accessible_firms(db: Session, user: AuthenticatedUser) -> List[str]:
-    """Get list of firm IDs that the user has access to"""
-    if user.role == UserRole.TRENOR_ADMIN:
-        # Trenor admins can access all firms
-        from app.tenant.models.firm import CAFirm
-        firms = db.query(CAFirm.firm_id).all()
-        return [firm.firm_id for firm in firms]
-    elif user.firm_id:
-        # Other users can only access their own firm
-        return [user.firm_id]
-    else:
-        return []
+# Keyset pagination keys; each leads with an indexed NOT NULL column and ends
+# with the primary key. Vouchers are paged newest first.
+VOUCHER_PAGE_KEY = (VoucherHeader.voucher_date, VoucherHeader.voucher_id)
+LEDGER_PAGE_KEY = (Ledger.ledger_name, Ledger.ledger_id)
+STOCK_ITEM_PAGE_KEY = (StockItem.item_name, StockItem.item_id)
 
 
 def apply_tenant_filter(query, model, current_user: AuthenticatedUser, db: Session):
@@ -77,6 +66,7 @@ def create_entity(
     db_entity = Entity(**entity_data)
     db.add(db_entity)
     db.commit()
+    invalidate_access(db_entity.firm_id)
     db.refresh(db_entity)
     return db_entity
 
@@ -149,12 +139,7 @@ def get_groups(
 ):
     """Get groups within specified company context"""
     # Validate user has access to this company
-    accessible_firms = get_user_accessible_firms(db, current_user)
-    entity = db.query(Entity).filter(
-        Entity.company_id == company_id,
-        Entity.firm_id.in_(accessible_firms)
-    ).first()
-    if not entity:
+    if not can_access_company(db, current_user, company_id):
         raise HTTPException(status_code=403, detail="Access denied to this company")
     
     query = db.query(Group).filter(
@@ -174,12 +159,7 @@ def create_ledger(
 ):
     """Create a new ledger within current company context"""
     # Validate user has access to the specified company
-    accessible_firms = get_user_accessible_firms(db, current_user)
-    entity = db.query(Entity).filter(
-        Entity.company_id == ledger.company_id,
-        Entity.firm_id.in_(accessible_firms)
-    ).first()
-    if not entity:
+    if not can_access_company(db, current_user, ledger.company_id):
         raise HTTPException(status_code=403, detail="Access denied to this company")
     
     ledger_data = ledger.model_dump()
@@ -191,12 +171,20 @@ def create_ledger(
     return db_ledger
 
 @router.get("/ledgers", response_model=List[LedgerResponse])
-def get_ledgers(company_id: Optional[str] = None, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Get ledgers, optionally filtered by company"""
+def get_ledgers(
+    response: Response,
+    company_id: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    db: Session = Depends(get_read_db)
+):
+    """Get ledgers by name, optionally filtered by company; pass X-Next-Cursor back as `cursor`"""
     query = db.query(Ledger).filter(Ledger.is_active == True)
     if company_id:
         query = query.filter(Ledger.company_id == company_id)
-    ledgers = query.offset(skip).limit(limit).all()
+    ledgers = paginate_query(query, LEDGER_PAGE_KEY, response, limit, cursor, skip, include_total)
     return ledgers
 
 # ==================== STOCK ITEM ROUTES ====================
@@ -211,12 +199,20 @@ def create_stock_item(item: StockItemCreate, db: Session = Depends(get_db)):
     return db_item
 
 @router.get("/stock-items", response_model=List[StockItemResponse])
-def get_stock_items(company_id: Optional[str] = None, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Get stock items, optionally filtered by company"""
+def get_stock_items(
+    response: Response,
+    company_id: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    db: Session = Depends(get_read_db)
+):
+    """Get stock items by name, optionally filtered by company; pass X-Next-Cursor back as `cursor`"""
     query = db.query(StockItem).filter(StockItem.is_active == True)
     if company_id:
         query = query.filter(StockItem.company_id == company_id)
-    items = query.offset(skip).limit(limit).all()
+    items = paginate_query(query, STOCK_ITEM_PAGE_KEY, response, limit, cursor, skip, include_total)
     return items
 
 # ==================== TAX LEDGER ROUTES ====================
@@ -251,9 +247,7 @@ def create_voucher(
     
     # Verify user has access to the company
     if current_user.role != UserRole.TRENOR_ADMIN:
-        accessible_firms = get_user_accessible_firms(db, current_user)
-        company = db.query(Entity).filter(Entity.company_id == voucher.company_id).first()
-        if not company or company.firm_id not in accessible_firms:
+        if not can_access_company(db, current_user, voucher.company_id):
             raise HTTPException(status_code=403, detail="Access denied to this company")
     
     # Create voucher header
@@ -288,24 +282,26 @@ def create_voucher(
 
 @router.get("/vouchers", response_model=List[VoucherHeaderResponse])
 def get_vouchers(
+    response: Response,
     skip: int = 0, 
     limit: int = 100,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     voucher_type: Optional[str] = None,
     from_date: Optional[str] = None,
     to_date: Optional[str] = None,
     status: Optional[str] = None,
     company_id: Optional[str] = Header(None, alias="X-Company-ID"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: AuthenticatedUser = Depends(require_staff_access)
 ):
-    """Get vouchers for current CA firm with filtering"""
+    """Get vouchers for current CA firm with filtering, newest first; pass X-Next-Cursor back as `cursor`"""
     
     query = db.query(VoucherHeader)
     
     # Apply tenant filtering based on user access
-    accessible_firms = get_user_accessible_firms(db, current_user)
-    if current_user.role != UserRole.TRENOR_ADMIN and accessible_firms:
-        query = query.join(Entity).filter(Entity.firm_id.in_(accessible_firms))
+    if current_user.role != UserRole.TRENOR_ADMIN:
+        query = query.filter(VoucherHeader.company_id.in_(get_user_accessible_companies(db, current_user)))
     
     # Apply company filter if provided
     if company_id:
@@ -321,7 +317,9 @@ def get_vouchers(
     if to_date:
         query = query.filter(VoucherHeader.voucher_date <= to_date)
     
-    vouchers = query.offset(skip).limit(limit).all()
+    vouchers = paginate_query(
+        query, VOUCHER_PAGE_KEY, response, limit, cursor, skip, include_total, descending=True
+    )
     return vouchers
 
 @router.get("/vouchers/{voucher_id}", response_model=VoucherHeaderResponse)
@@ -337,9 +335,7 @@ def get_voucher(
     
     # Verify user has access to this voucher's company
     if current_user.role != UserRole.TRENOR_ADMIN:
-        accessible_firms = get_user_accessible_firms(db, current_user)
-        company = db.query(Entity).filter(Entity.company_id == voucher.company_id).first()
-        if not company or (accessible_firms and company.firm_id not in accessible_firms):
+        if not can_access_company(db, current_user, voucher.company_id):
             raise HTTPException(status_code=403, detail="Access denied to this voucher")
     
     return voucher
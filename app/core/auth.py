@@ -9,12 +9,15 @@ from jose import JWTError, jwt
 import bcrypt
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
-from app.core.database import get_db
+from app.core.database import get_async_db
+from app.core.auth_cache import user_cache
+from app.core.tenant_access import get_user_accessible_firms
 from app.tenant.models.user import User, UserRole
-from app.tenant.models.firm import CAFirm
 
 # Configuration
 SECRET_KEY = secrets.token_urlsafe(32)  # In production, use environment variable
@@ -46,7 +49,7 @@ class TokenResponse(BaseModel):
 class AuthenticatedUser(BaseModel):
     """Current authenticated user info"""
     user_id: str
-    firm_id: str
+    firm_id: Optional[str] = None  # None for Trenor admins
     email: str
     name: str
     role: UserRole
@@ -65,12 +68,13 @@ def get_password_hash(password: str) -> str:
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
+    issued_at = datetime.now(timezone.utc)
     if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
+        expire = issued_at + expires_delta
     else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = issued_at + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire, "type": "access"})
+    to_encode.update({"exp": expire, "iat": issued_at, "type": "access"})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -90,9 +94,10 @@ def verify_token(token: str) -> Optional[Dict[str, Any]]:
     except JWTError:
         return None
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
     """Authenticate user with email and password"""
-    user = db.query(User).filter(User.email == email, User.is_active == True).first()
+    result = await db.execute(select(User).where(User.email == email, User.is_active == True))
+    user = result.scalars().first()
     if not user:
         return None
     if not verify_password(password, user.password_hash):
@@ -100,7 +105,7 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     
     # Update last login
     user.last_login = datetime.now(timezone.utc)
-    db.commit()
+    await db.commit()
     
     return user
 
@@ -132,7 +137,7 @@ def create_tokens_for_user(user: User) -> TokenResponse:
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> AuthenticatedUser:
     """Get current authenticated user from JWT token"""
     credentials_exception = HTTPException(
@@ -158,12 +163,20 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    # Get user from database
-    user = db.query(User).filter(User.user_id == user_id, User.is_active == True).first()
+    # Tokens issued before iat was added are keyed by their expiry instead
+    issued_at = payload.get("iat", payload.get("exp"))
+    cached = user_cache.get(user_id, issued_at)
+    if cached is not None:
+        return cached
+    
+    # Get user from database; an invalidation during the read keeps it out of the cache
+    generation = user_cache.generation(user_id)
+    result = await db.execute(select(User).where(User.user_id == user_id, User.is_active == True))
+    user = result.scalars().first()
     if user is None:
         raise credentials_exception
     
-    return AuthenticatedUser(
+    authenticated = AuthenticatedUser(
         user_id=user.user_id,
         firm_id=user.firm_id,
         email=user.email,
@@ -171,6 +184,8 @@ async def get_current_user(
         role=user.role,
         is_active=user.is_active
     )
+    user_cache.set(user_id, issued_at, authenticated, generation)
+    return authenticated
 
 async def get_current_active_user(
     current_user: AuthenticatedUser = Depends(get_current_user)
@@ -233,17 +248,7 @@ async def require_staff_or_above(
     """Require CA_STAFF role or higher (alias for require_staff_access)"""
     return await require_staff_access(current_user)
 
-def get_user_accessible_firms(db: Session, user: AuthenticatedUser) -> list[str]:
-    """Get list of firm IDs accessible to the user"""
-    if user.role == UserRole.TRENOR_ADMIN:
-        # Trenor admins can access all firms
-        firms = db.query(CAFirm).filter(CAFirm.is_active == True).all()
-        return [firm.firm_id for firm in firms]
-    else:
-        # Other users can only access their own firm
-        return [user.firm_id]
-
 def validate_firm_access(db: Session, user: AuthenticatedUser, firm_id: str) -> bool:
     """Validate if user has access to a specific firm"""
     accessible_firms = get_user_accessible_firms(db, user)
-    return firm_id in accessible_firms
\ No newline at end of file
+    return firm_id in accessible_firms
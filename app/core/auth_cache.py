@@ -0,0 +1,95 @@
+# app/core/auth_cache.py
+"""
+In-process cache of resolved AuthenticatedUser objects.
+Keyed by (user_id, token iat) so every token issue starts a fresh entry;
+entries live for a short TTL and the cache is size-bounded (LRU). Routes
+that change a user's role, firm, active flag or password call
+invalidate_user() so the change applies to the next request. A lookup
+takes generation() before reading the user and passes it to set(), so a
+row read before an invalidation is not cached after it. Other worker
+processes see it once their copy expires, so keep the TTL short.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+
+Key = Tuple[str, object]
+
+
+class AuthUserCache:
+    """Thread-safe TTL + LRU cache with per-user invalidation"""
+
+    def __init__(self, ttl_seconds: float = None, max_entries: int = None):
+        self.ttl_seconds = settings.AUTH_USER_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_entries = settings.AUTH_USER_CACHE_SIZE if max_entries is None else max_entries
+        self._entries: "OrderedDict[Key, Tuple[float, object]]" = OrderedDict()
+        self._by_user: Dict[str, Set[Key]] = {}
+        self._generations: Dict[str, int] = {}  # Users invalidated at least once
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, issued_at) -> Optional[object]:
+        key = (user_id, issued_at)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, user = item
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def generation(self, user_id: str) -> int:
+        """Invalidation count for the user; take it before reading the user"""
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def set(self, user_id: str, issued_at, user, generation: int = None):
+        """Cache `user`, unless the user was invalidated since `generation` was taken"""
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        key = (user_id, issued_at)
+        with self._lock:
+            if generation is not None and self._generations.get(user_id, 0) != generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, user)
+            self._entries.move_to_end(key)
+            self._by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for key in list(self._by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+            self._generations.clear()
+
+    def _remove(self, key: Key):
+        self._entries.pop(key, None)
+        keys = self._by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[key[0]]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+user_cache = AuthUserCache()
+
+
+def invalidate_user(user_id: str):
+    """Drop every cached resolution of `user_id` (role/firm/status/password changed)"""
+    user_cache.invalidate_user(user_id)
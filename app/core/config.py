@@ -6,4 +6,80 @@ class Settings:
     LOG_DIR: str = os.path.join(os.getcwd(), "logs")
     os.makedirs(LOG_DIR, exist_ok=True)
 
-settings = Settings()
\ No newline at end of file
+    # Background error log writer
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_BATCH_SIZE: int = int(os.getenv("LOG_BATCH_SIZE", "500"))
+    LOG_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("LOG_FLUSH_INTERVAL_SECONDS", "1"))
+    LOG_MAX_BYTES: int = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # 0 disables size rotation
+    LOG_ROTATE_SECONDS: float = float(os.getenv("LOG_ROTATE_SECONDS", str(24 * 3600)))  # 0 disables time rotation
+    LOG_BACKUP_COUNT: int = int(os.getenv("LOG_BACKUP_COUNT", "7"))
+
+    # Connection pools (ignored for SQLite)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    DB_POOL_TIMEOUT_SECONDS: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    # The async engines (async routes) have pools of their own
+    DB_ASYNC_POOL_SIZE: int = int(os.getenv("DB_ASYNC_POOL_SIZE", "5"))
+    DB_ASYNC_MAX_OVERFLOW: int = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "10"))
+    # Reads stay on the primary this long after a tenant's write, in every worker (read-your-writes)
+    READ_REPLICA_STICKY_SECONDS: float = float(os.getenv("READ_REPLICA_STICKY_SECONDS", "5"))
+
+    # Resolved JWT -> user cache
+    AUTH_USER_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60"))  # 0 disables
+    AUTH_USER_CACHE_SIZE: int = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+
+    # Firm/company access map; writes in this process rebuild it at once, others within the TTL
+    TENANT_ACCESS_CACHE_TTL_SECONDS: float = float(os.getenv("TENANT_ACCESS_CACHE_TTL_SECONDS", "60"))  # 0 disables
+
+    # LLM fan-out
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_REQUESTS_PER_SECOND: float = float(os.getenv("LLM_REQUESTS_PER_SECOND", "5"))
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+
+    # Persistent LLM response cache
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_TTL_SECONDS: int = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+
+    # Streaming file ingestion
+    INGEST_CHUNK_ROWS: int = int(os.getenv("INGEST_CHUNK_ROWS", "50000"))
+    INGEST_SPOOL_BLOCK_BYTES: int = int(os.getenv("INGEST_SPOOL_BLOCK_BYTES", str(1024 * 1024)))
+    INGEST_ENCODING_SAMPLE_BYTES: int = int(os.getenv("INGEST_ENCODING_SAMPLE_BYTES", str(64 * 1024)))
+    INGEST_INSERT_BATCH_ROWS: int = int(os.getenv("INGEST_INSERT_BATCH_ROWS", "1000"))
+    INGEST_SCHEMA_SAMPLE_ROWS: int = int(os.getenv("INGEST_SCHEMA_SAMPLE_ROWS", "200"))
+    INGEST_SCHEMA_CACHE_SIZE: int = int(os.getenv("INGEST_SCHEMA_CACHE_SIZE", "1024"))
+    INGEST_EXCEL_HEADER_SCAN_ROWS: int = int(os.getenv("INGEST_EXCEL_HEADER_SCAN_ROWS", "30"))
+    INGEST_QUARANTINE_MAX_ROWS: int = int(os.getenv("INGEST_QUARANTINE_MAX_ROWS", "10000"))  # Stored per job; the rest are counted
+
+    # Process pool for CPU-bound parsers (Excel, PDF, XML)
+    INGEST_PARSER_WORKERS: int = int(os.getenv("INGEST_PARSER_WORKERS", "2"))
+    INGEST_PARSER_TIMEOUT_SECONDS: float = float(os.getenv("INGEST_PARSER_TIMEOUT_SECONDS", "120"))
+    INGEST_PARSER_MEMORY_MB: int = int(os.getenv("INGEST_PARSER_MEMORY_MB", "1024"))  # 0 disables the cap
+    INGEST_PDF_PAGES_PER_TASK: int = int(os.getenv("INGEST_PDF_PAGES_PER_TASK", "8"))
+    # Leading page ranges searched for a statement table header before a PDF is read as plain text
+    INGEST_PDF_LAYOUT_SAMPLE_RANGES: int = int(os.getenv("INGEST_PDF_LAYOUT_SAMPLE_RANGES", "3"))
+
+    # Background reconciliation jobs
+    RECON_JOB_WORKERS: int = int(os.getenv("RECON_JOB_WORKERS", "2"))
+    RECON_WRITE_CHUNK_SIZE: int = int(os.getenv("RECON_WRITE_CHUNK_SIZE", "1000"))
+    RECON_PROGRESS_EVERY: int = int(os.getenv("RECON_PROGRESS_EVERY", "500"))  # Vouchers between progress writes
+    RECON_PROGRESS_INTERVAL_SECONDS: float = float(os.getenv("RECON_PROGRESS_INTERVAL_SECONDS", "5"))
+    RECON_JOB_STALE_SECONDS: int = int(os.getenv("RECON_JOB_STALE_SECONDS", "900"))  # No heartbeat this long: interrupted
+
+    # Batched multi-voucher reconciliation prompts
+    RECON_LLM_BATCH_MODE: bool = os.getenv("RECON_LLM_BATCH_MODE", "true").lower() == "true"
+    RECON_BATCH_TOKEN_BUDGET: int = int(os.getenv("RECON_BATCH_TOKEN_BUDGET", "6000"))
+    RECON_BATCH_MAX_VOUCHERS: int = int(os.getenv("RECON_BATCH_MAX_VOUCHERS", "25"))
+
+    # Rule-based reconciliation pre-pass
+    RECON_EXACT_DATE_WINDOW_DAYS: int = int(os.getenv("RECON_EXACT_DATE_WINDOW_DAYS", "3"))
+    RECON_NEAR_DATE_WINDOW_DAYS: int = int(os.getenv("RECON_NEAR_DATE_WINDOW_DAYS", "7"))
+    RECON_NEAR_AMOUNT_TOLERANCE: float = float(os.getenv("RECON_NEAR_AMOUNT_TOLERANCE", "10.00"))
+
+    # Reconciliation candidate blocking
+    RECON_MAX_CANDIDATES: int = int(os.getenv("RECON_MAX_CANDIDATES", "5"))
+    RECON_DATE_WINDOW_DAYS: int = int(os.getenv("RECON_DATE_WINDOW_DAYS", "10"))
+    RECON_AMOUNT_TOLERANCE: float = float(os.getenv("RECON_AMOUNT_TOLERANCE", "25.00"))
+
+settings = Settings()
@@ -1,9 +1,159 @@
 # app/core/logger.py
-import json, os, datetime
+"""
+Structured JSONL error log.
+log_error only enqueues the entry; a background thread drains the queue in
+batches, appends them to logs/error_log.jsonl with one write and flush per
+batch, and rotates the file by size and age. A request never waits on the
+disk: if the queue is full (an error storm outrunning the disk) the entry
+is dropped and counted, and the count is logged once there is room again.
+"""
+
+import atexit
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
 from app.core.config import settings
 
-def log_error(module: str, error_type: str, message: str, sample_row: str = None):
-    log_path = os.path.join(settings.LOG_DIR, "error_log.jsonl")
+_STOP = object()
+
+
+class JsonlLogWriter:
+    """Queue-backed, batching, rotating JSONL appender"""
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = None,
+        backup_count: int = None,
+        rotate_seconds: float = None,
+        batch_size: int = None,
+        flush_interval: float = None,
+        queue_size: int = None
+    ):
+        self.path = path
+        self.max_bytes = settings.LOG_MAX_BYTES if max_bytes is None else max_bytes
+        self.backup_count = settings.LOG_BACKUP_COUNT if backup_count is None else backup_count
+        self.rotate_seconds = settings.LOG_ROTATE_SECONDS if rotate_seconds is None else rotate_seconds
+        self.batch_size = batch_size or settings.LOG_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.LOG_FLUSH_INTERVAL_SECONDS
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size or settings.LOG_QUEUE_SIZE)
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._opened_at = 0.0
+
+    def write(self, entry: Dict) -> bool:
+        """Enqueue an entry without blocking; False if it had to be dropped"""
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def stop(self, timeout: float = 5.0):
+        """Write out everything queued so far and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self.queue.put(_STOP)
+        thread.join(timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="error-log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                try:
+                    first = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                batch: List = [first]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stopping = any(entry is _STOP for entry in batch)
+                self._write_batch([entry for entry in batch if entry is not _STOP])
+                if stopping:
+                    # Entries that raced in behind the stop marker
+                    rest = []
+                    while True:
+                        try:
+                            entry = self.queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if entry is not _STOP:
+                            rest.append(entry)
+                    self._write_batch(rest)
+                    return
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write_batch(self, entries: List[Dict]):
+        with self._lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            entries.append(_entry("Logger", "LogQueueFull", f"{dropped} log entries dropped"))
+        if not entries:
+            return
+        data = "".join(json.dumps(entry, default=str) + "\n" for entry in entries)
+        try:
+            self._open_for(len(data.encode("utf-8")))
+            self._file.write(data)
+            self._file.flush()
+        except OSError:
+            # Nowhere to report a failing log disk; keep the writer alive
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _open_for(self, size: int):
+        if self._file is not None:
+            too_big = self.max_bytes and self._file.tell() + size > self.max_bytes and self._file.tell() > 0
+            too_old = self.rotate_seconds and time.monotonic() - self._opened_at >= self.rotate_seconds
+            if too_big or too_old:
+                self._file.close()
+                self._file = None
+                self._rotate()
+        elif self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) + size > self.max_bytes:
+            self._rotate()
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._opened_at = time.monotonic()
+
+    def _rotate(self):
+        """error_log.jsonl -> .1 -> .2 ... keeping `backup_count` files"""
+        if self.backup_count <= 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if os.path.exists(self.path):
+            os.replace(self.path, f"{self.path}.1")
+
+
+def _entry(module: str, error_type: str, message: str, sample_row: str = None, **fields) -> Dict:
     entry = {
         "timestamp": datetime.datetime.utcnow().isoformat(),
         "module": module,
@@ -11,5 +161,47 @@ def log_error(module: str, error_type: str, message: str, sample_row: str = None
         "message": message,
         "sample_row": sample_row,
     }
-    with open(log_path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(entry) + "\n")
\ No newline at end of file
+    entry.update({key: value for key, value in fields.items() if value is not None})
+    return entry
+
+
+_writer: Optional[JsonlLogWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_error_log_writer() -> JsonlLogWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = JsonlLogWriter(os.path.join(settings.LOG_DIR, "error_log.jsonl"))
+        return _writer
+
+
+def shutdown_error_logger(timeout: float = 5.0):
+    """Flush queued entries and stop the writer; the next log_error starts a new one"""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop(timeout)
+
+
+atexit.register(shutdown_error_logger)
+
+
+def log_error(
+    module: str,
+    error_type: str,
+    message: str,
+    sample_row: str = None,
+    company_id: str = None,
+    job_id: str = None,
+    **fields
+):
+    """
+    Record an error entry without blocking. `company_id`, `job_id` and any
+    extra keyword fields are stored as structured keys when given.
+    """
+    get_error_log_writer().write(
+        _entry(module, error_type, message, sample_row, company_id=company_id, job_id=job_id, **fields)
+    )
@@ -0,0 +1,104 @@
+# app/core/pagination.py
+"""
+Keyset (cursor) pagination.
+A listing is ordered by a stable key ending in the primary key, e.g.
+(voucher_date, voucher_id), and the next page starts strictly after the
+last row's key, so its cost does not grow with the page number the way
+OFFSET does. Cursors are opaque URL-safe strings holding that key.
+Key columns must be NOT NULL: a row-value comparison with a NULL is never
+true, so such rows would silently drop out of every page after the first.
+"""
+
+import base64
+import datetime
+import json
+from decimal import Decimal
+from typing import List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+
+def encode_cursor(values: Sequence) -> str:
+    raw = json.dumps(list(values), default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _revive(column, value):
+    """JSON value back to the column's Python type (dates travel as ISO strings)"""
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime.date:
+        return datetime.date.fromisoformat(value)
+    if python_type is datetime.datetime:
+        return datetime.datetime.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(value)
+    return value
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> List:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor does not match this listing")
+        return [_revive(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def keyset_page(query, columns: Sequence, limit: int, cursor: Optional[str] = None, descending: bool = False):
+    """
+    Order `query` (a Query or select()) by `columns`, ascending or, with
+    `descending`, descending on every column, start after `cursor` and
+    fetch one row beyond `limit` so the caller can tell if there is a next
+    page. Pass the rows to next_cursor().
+    """
+    nullable = [column.key for column in columns if column.nullable]
+    if nullable:
+        raise ValueError(f"keyset pagination needs NOT NULL key columns, got {nullable}")
+    if cursor:
+        key, after = tuple_(*columns), tuple_(*decode_cursor(cursor, columns))
+        query = query.filter(key < after if descending else key > after)
+    order = [column.desc() for column in columns] if descending else columns
+    return query.order_by(*order).limit(limit + 1)
+
+
+def next_cursor(rows: List, columns: Sequence, limit: int) -> Tuple[List, Optional[str]]:
+    """(rows of this page, cursor for the next page or None)"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, column.key) for column in columns])
+
+
+def paginate_query(
+    query,
+    columns: Sequence,
+    response: Response,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    include_total: bool = False,
+    descending: bool = False
+) -> List:
+    """
+    One keyset page of a sync Query for list endpoints that return a bare
+    list: the next cursor goes in X-Next-Cursor and, when asked for, the
+    total in X-Total-Count. `skip` keeps old offset-based clients working.
+    """
+    if include_total:
+        response.headers["X-Total-Count"] = str(query.order_by(None).count())
+    page = keyset_page(query, columns, limit, cursor, descending)
+    if skip and not cursor:
+        page = page.offset(skip)
+    rows, following = next_cursor(page.all(), columns, limit)
+    if following:
+        response.headers["X-Next-Cursor"] = following
+    return rows
@@ -0,0 +1,216 @@
+# app/core/tenant_access.py
+"""
+Tenant authorization service.
+Firm -> company and user -> company (UserEntityMap) access sets are loaded
+into one in-process snapshot, so access checks are set lookups instead of
+a CAFirm/Entity query per request. Routes that create or change firms,
+entities or user-entity assignments call invalidate_access(firm_id) after
+committing; the next check reloads just that firm's rows and patches them
+into a new snapshot, so one tenant's change does not cost every tenant a
+full reload. invalidate_access() with no firm forces a full rebuild. Other
+worker processes pick changes up when their snapshot passes
+TENANT_ACCESS_CACHE_TTL_SECONDS. The snapshot is always built from
+the primary: a lagging replica would otherwise cache stale (or missing)
+grants for the whole TTL.
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core import database
+from app.core.config import settings
+from app.cdm.models.entity import Entity
+from app.tenant.models.firm import CAFirm
+from app.tenant.models.user import UserEntityMap, UserRole
+
+
+class AccessMap:
+    """Immutable snapshot of who can reach which firm and company"""
+
+    def __init__(
+        self,
+        version: int,
+        firm_ids: Set[str],
+        companies: Dict[str, Tuple[Optional[str], bool]],
+        user_companies: Dict[str, Set[str]]
+    ):
+        self.version = version
+        self.generation = 0  # Set when installed; each installed snapshot gets a new one
+        self.built_at = time.monotonic()
+        self.firm_ids = frozenset(firm_ids)  # Active firms only
+        self.companies = companies  # company_id -> (firm_id, is_active)
+        self.firm_companies: Dict[str, Set[str]] = {}
+        for company_id, (firm_id, _) in companies.items():
+            self.firm_companies.setdefault(firm_id, set()).add(company_id)
+        self.user_companies = user_companies
+
+
+_version = 0
+_generation = 0
+_stale_firms: Set[str] = set()
+_snapshot: Optional[AccessMap] = None
+_lock = threading.Lock()
+
+
+def invalidate_access(*firm_ids: str):
+    """
+    The given firms' rows (the firm, its entities, their user assignments)
+    changed; reload them on the next check. With no firm, rebuild
+    everything. A company moved between firms needs both firms passed.
+    """
+    global _version
+    with _lock:
+        if firm_ids:
+            _stale_firms.update(firm_ids)
+        else:
+            _version += 1
+            _stale_firms.clear()
+
+
+def _load(db: Session, version: int) -> AccessMap:
+    firm_ids = {firm_id for (firm_id,) in db.query(CAFirm.firm_id).filter(CAFirm.is_active == True)}
+    companies = {
+        company_id: (firm_id, bool(is_active))
+        for company_id, firm_id, is_active in db.query(Entity.company_id, Entity.firm_id, Entity.is_active)
+    }
+    user_companies: Dict[str, Set[str]] = {}
+    for user_id, company_id in db.query(UserEntityMap.user_id, UserEntityMap.company_id):
+        user_companies.setdefault(user_id, set()).add(company_id)
+    return AccessMap(version, firm_ids, companies, user_companies)
+
+
+def _patch(db: Session, snapshot: AccessMap, firm_ids: Iterable[str]) -> AccessMap:
+    """`snapshot` with the rows of `firm_ids` reloaded; other firms are copied as they are"""
+    firm_ids = set(firm_ids)
+    loaded_firms = {
+        firm_id for (firm_id,) in db.query(CAFirm.firm_id).filter(
+            CAFirm.firm_id.in_(firm_ids), CAFirm.is_active == True
+        )
+    }
+    loaded_companies = {
+        company_id: (firm_id, bool(is_active))
+        for company_id, firm_id, is_active in db.query(
+            Entity.company_id, Entity.firm_id, Entity.is_active
+        ).filter(Entity.firm_id.in_(firm_ids))
+    }
+    loaded_assignments = db.query(UserEntityMap.user_id, UserEntityMap.company_id).join(
+        Entity, Entity.company_id == UserEntityMap.company_id
+    ).filter(Entity.firm_id.in_(firm_ids)).all()
+
+    dropped = set().union(*(snapshot.firm_companies.get(firm_id, ()) for firm_id in firm_ids))
+    dropped.update(loaded_companies)
+    companies = {
+        company_id: entry for company_id, entry in snapshot.companies.items() if company_id not in dropped
+    }
+    companies.update(loaded_companies)
+    user_companies: Dict[str, Set[str]] = {}
+    for user_id, assigned in snapshot.user_companies.items():
+        kept = assigned - dropped if not assigned.isdisjoint(dropped) else assigned
+        if kept:
+            user_companies[user_id] = kept
+    for user_id, company_id in loaded_assignments:
+        # Copy before adding: unchanged sets are shared with the old snapshot
+        user_companies[user_id] = user_companies.get(user_id, set()) | {company_id}
+
+    patched = AccessMap(snapshot.version, (snapshot.firm_ids - firm_ids) | loaded_firms, companies, user_companies)
+    patched.built_at = snapshot.built_at  # The TTL still counts from the last full load
+    return patched
+
+
+def _refresh(db: Session, snapshot: Optional[AccessMap], version: int, stale: Set[str]) -> AccessMap:
+    if snapshot is None or snapshot.version != version or \
+            time.monotonic() - snapshot.built_at >= settings.TENANT_ACCESS_CACHE_TTL_SECONDS:
+        return _load(db, version)
+    return _patch(db, snapshot, stale)
+
+
+def get_access_map(db: Session) -> AccessMap:
+    """
+    Current snapshot: rebuilt if fully invalidated or older than the TTL,
+    patched if only some firms were invalidated. `db` is used for the load
+    only if it is on the primary; a replica session is swapped for a
+    short-lived primary one.
+    """
+    global _snapshot, _generation
+    with _lock:
+        version, snapshot = _version, _snapshot
+        base_generation = snapshot.generation if snapshot is not None else 0
+        stale = set(_stale_firms)
+        _stale_firms.clear()
+    ttl = settings.TENANT_ACCESS_CACHE_TTL_SECONDS
+    if (not stale and snapshot is not None and snapshot.version == version
+            and time.monotonic() - snapshot.built_at < ttl):
+        return snapshot
+
+    try:
+        if database.is_replica_session(db):
+            primary = database.SessionLocal()
+            try:
+                snapshot = _refresh(primary, snapshot, version, stale)
+            finally:
+                primary.close()
+        else:
+            snapshot = _refresh(db, snapshot, version, stale)
+    except Exception:
+        with _lock:
+            _stale_firms.update(stale)
+        raise
+    with _lock:
+        # Install only over the snapshot this one was derived from. If another
+        # call installed first, ours would drop its patch, so the firms taken
+        # here go back on the stale list to be patched onto the newer one. An
+        # invalidation during the load leaves the version ahead (or the firm
+        # marked stale again), so the next call reloads either way.
+        current_generation = _snapshot.generation if _snapshot is not None else 0
+        if current_generation == base_generation:
+            _generation += 1
+            snapshot.generation = _generation
+            _snapshot = snapshot
+        else:
+            _stale_firms.update(stale)
+    return snapshot
+
+
+def get_user_accessible_firms(db: Session, user) -> List[str]:
+    """Firm IDs the user may act on: every active firm for Trenor admins, else their own"""
+    if user.role == UserRole.TRENOR_ADMIN:
+        return list(get_access_map(db).firm_ids)
+    elif user.firm_id:
+        return [user.firm_id]
+    else:
+        return []
+
+
+def get_user_accessible_companies(db: Session, user) -> Set[str]:
+    """Company IDs belonging to the firms the user may act on"""
+    access = get_access_map(db)
+    if user.role == UserRole.TRENOR_ADMIN:
+        return set(access.companies)
+    return set(access.firm_companies.get(user.firm_id, ())) if user.firm_id else set()
+
+
+def get_company_firm(db: Session, company_id: str, active_only: bool = False) -> Optional[str]:
+    """Firm owning the company, or None if the company is unknown (or inactive)"""
+    entry = get_access_map(db).companies.get(company_id)
+    if entry is None or (active_only and not entry[1]):
+        return None
+    return entry[0]
+
+
+def can_access_company(db: Session, user, company_id: str, active_only: bool = False) -> bool:
+    """Whether the company exists and belongs to a firm the user may act on"""
+    access = get_access_map(db)
+    entry = access.companies.get(company_id)
+    if entry is None or (active_only and not entry[1]):
+        return False
+    if user.role == UserRole.TRENOR_ADMIN:
+        return True
+    return user.firm_id is not None and entry[0] == user.firm_id
+
+
+def get_assigned_companies(db: Session, user_id: str) -> Set[str]:
+    """Companies explicitly assigned to the user through UserEntityMap"""
+    return set(get_access_map(db).user_companies.get(user_id, ()))
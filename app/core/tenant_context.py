@@ -1,13 +1,10 @@
 # app/core/tenant_context.py
 from fastapi import HTTPException, Depends, Header
-from sqlalchemy.orm import Session
-from typing import Optional, TYPE_CHECKING
-from app.core.database import get_db
-from app.tenant.models.firm import CAFirm
-from app.cdm.models.entity import Entity
-
-if TYPE_CHECKING:
-    from app.core.auth import AuthenticatedUser
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.core.database import get_async_db
+from app.core.auth import get_current_active_user, AuthenticatedUser
+from app.core.tenant_access import get_company_firm
 
 class TenantContext:
     def __init__(self, firm_id: str, company_id: str, user_id: str):
@@ -17,18 +14,13 @@ class TenantContext:
 
 async def get_tenant_context(
     x_company_id: str = Header(..., alias="X-Company-ID"),
-    db: Session = Depends(get_db)
+    current_user: AuthenticatedUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ) -> TenantContext:
     """
     Extract tenant context from headers and authenticated user.
     This ensures data isolation between CA firms and their clients.
     """
-    # Import here to avoid circular imports
-    from app.core.auth import get_current_active_user
-    
-    # Get authenticated user
-    current_user = await get_current_active_user()
-    
     if not x_company_id:
         raise HTTPException(
             status_code=400, 
@@ -36,13 +28,8 @@ async def get_tenant_context(
         )
 
     # Validate that the company belongs to this user's firm
-    entity = db.query(Entity).filter(
-        Entity.company_id == x_company_id,
-        Entity.firm_id == current_user.firm_id,
-        Entity.is_active == True
-    ).first()
-    
-    if not entity:
+    firm_id = await db.run_sync(get_company_firm, x_company_id, active_only=True)
+    if firm_id is None or firm_id != current_user.firm_id:
         raise HTTPException(
             status_code=404,
             detail="Company not found or not accessible by your firm"
@@ -56,7 +43,7 @@ async def get_tenant_context(
 
 async def get_optional_tenant_context(
     x_company_id: Optional[str] = Header(None, alias="X-Company-ID"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Optional[TenantContext]:
     """
     Optional tenant context for endpoints that can work with or without tenant context.
@@ -68,13 +55,8 @@ async def get_optional_tenant_context(
         current_user = await get_current_active_user()
         if x_company_id:
             # Validate that the company belongs to this user's firm
-            entity = db.query(Entity).filter(
-                Entity.company_id == x_company_id,
-                Entity.firm_id == current_user.firm_id,
-                Entity.is_active == True
-            ).first()
-            
-            if entity:
+            firm_id = await db.run_sync(get_company_firm, x_company_id, active_only=True)
+            if firm_id is not None and firm_id == current_user.firm_id:
                 return TenantContext(
                     firm_id=current_user.firm_id,
                     company_id=x_company_id,
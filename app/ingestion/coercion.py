@@ -0,0 +1,176 @@
+# app/ingestion/coercion.py
+"""
+Vectorized type coercion for parsed file chunks.
+Applies detect_schema's labels to a DataFrame column by column: dates are
+parsed with an explicit strptime format chosen from a sample of the values
+(Indian day-first layouts win ties; the choice is remembered per value
+shape for one column of one job and re-checked against each value), amounts
+handle lakh grouping, currency prefixes, parentheses and Dr/Cr suffixes.
+Every coercion reports how many values it could not parse.
+"""
+
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
+
+# Tried in order, so day-first layouts beat month-first for ambiguous dates
+DATE_FORMATS = [
+    "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y", "%d-%m-%y", "%d.%m.%y",
+    "%d-%b-%Y", "%d %b %Y", "%d/%b/%Y", "%d-%b-%y", "%d %b %y", "%d/%b/%y",
+    "%d-%B-%Y", "%d %B %Y", "%d %b, %Y", "%b %d, %Y",
+    "%Y-%m-%d", "%Y/%m/%d", "%Y%m%d",
+    "%Y-%m-%d %H:%M:%S", "%d/%m/%Y %H:%M:%S", "%d-%m-%Y %H:%M:%S", "%d/%m/%Y %H:%M",
+]
+DATE_SAMPLE_SIZE = 50
+
+# Values that mean "no amount" in bank exports
+EMPTY_AMOUNTS = {"", "-", "--", "NIL", "NA", "N/A"}
+
+AMOUNT_SAMPLE_SIZE = 200
+# Matches the whole value when it needs no cleaning beyond dropping commas
+PLAIN_AMOUNT = r"-?[\d,]*\.?\d*"
+# Everything that is not part of the number: currency prefix, Dr/Cr suffix, separators
+AMOUNT_NOISE = r"(?i)^(?:rs\.?|inr)|(?:dr|cr)\.?$|[^\d.]"
+AMOUNT_NEGATIVE = r"(?i)^[(\-]|dr\.?$"
+
+_SHAPE_DIGITS = re.compile(r"\d")
+_SHAPE_LETTERS = re.compile(r"[A-Za-z]")
+
+
+def _shape(value: str) -> str:
+    """'01/04/2024' -> '99/99/9999', '1-Apr-24' -> '9-aaa-99'"""
+    return _SHAPE_LETTERS.sub("a", _SHAPE_DIGITS.sub("9", value))
+
+
+def _parses(value: str, fmt: str) -> bool:
+    try:
+        datetime.strptime(value, fmt)
+        return True
+    except ValueError:
+        return False
+
+
+def _format_for(value: str, known: Dict[str, str]) -> Optional[str]:
+    """
+    strptime format for one value. `known` maps value shapes to the format
+    found for them earlier in the same column; it is only a hint, since
+    '13/04/2024' and '04/13/2024' share a shape, so a remembered format that
+    does not parse the value is looked up again and replaced.
+    """
+    shape = _shape(value)
+    fmt = known.get(shape)
+    if fmt is not None and _parses(value, fmt):
+        return fmt
+    fmt = next((candidate for candidate in DATE_FORMATS if _parses(value, candidate)), None)
+    if fmt is not None:
+        known[shape] = fmt
+    return fmt
+
+
+def _formats_for(values: pd.Series, known: Dict[str, str]) -> List[str]:
+    """Formats needed for a column, most common first, from a value sample"""
+    counts: Dict[str, int] = {}
+    for value in values.drop_duplicates().head(DATE_SAMPLE_SIZE):
+        fmt = _format_for(value, known)
+        if fmt:
+            counts[fmt] = counts.get(fmt, 0) + 1
+    return sorted(counts, key=counts.get, reverse=True)
+
+
+def coerce_dates(series: pd.Series, known_formats: Optional[Dict[str, str]] = None) -> Tuple[pd.Series, int]:
+    """
+    Parse a column to datetime64; returns the values and the error count.
+    Pass the same `known_formats` dict for every chunk of one column to
+    reuse its format choices; it must not be shared across columns or jobs.
+    """
+    if is_datetime64_any_dtype(series):
+        return series, 0
+    first = series.dropna().head(1)
+    if not first.empty and isinstance(first.iloc[0], (date, datetime, pd.Timestamp)):
+        values = pd.to_datetime(series, errors="coerce")
+        return values, int((series.notna() & values.isna()).sum())
+
+    text = series.astype("string").str.strip()
+    pending = (text.notna() & (text != "")).fillna(False).astype(bool)
+    result = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+    known = {} if known_formats is None else known_formats
+    for fmt in _formats_for(text[pending], known):
+        if not pending.any():
+            break
+        parsed = pd.to_datetime(text[pending], format=fmt, errors="coerce")
+        parsed = parsed[parsed.notna()]
+        result.loc[parsed.index] = parsed
+        pending.loc[parsed.index] = False
+    return result, int(pending.sum())
+
+
+def _amounts_from_text(text: pd.Series) -> pd.Series:
+    negative = text.str.contains(AMOUNT_NEGATIVE, regex=True).fillna(False).astype(bool)
+    values = pd.to_numeric(text.str.replace(AMOUNT_NOISE, "", regex=True), errors="coerce").astype(float)
+    return values.where(~negative, -values)
+
+
+def coerce_amounts(series: pd.Series) -> Tuple[pd.Series, int]:
+    """
+    Parse a column of amounts to float. '1,23,456.00', 'Rs. 500', '(200.00)'
+    and '750.00 Dr' are all understood; parentheses, a leading minus and a
+    Dr suffix make the value negative. Returns the values and the error count.
+    """
+    if is_numeric_dtype(series):
+        return series.astype(float), 0
+
+    text = series.astype("string").str.strip()
+    sample = text.dropna().head(AMOUNT_SAMPLE_SIZE)
+    if sample.str.fullmatch(PLAIN_AMOUNT).all():
+        # Plain (optionally comma-grouped) numbers: skip the regex clean-up
+        values = pd.to_numeric(text.str.replace(",", "", regex=False), errors="coerce").astype(float)
+        rest = (text.notna() & values.isna()).fillna(False).astype(bool)
+        if rest.any():
+            values.loc[rest] = _amounts_from_text(text[rest])
+    else:
+        values = _amounts_from_text(text)
+
+    failed = text[(text.notna() & values.isna()).fillna(False).astype(bool)]
+    return values, int((~failed.str.upper().isin(EMPTY_AMOUNTS)).sum())
+
+
+def coerce_frame(
+    df: pd.DataFrame,
+    schema: Dict[str, str],
+    max_error_rate: float = 0.5,
+    date_formats: Optional[Dict[str, Dict[str, str]]] = None
+) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Apply schema labels ("datetime", "float", "category", "string") to a
+    chunk. A column where more than `max_error_rate` of the non-empty values
+    fail is left as it was, since the label was most likely wrong. Returns
+    the coerced frame and {column: unparseable value count}. Pass one
+    `date_formats` dict per job to carry date format choices across chunks.
+    """
+    if date_formats is None:
+        date_formats = {}
+    coerced = df.copy()
+    errors: Dict[str, int] = {}
+    for column, label in schema.items():
+        if column not in coerced:
+            continue
+        series = coerced[column]
+        if label == "datetime":
+            values, failed = coerce_dates(series, date_formats.setdefault(column, {}))
+        elif label == "float":
+            values, failed = coerce_amounts(series)
+        elif label == "category":
+            values, failed = series.astype("category"), 0
+        else:
+            values, failed = series.astype("string").str.strip(), 0
+
+        if failed:
+            errors[column] = failed
+            non_empty = int(series.notna().sum())
+            if non_empty and failed / non_empty > max_error_rate:
+                continue
+        coerced[column] = values
+    return coerced, errors
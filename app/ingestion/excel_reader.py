@@ -0,0 +1,142 @@
+# app/ingestion/excel_reader.py
+"""
+Streaming Excel reader.
+Workbooks are read row by row, through python-calamine when it is installed
+(Rust, several times faster than openpyxl) or openpyxl in read-only mode,
+and handed out as DataFrame chunks like CSVs are, so memory stays bounded
+for 200k-row Tally and bank exports. Preamble rows above the table (bank
+name, account number, period) are skipped by locating the header row, only
+columns with a header are kept, and only sheets carrying that same header
+are read.
+"""
+
+import os
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from app.core.config import settings
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+CALAMINE_EXTENSIONS = {"xlsx", "xlsm", "xls", "xlsb", "ods"}
+OPENPYXL_EXTENSIONS = {"xlsx", "xlsm"}
+
+# A header row has at least this many cells, all of them text
+MIN_HEADER_CELLS = 3
+
+
+def excel_engine(extension: str) -> Optional[str]:
+    """Streaming engine available for this kind of workbook, if any"""
+    if CalamineWorkbook is not None and extension in CALAMINE_EXTENSIONS:
+        return "calamine"
+    if openpyxl is not None and extension in OPENPYXL_EXTENSIONS:
+        return "openpyxl"
+    return None
+
+
+def _iter_sheets(path: str, engine: str) -> Iterator[Iterator[tuple]]:
+    if engine == "calamine":
+        workbook = CalamineWorkbook.from_path(path)
+        for name in workbook.sheet_names:
+            yield iter(workbook.get_sheet_by_name(name).iter_rows())
+        return
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            yield sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _is_empty(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def find_header(rows: Iterator[tuple], scan_rows: int) -> Optional[List]:
+    """Consume rows up to and including the header row; None if not found"""
+    for row in islice(rows, scan_rows):
+        cells = [value for value in row if not _is_empty(value)]
+        if len(cells) >= MIN_HEADER_CELLS and all(isinstance(value, str) for value in cells):
+            return list(row)
+    return None
+
+
+def _columns(header: List) -> List[Tuple[int, str]]:
+    """(position, name) of the header's named columns, de-duplicated like read_csv"""
+    seen = {}
+    columns = []
+    for position, value in enumerate(header):
+        if _is_empty(value):
+            continue
+        name = str(value).strip()
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        columns.append((position, f"{name}.{count}" if count else name))
+    return columns
+
+
+def iter_excel_chunks(path: str, extension: str, chunksize: int = None) -> Iterator[pd.DataFrame]:
+    """
+    Stream a workbook as DataFrames of at most `chunksize` rows. The first
+    sheet with a recognisable header row sets the columns; later sheets are
+    read only if their header is the same (e.g. one sheet per month).
+    """
+    chunksize = chunksize or settings.INGEST_CHUNK_ROWS
+    scan_rows = settings.INGEST_EXCEL_HEADER_SCAN_ROWS
+    engine = excel_engine(extension)
+    if engine is None:
+        raise ImportError(f"No streaming Excel reader installed for .{extension} files")
+
+    expected = None
+    offset = 0  # Index continues across chunks, as with chunked read_csv
+    for rows in _iter_sheets(path, engine):
+        header = find_header(rows, scan_rows)
+        if header is None:
+            continue
+        columns = _columns(header)
+        if expected is None:
+            expected = columns
+        elif columns != expected:
+            continue
+
+        positions = [position for position, _ in columns]
+        names = [name for _, name in columns]
+        batch = []
+        for row in rows:
+            values = [row[p] if p < len(row) else None for p in positions]
+            if all(_is_empty(value) for value in values):
+                continue
+            batch.append(values)
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch, columns=names, index=range(offset, offset + len(batch)))
+                offset += len(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=names, index=range(offset, offset + len(batch)))
+            offset += len(batch)
+
+
+def spool_excel_chunks(path: str, extension: str, chunksize: int, spool_dir: str) -> List[str]:
+    """
+    Parser-pool entry point: stream the workbook and pickle each chunk into
+    `spool_dir`, returning the chunk files in order. The workbook is parsed
+    in a worker process (off the GIL of the server) while memory stays
+    bounded by one chunk on each side.
+    """
+    paths = []
+    for number, chunk in enumerate(iter_excel_chunks(path, extension, chunksize)):
+        chunk_path = os.path.join(spool_dir, f"chunk-{number:06d}.pkl")
+        chunk.to_pickle(chunk_path)
+        paths.append(chunk_path)
+    return paths
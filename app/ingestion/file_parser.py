@@ -3,12 +3,44 @@ import pandas as pd
 import chardet
 from PyPDF2 import PdfReader
 import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import warnings
+from pandas.errors import ParserWarning
+from typing import Iterator, List, Tuple
+
+from app.core.config import settings
+from app.utils.helpers import checksum_hasher
+from app.ingestion.parser_pool import iter_in_parser_pool
+from app.ingestion.pdf_tables import StatementTableAssembler, extract_pdf_rows, records_to_frame
+from app.ingestion.excel_reader import excel_engine, spool_excel_chunks
 
 class FileTypeUnsupportedError(Exception):
     pass
 
+# The C parser only reports skipped lines through warnings, and
+# catch_warnings swaps process-global state; chunk reads that capture
+# them are serialized (the tokenizer holds the GIL regardless)
+_bad_line_lock = threading.Lock()
+BAD_LINE = re.compile(r"Skipping line (\d+): ([^\n]*)")
+
+def file_extension(filename: str) -> str:
+    return filename.split(".")[-1].lower()
+
+def pdf_page_lines(pages) -> List[str]:
+    """Text lines of the given pages, extracting each page once"""
+    lines = []
+    for page in pages:
+        text = page.extract_text()
+        if text:
+            lines.extend(text.splitlines())
+    return lines
+
 def parse_file(file_obj: io.BytesIO, filename: str) -> pd.DataFrame:
-    ext = filename.split(".")[-1].lower()
+    ext = file_extension(filename)
 
     if ext in ["csv"]:
         raw = file_obj.read()
@@ -21,10 +53,196 @@ def parse_file(file_obj: io.BytesIO, filename: str) -> pd.DataFrame:
         df = pd.read_xml(file_obj)
     elif ext in ["pdf"]:
         reader = PdfReader(file_obj)
-        text = "\n".join([p.extract_text() for p in reader.pages if p.extract_text()])
-        df = pd.DataFrame({"text": text.splitlines()})
+        df = pd.DataFrame({"text": pdf_page_lines(reader.pages)})
     else:
         raise FileTypeUnsupportedError(f"Unsupported file type: {ext}")
 
     df = df.dropna(how="all").reset_index(drop=True)
-    return df
\ No newline at end of file
+    return df
+
+async def spool_upload(upload, block_size: int = None) -> Tuple[str, str]:
+    """
+    Copy an UploadFile to a temporary file on disk block by block, hashing
+    it on the way. Returns the path and the SHA256 checksum of the content;
+    the caller is responsible for removing the file.
+    """
+    block_size = block_size or settings.INGEST_SPOOL_BLOCK_BYTES
+    suffix = "." + file_extension(upload.filename or "upload")
+    fd, path = tempfile.mkstemp(prefix="ingest-", suffix=suffix)
+    hasher = checksum_hasher()
+    try:
+        with os.fdopen(fd, "wb") as spooled:
+            while True:
+                block = await upload.read(block_size)
+                if not block:
+                    break
+                hasher.update(block)
+                spooled.write(block)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, hasher.hexdigest()
+
+def detect_encoding(path: str, sample_size: int = None) -> str:
+    """Guess a text file's encoding from its first `sample_size` bytes"""
+    with open(path, "rb") as f:
+        sample = f.read(sample_size or settings.INGEST_ENCODING_SAMPLE_BYTES)
+    encoding = chardet.detect(sample)["encoding"] or "utf-8"
+    # An all-ASCII sample says nothing about the rest of the file; UTF-8 is
+    # the ASCII superset that won't fail on a later non-ASCII byte
+    if encoding.lower() == "ascii":
+        return "utf-8"
+    return encoding
+
+def is_streamable(filename: str) -> bool:
+    """Formats that iter_file_chunks reads incrementally rather than whole"""
+    ext = file_extension(filename)
+    return ext in ["csv"] or excel_engine(ext) is not None
+
+def parse_path(path: str, filename: str) -> pd.DataFrame:
+    """parse_file for a file on disk; picklable entry point for worker processes"""
+    with open(path, "rb") as f:
+        return parse_file(f, filename)
+
+def iter_excel_chunks_in_pool(path: str, extension: str, chunksize: int = None,
+                              timeout: float = None) -> Iterator[pd.DataFrame]:
+    """
+    Stream a workbook through the parser pool: a worker process reads it
+    row by row and spools pickled chunks to a temporary directory, which are
+    then handed out and removed one at a time. Blocking; consume from a
+    worker thread.
+    """
+    chunksize = chunksize or settings.INGEST_CHUNK_ROWS
+    spool_dir = tempfile.mkdtemp(prefix="ingest-xlsx-")
+    try:
+        (chunk_paths,) = list(iter_in_parser_pool(
+            spool_excel_chunks, [(path, extension, chunksize, spool_dir)], timeout=timeout
+        ))
+        for chunk_path in chunk_paths:
+            chunk = pd.read_pickle(chunk_path)
+            os.remove(chunk_path)
+            yield chunk
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+def iter_pdf_chunks(path: str, pages_per_task: int = None, timeout: float = None,
+                    sample_ranges: int = None) -> Iterator[pd.DataFrame]:
+    """
+    Extract a PDF with page ranges fanned out across the parser pool, yielding
+    a DataFrame per range, in page order, as soon as each range is done.
+    Statements with a recognisable transaction table header in one of their
+    first `sample_ranges` page ranges come out as typed rows (see pdf_tables),
+    skipping any cover pages ahead of the table; anything else falls back to
+    a single "text" column of lines. Every chunk of a file has the same
+    columns, so text read while sampling is held back until the mode is
+    known. The index continues across chunks, as with chunked read_csv.
+    Blocking; consume from a worker thread.
+    """
+    pages_per_task = max(1, pages_per_task or settings.INGEST_PDF_PAGES_PER_TASK)
+    sample_ranges = max(1, sample_ranges or settings.INGEST_PDF_LAYOUT_SAMPLE_RANGES)
+    page_count = len(PdfReader(path).pages)
+    ranges = [
+        (path, start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+
+    assembler = StatementTableAssembler()
+    table_mode = None
+    sampled: List[pd.DataFrame] = []
+    offset = 0  # Rows handed out so far (or held in `sampled`)
+    for index, pages in enumerate(iter_in_parser_pool(extract_pdf_rows, ranges, timeout=timeout)):
+        if table_mode is not False:
+            records = [record for rows in pages for record in assembler.feed_page(rows)]
+            if table_mode is None and assembler.layout is not None:
+                # The held-back cover text is dropped, and with it its row numbers
+                table_mode, sampled, offset = True, [], 0
+            elif table_mode is None and index + 1 >= sample_ranges:
+                table_mode = False
+
+        if table_mode:
+            if records:
+                yield records_to_frame(records, start=offset)
+                offset += len(records)
+            continue
+
+        lines = [" ".join(text for _, text in row) for rows in pages for row in rows]
+        if lines:
+            sampled.append(pd.DataFrame({"text": lines}, index=range(offset, offset + len(lines))))
+            offset += len(lines)
+        if table_mode is False:
+            yield from sampled
+            sampled = []
+
+    # A file shorter than the sample without any header is all text
+    yield from sampled
+    if table_mode:
+        records = assembler.finish()
+        if records:
+            yield records_to_frame(records, start=offset)
+
+def split_frame(df: pd.DataFrame, chunksize: int = None) -> Iterator[pd.DataFrame]:
+    chunksize = chunksize or settings.INGEST_CHUNK_ROWS
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+def _read_chunk(reader) -> Tuple[pd.DataFrame, List[Tuple[int, str]]]:
+    """Next chunk from a CSV reader (None when exhausted) and the lines it skipped"""
+    with _bad_line_lock, warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", ParserWarning)
+        chunk = next(reader, None)
+    bad = []
+    for warning in caught:
+        matches = BAD_LINE.findall(str(warning.message)) if warning.category is ParserWarning else []
+        if matches:
+            bad.extend((int(number), reason.strip()) for number, reason in matches)
+        else:
+            warnings.warn_explicit(warning.message, warning.category, warning.filename, warning.lineno)
+    return chunk, bad
+
+def iter_file_chunks(path: str, filename: str, chunksize: int = None) -> Iterator[pd.DataFrame]:
+    """
+    Parse a file on disk into DataFrame batches of at most `chunksize` rows.
+    CSVs and (with a streaming engine installed) Excel workbooks are
+    streamed, workbooks from a parser-pool process, so memory stays flat
+    regardless of file size; other formats
+    are parsed whole and then handed out in batches. Malformed CSV
+    lines are skipped and listed, as (line number, text, reason), in
+    attrs["bad_lines"] of the chunk read alongside them (possibly empty).
+    """
+    chunksize = chunksize or settings.INGEST_CHUNK_ROWS
+    ext = file_extension(filename)
+
+    if ext == "csv":
+        encoding = detect_encoding(path)
+        reader = pd.read_csv(
+            path,
+            encoding=encoding,
+            encoding_errors="replace",
+            on_bad_lines="warn",
+            chunksize=chunksize
+        )
+        with reader, open(path, encoding=encoding, errors="replace") as raw:
+            lines_read, text = 0, ""
+            while True:
+                chunk, bad = _read_chunk(reader)
+                if chunk is None and not bad:
+                    break
+                chunk = pd.DataFrame() if chunk is None else chunk.dropna(how="all")
+                if bad:
+                    # Only files with malformed lines pay for this second read
+                    bad_lines = []
+                    for number, reason in bad:
+                        while lines_read < number:
+                            text = raw.readline()
+                            lines_read += 1
+                        bad_lines.append((number, text.rstrip("\r\n"), reason))
+                    chunk.attrs["bad_lines"] = bad_lines
+                if not chunk.empty or bad:
+                    yield chunk
+        return
+
+    if excel_engine(ext):
+        yield from iter_excel_chunks_in_pool(path, ext, chunksize)
+        return
+
+    yield from split_frame(parse_path(path, filename), chunksize)
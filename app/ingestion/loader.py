@@ -0,0 +1,308 @@
+# app/ingestion/loader.py
+"""
+Bulk loading of parsed file chunks into the CDM external tables.
+Detected columns are mapped onto BankStatement / GSTSales / GSTPurchases,
+values are coerced and dedup hashes computed column-wise, and each chunk is
+written with a batched INSERT ... ON CONFLICT DO NOTHING on the hash column.
+"""
+
+import hashlib
+import re
+import uuid
+from typing import Dict, List, Tuple
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.ingestion.coercion import coerce_amounts, coerce_dates
+from app.cdm.models.external import BankStatement, GSTSales, GSTPurchases
+
+TARGET_MODELS = {
+    "bank_statements": BankStatement,
+    "gst_sales": GSTSales,
+    "gst_purchases": GSTPurchases,
+}
+
+HASH_COLUMNS = {
+    "bank_statements": "txn_hash",
+    "gst_sales": "invoice_hash",
+    "gst_purchases": "invoice_hash",
+}
+
+# (field, header pattern) in priority order; each header maps to one field
+COLUMN_RULES = {
+    "bank_statements": [
+        ("value_date", r"value\s*d(ate|t)"),
+        ("txn_date", r"date|^dt$"),
+        ("debit", r"withdrawal|debit|^dr\.?\s*amount|paid\s*out"),
+        ("credit", r"deposit|credit|^cr\.?\s*amount|paid\s*in"),
+        ("dr_cr", r"^(dr\s*/\s*cr|cr\s*/\s*dr|dr_cr|type|txn\s*type)$"),
+        ("balance_after_txn", r"balance"),
+        ("cheque_ref", r"ch(e)?q|ref|utr"),
+        ("amount", r"amount|amt"),
+        ("narration", r"narration|description|particulars|remarks|details"),
+    ],
+    "gst_sales": [
+        ("gstin_customer", r"gstin|gst\s*no"),
+        ("invoice_number", r"inv(oice)?\.?\s*(no|num|number|#)"),
+        ("invoice_date", r"date"),
+        ("taxable_value", r"taxable"),
+        ("tax_amount", r"tax\s*amount|total\s*tax|^tax$"),
+        ("total_value", r"invoice\s*value|total"),
+    ],
+    "gst_purchases": [
+        ("supplier_gstin", r"gstin|gst\s*no"),
+        ("invoice_number", r"inv(oice)?\.?\s*(no|num|number|#)"),
+        ("invoice_date", r"date"),
+        ("taxable_value", r"taxable"),
+        ("igst_amount", r"igst|integrated"),
+        ("cgst_amount", r"cgst|central"),
+        ("sgst_amount", r"sgst|utgst|state"),
+    ],
+}
+COMPILED_RULES = {
+    target: [(field, re.compile(pattern, re.IGNORECASE)) for field, pattern in rules]
+    for target, rules in COLUMN_RULES.items()
+}
+
+REQUIRED_FIELDS = {
+    "bank_statements": ["txn_date"],
+    "gst_sales": ["invoice_number", "invoice_date", "taxable_value", "total_value"],
+    "gst_purchases": ["invoice_number", "invoice_date", "taxable_value"],
+}
+
+
+class ColumnMappingError(ValueError):
+    pass
+
+
+def map_columns(columns: List[str], target: str) -> Dict[str, str]:
+    """Map target fields to source column names using the header rules"""
+    mapping: Dict[str, str] = {}
+    used = set()
+    for field, pattern in COMPILED_RULES[target]:
+        for col in columns:
+            if col not in used and pattern.search(str(col).strip()):
+                mapping[field] = col
+                used.add(col)
+                break
+
+    missing = [f for f in REQUIRED_FIELDS[target] if f not in mapping]
+    if target == "bank_statements" and not (
+        "amount" in mapping or "debit" in mapping or "credit" in mapping
+    ):
+        missing.append("amount")
+    if missing:
+        raise ColumnMappingError(
+            f"Could not find columns for {', '.join(missing)} in {list(columns)}"
+        )
+    return mapping
+
+
+def to_date(series: pd.Series) -> pd.Series:
+    return coerce_dates(series)[0].dt.date
+
+
+def to_amount(series: pd.Series) -> pd.Series:
+    return coerce_amounts(series)[0].round(2)
+
+
+def _text(series: pd.Series) -> pd.Series:
+    return series.astype("string").str.strip().replace("", pd.NA)
+
+
+def _hash_key(*parts: pd.Series) -> pd.Series:
+    """Concatenate columns the way the models' generate_hash() f-strings do"""
+    key = pd.Series("", index=parts[0].index, dtype=object)
+    for part in parts:
+        key = key + part.astype(object).where(part.notna(), None).map(str)
+    return key
+
+
+def _sha256(keys: pd.Series) -> pd.Series:
+    return pd.Series(
+        [hashlib.sha256(k.encode()).hexdigest() for k in keys],
+        index=keys.index
+    )
+
+
+def _money(series: pd.Series) -> pd.Series:
+    """Render amounts like Numeric(18,2) Decimals, for hash parity"""
+    return series.map(lambda v: f"{v:.2f}" if pd.notna(v) else None)
+
+
+def build_bank_rows(chunk: pd.DataFrame, mapping: Dict[str, str], company_id: str, bank_id: str) -> pd.DataFrame:
+    rows = pd.DataFrame(index=chunk.index)
+    rows["txn_date"] = to_date(chunk[mapping["txn_date"]])
+    if "value_date" in mapping:
+        rows["value_date"] = to_date(chunk[mapping["value_date"]])
+    rows["narration"] = _text(chunk[mapping["narration"]]) if "narration" in mapping else pd.NA
+    if "cheque_ref" in mapping:
+        rows["cheque_ref"] = _text(chunk[mapping["cheque_ref"]])
+    if "balance_after_txn" in mapping:
+        rows["balance_after_txn"] = to_amount(chunk[mapping["balance_after_txn"]])
+
+    if "debit" in mapping or "credit" in mapping:
+        # Separate columns carry the side already; a stray Dr/Cr suffix must not flip it
+        debit = to_amount(chunk[mapping["debit"]]).abs().fillna(0) if "debit" in mapping else 0
+        credit = to_amount(chunk[mapping["credit"]]).abs().fillna(0) if "credit" in mapping else 0
+        signed = pd.Series(credit - debit, index=chunk.index)
+        rows["amount"] = signed.abs().where(signed != 0)
+        rows["dr_cr"] = signed.map(lambda v: "Dr" if v < 0 else "Cr")
+    else:
+        signed = to_amount(chunk[mapping["amount"]])
+        rows["amount"] = signed.abs()
+        if "dr_cr" in mapping:
+            side = chunk[mapping["dr_cr"]].astype(str).str.strip().str.upper().str[:1]
+            rows["dr_cr"] = side.map({"D": "Dr", "C": "Cr"})
+        else:
+            rows["dr_cr"] = signed.map(lambda v: "Dr" if v < 0 else "Cr")
+
+    rows["company_id"] = company_id
+    rows["bank_id"] = bank_id
+    rows["reconciliation_status"] = "Unmatched"
+    rows["txn_hash"] = _sha256(_hash_key(
+        rows["bank_id"], rows["txn_date"], _money(rows["amount"]), rows["dr_cr"], rows["narration"]
+    ))
+    return rows
+
+
+def build_gst_sales_rows(chunk: pd.DataFrame, mapping: Dict[str, str], company_id: str) -> pd.DataFrame:
+    rows = pd.DataFrame(index=chunk.index)
+    rows["invoice_number"] = _text(chunk[mapping["invoice_number"]])
+    rows["invoice_date"] = to_date(chunk[mapping["invoice_date"]])
+    rows["taxable_value"] = to_amount(chunk[mapping["taxable_value"]])
+    rows["total_value"] = to_amount(chunk[mapping["total_value"]])
+    if "gstin_customer" in mapping:
+        rows["gstin_customer"] = _text(chunk[mapping["gstin_customer"]]).str.upper()
+    rows["tax_amount"] = (
+        to_amount(chunk[mapping["tax_amount"]]) if "tax_amount" in mapping
+        else (rows["total_value"] - rows["taxable_value"]).round(2)
+    )
+
+    rows["company_id"] = company_id
+    rows["status"] = "Active"
+    rows["reconciliation_status"] = "Unmatched"
+    rows["invoice_hash"] = _sha256(_hash_key(
+        rows["company_id"], rows["invoice_number"], rows["invoice_date"], _money(rows["total_value"])
+    ))
+    return rows
+
+
+def build_gst_purchase_rows(chunk: pd.DataFrame, mapping: Dict[str, str], company_id: str) -> pd.DataFrame:
+    rows = pd.DataFrame(index=chunk.index)
+    rows["invoice_number"] = _text(chunk[mapping["invoice_number"]])
+    rows["invoice_date"] = to_date(chunk[mapping["invoice_date"]])
+    rows["taxable_value"] = to_amount(chunk[mapping["taxable_value"]])
+    rows["supplier_gstin"] = (
+        _text(chunk[mapping["supplier_gstin"]]).str.upper() if "supplier_gstin" in mapping else pd.NA
+    )
+    for field in ("igst_amount", "cgst_amount", "sgst_amount"):
+        rows[field] = to_amount(chunk[mapping[field]]).fillna(0) if field in mapping else 0.0
+
+    rows["company_id"] = company_id
+    rows["itc_available"] = True
+    rows["reconciliation_status"] = "Unmatched"
+    rows["invoice_hash"] = _sha256(_hash_key(
+        rows["company_id"], rows["supplier_gstin"], rows["invoice_number"], rows["invoice_date"]
+    ))
+    return rows
+
+
+def build_rows(
+    target: str,
+    chunk: pd.DataFrame,
+    mapping: Dict[str, str],
+    company_id: str,
+    bank_id: str = None,
+    raw: pd.DataFrame = None
+) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Turn a parsed chunk into insertable rows for `target`.
+    `raw` is the chunk as read from the file, before coercion, for raw_json.
+    Returns the valid rows and, indexed like the chunk, the reason each
+    invalid row was dropped.
+    """
+    raw = chunk if raw is None else raw
+    if target == "bank_statements":
+        rows = build_bank_rows(chunk, mapping, company_id, bank_id)
+        required = ["txn_date", "amount", "dr_cr"]
+    elif target == "gst_sales":
+        rows = build_gst_sales_rows(chunk, mapping, company_id)
+        required = REQUIRED_FIELDS[target]
+    else:
+        rows = build_gst_purchase_rows(chunk, mapping, company_id)
+        required = REQUIRED_FIELDS[target]
+
+    missing = rows[required].isna()
+    invalid = missing.any(axis=1)
+    valid = rows[~invalid]
+    valid = valid.assign(raw_json=raw.loc[valid.index].astype(str).to_dict("records"))
+    # Reasons are only built for the (few) rejected rows
+    reasons = pd.Series(
+        ["missing or unparseable " + ", ".join(missing.columns[flags]) for flags in missing[invalid].to_numpy()],
+        index=rows.index[invalid],
+        dtype=object
+    )
+    return valid, reasons
+
+
+def _records(rows: pd.DataFrame, primary_key: str) -> List[Dict]:
+    rows = rows.astype(object).where(rows.notna(), None)
+    records = rows.to_dict("records")
+    for record in records:
+        record[primary_key] = str(uuid.uuid4())
+    return records
+
+
+def _conflict_insert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def insert_ignoring_duplicates(db: Session, target: str, rows: pd.DataFrame) -> int:
+    """
+    Insert rows in multi-row batches, skipping any whose hash already exists.
+    Returns the number of rows actually inserted. The caller commits.
+    """
+    model = TARGET_MODELS[target]
+    hash_column = HASH_COLUMNS[target]
+    rows = rows.drop_duplicates(subset=[hash_column])
+    if rows.empty:
+        return 0
+
+    primary_key = model.__table__.primary_key.columns.keys()[0]
+    insert = _conflict_insert(db)
+    if insert is None:
+        # No ON CONFLICT support: drop already-stored hashes up front
+        existing = {
+            h for (h,) in db.query(getattr(model, hash_column)).filter(
+                getattr(model, hash_column).in_(rows[hash_column].tolist())
+            )
+        }
+        rows = rows[~rows[hash_column].isin(existing)]
+        if rows.empty:
+            return 0
+        db.execute(model.__table__.insert(), _records(rows, primary_key))
+        return len(rows)
+
+    # One cached statement executed over many parameter sets; the driver
+    # batches it into multi-row VALUES. RETURNING only yields rows that were
+    # actually inserted, which gives an exact count on every driver.
+    statement = insert(model.__table__).on_conflict_do_nothing(
+        index_elements=[hash_column]
+    ).returning(model.__table__.c[hash_column])
+
+    inserted = 0
+    records = _records(rows, primary_key)
+    size = settings.INGEST_INSERT_BATCH_ROWS
+    for start in range(0, len(records), size):
+        inserted += len(db.execute(statement, records[start:start + size]).all())
+    return inserted
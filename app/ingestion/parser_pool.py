@@ -0,0 +1,164 @@
+# app/ingestion/parser_pool.py
+"""
+Bounded process pool for CPU-bound file parsing.
+Excel/PDF/XML parsing holds the GIL for seconds at a time; running it in a
+separate process keeps the event loop (and every other tenant's requests)
+responsive. Workers run under an address-space cap and every call has a
+timeout, after which the pool's workers are killed and the pool rebuilt.
+A process pool cannot lose one worker without breaking, so the other
+tenants' parses in flight on it are run again on the new pool (within
+their own timeouts) instead of failing with BrokenProcessPool.
+"""
+
+import asyncio
+import multiprocessing
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, run uncapped
+    resource = None
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+# Pools killed because one call timed out; calls they broke are rerun
+_timed_out_pools: "weakref.WeakSet[ProcessPoolExecutor]" = weakref.WeakSet()
+
+
+class ParserTimeoutError(TimeoutError):
+    pass
+
+
+def _limit_memory(max_mb: int):
+    """Worker initializer: cap the worker's address space"""
+    if resource is None or max_mb <= 0:
+        return
+    limit = max_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _mp_context():
+    # Forking a threaded server process is unsafe; forkserver forks from a
+    # clean single-threaded helper instead
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def get_parser_pool() -> ProcessPoolExecutor:
+    """Process-wide parser pool, created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.INGEST_PARSER_WORKERS,
+                mp_context=_mp_context(),
+                initializer=_limit_memory,
+                initargs=(settings.INGEST_PARSER_MEMORY_MB,)
+            )
+        return _pool
+
+
+def shutdown_parser_pool(kill: bool = False):
+    """
+    Drop the current pool so the next call builds a fresh one. With `kill`,
+    running workers are terminated instead of waited for.
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        _stop(pool, kill)
+
+
+def _stop(pool: ProcessPoolExecutor, kill: bool):
+    if kill:
+        # ProcessPoolExecutor has no public way to stop a running task
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+    pool.shutdown(wait=not kill, cancel_futures=True)
+
+
+def _discard_pool(pool: ProcessPoolExecutor, timed_out: bool = False):
+    """Kill `pool`, and drop it if it is still the current one (never a newer pool)"""
+    global _pool
+    with _pool_lock:
+        if timed_out:
+            _timed_out_pools.add(pool)
+        if _pool is pool:
+            _pool = None
+    _stop(pool, kill=True)
+
+
+def _timeout_error(timeout: float) -> ParserTimeoutError:
+    return ParserTimeoutError(f"Parsing did not finish within {timeout:g} seconds")
+
+
+async def run_in_parser_pool(func: Callable, *args, timeout: Optional[float] = None) -> Any:
+    """
+    Run `func(*args)` in the parser pool without blocking the event loop.
+    `func` and its arguments must be picklable. Raises ParserTimeoutError
+    when the call exceeds `timeout` seconds.
+    """
+    timeout = timeout or settings.INGEST_PARSER_TIMEOUT_SECONDS
+    deadline = time.monotonic() + timeout
+    while True:
+        pool = get_parser_pool()
+        try:
+            future = asyncio.get_running_loop().run_in_executor(pool, func, *args)
+            return await asyncio.wait_for(future, timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            _discard_pool(pool, timed_out=True)
+            raise _timeout_error(timeout)
+        except BrokenProcessPool:
+            if pool not in _timed_out_pools:
+                # A worker died (e.g. killed by the OOM killer); start over next time
+                _discard_pool(pool)
+                raise
+            if time.monotonic() >= deadline:
+                raise _timeout_error(timeout)
+            # Another call's timeout killed the workers: run again on the new pool
+
+
+def iter_in_parser_pool(
+    func: Callable,
+    arg_tuples: Iterable[Tuple],
+    timeout: Optional[float] = None
+) -> Iterator[Any]:
+    """
+    Fan `func(*args)` out over the pool for every tuple in `arg_tuples` and
+    yield results in submission order as they complete. Blocking: meant to be
+    consumed from a worker thread. `timeout` bounds the whole run.
+    """
+    timeout = timeout or settings.INGEST_PARSER_TIMEOUT_SECONDS
+    deadline = time.monotonic() + timeout
+    arg_tuples = list(arg_tuples)
+    done = 0
+    while done < len(arg_tuples):
+        pool = get_parser_pool()
+        futures = []
+        try:
+            futures = [pool.submit(func, *args) for args in arg_tuples[done:]]
+            for future in futures:
+                result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                done += 1
+                yield result
+        except FutureTimeoutError:
+            _discard_pool(pool, timed_out=True)
+            raise _timeout_error(timeout)
+        except BrokenProcessPool:
+            if pool not in _timed_out_pools:
+                _discard_pool(pool)
+                raise
+            if time.monotonic() >= deadline:
+                raise _timeout_error(timeout)
+            # Another call's timeout killed the workers: resubmit what is left
+        finally:
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,172 @@
+# app/ingestion/pdf_tables.py
+"""
+Layout-aware table extraction for PDF bank statements.
+Text fragments are pulled out with their page coordinates, grouped into
+visual rows, and the statement's header row (Date / Narration / Chq-Ref /
+Value Date / Withdrawal / Deposit / Balance, as laid out by the common
+Indian bank formats) fixes the column x-positions used to split every
+following row. Wrapped narration lines are folded into the transaction
+above them, so the output is one typed row per transaction.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from PyPDF2 import PdfReader
+
+from app.ingestion.coercion import coerce_amounts, coerce_dates
+
+Cell = Tuple[float, str]   # (x, text)
+Row = List[Cell]
+
+# Output column names; chosen so loader.map_columns recognises them
+TXN_DATE = "Txn Date"
+VALUE_DATE = "Value Date"
+NARRATION = "Narration"
+REFERENCE = "Ref No"
+DEBIT = "Debit"
+CREDIT = "Credit"
+BALANCE = "Balance"
+
+HEADER_PATTERNS = [
+    (VALUE_DATE, re.compile(r"value\s*d(ate|t)", re.IGNORECASE)),
+    (TXN_DATE, re.compile(r"^((txn|tran(saction)?|post(ing)?)\.?\s*)?date$|^dt\.?$", re.IGNORECASE)),
+    (NARRATION, re.compile(r"narration|description|particulars|details|remarks", re.IGNORECASE)),
+    (REFERENCE, re.compile(r"ch(e)?q|ref", re.IGNORECASE)),
+    (DEBIT, re.compile(r"withdrawal|debit|^dr\.?$", re.IGNORECASE)),
+    (CREDIT, re.compile(r"deposit|credit|^cr\.?$", re.IGNORECASE)),
+    (BALANCE, re.compile(r"balance", re.IGNORECASE)),
+]
+OUTPUT_COLUMNS = [TXN_DATE, VALUE_DATE, NARRATION, REFERENCE, DEBIT, CREDIT, BALANCE]
+
+DATE_CELL = re.compile(r"^\d{1,2}[/\-. ](\d{1,2}|[A-Za-z]{3,9})[/\-. ,]*\d{2,4}$")
+
+# Fragments this far left of a header's x still belong to that column
+# (amounts are usually right-aligned under left-aligned headers)
+COLUMN_SLACK = 15.0
+ROW_TOLERANCE = 3.0
+
+
+def page_rows(page) -> List[Row]:
+    """Group a page's text fragments into visual rows, top to bottom"""
+    fragments: List[Tuple[float, float, str]] = []
+
+    def visit(text, cm, tm, font_dict, font_size):
+        text = text.strip()
+        if text:
+            x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+            y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+            fragments.append((x, y, text))
+
+    page.extract_text(visitor_text=visit)
+
+    rows: List[Row] = []
+    row_y = None
+    for x, y, text in sorted(fragments, key=lambda f: (-f[1], f[0])):
+        if row_y is None or abs(y - row_y) > ROW_TOLERANCE:
+            rows.append([])
+            row_y = y
+        rows[-1].append((x, text))
+    return rows
+
+
+def extract_pdf_rows(path: str, start: int, stop: int) -> List[List[Row]]:
+    """Positioned rows for pages [start, stop); picklable entry point for worker processes"""
+    return [page_rows(page) for page in PdfReader(path).pages[start:stop]]
+
+
+def find_header(row: Row) -> Optional[List[Tuple[float, str]]]:
+    """Column layout [(x, column)] if `row` is a statement header row"""
+    layout = []
+    claimed = set()
+    for x, text in row:
+        for column, pattern in HEADER_PATTERNS:
+            if column not in claimed and pattern.search(text):
+                layout.append((x, column))
+                claimed.add(column)
+                break
+    if TXN_DATE in claimed and NARRATION in claimed and (DEBIT in claimed or CREDIT in claimed):
+        return sorted(layout)
+    return None
+
+
+class StatementTableAssembler:
+    """
+    Turns pages of positioned rows into transaction records. Pages must be
+    fed in order; the column layout carries over pages without a header.
+    """
+
+    def __init__(self):
+        self.layout: Optional[List[Tuple[float, str]]] = None
+        self.in_table = False
+        self.current: Optional[Dict[str, str]] = None
+
+    def _split(self, row: Row) -> Dict[str, str]:
+        cells: Dict[str, List[str]] = {}
+        for x, text in row:
+            column = self.layout[0][1]
+            for header_x, name in self.layout:
+                if header_x <= x + COLUMN_SLACK:
+                    column = name
+            cells.setdefault(column, []).append(text)
+        return {column: " ".join(parts) for column, parts in cells.items()}
+
+    def feed_page(self, rows: List[Row]) -> List[Dict[str, str]]:
+        """Consume one page, returning the transactions completed on it"""
+        completed = []
+        # Running page headers (bank name, page numbers) are never narration
+        self.in_table = False
+        for row in rows:
+            header = find_header(row)
+            if header:
+                self.layout = header
+                continue
+            if self.layout is None:
+                continue
+
+            cells = self._split(row)
+            date_text = cells.get(TXN_DATE, "")
+            if DATE_CELL.match(date_text):
+                if self.current:
+                    completed.append(self.current)
+                self.current = cells
+                self.in_table = True
+            elif not self.in_table:
+                continue
+            elif date_text or any(cells.get(c) for c in (DEBIT, CREDIT, BALANCE)):
+                # Footer/summary text below the table: stop until the next transaction
+                if self.current:
+                    completed.append(self.current)
+                    self.current = None
+                self.in_table = False
+            elif self.current is not None:
+                # Wrapped narration / reference line of the transaction above
+                for column in (NARRATION, REFERENCE):
+                    if cells.get(column):
+                        joined = f"{self.current.get(column, '')} {cells[column]}".strip()
+                        self.current[column] = joined
+        return completed
+
+    def finish(self) -> List[Dict[str, str]]:
+        completed = [self.current] if self.current else []
+        self.current = None
+        return completed
+
+
+def records_to_frame(records: List[Dict[str, str]], start: int = 0) -> pd.DataFrame:
+    """
+    Typed DataFrame (dates as dates, amounts as floats) from raw records,
+    indexed from `start` (the number of records in earlier chunks of the file).
+    Always carries every output column so all chunks of a file share one schema.
+    """
+    raw = pd.DataFrame(records, columns=OUTPUT_COLUMNS, index=range(start, start + len(records)))
+    frame = pd.DataFrame(index=raw.index)
+    for column in OUTPUT_COLUMNS:
+        if column in (TXN_DATE, VALUE_DATE):
+            frame[column] = coerce_dates(raw[column])[0].dt.date
+        elif column in (DEBIT, CREDIT, BALANCE):
+            frame[column] = coerce_amounts(raw[column])[0].round(2)
+        else:
+            frame[column] = raw[column]
+    return frame
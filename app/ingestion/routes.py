@@ -1,13 +1,100 @@
 # app/ingestion/routes.py
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Query
+from sqlalchemy.orm import Session
+from app.core.database import get_db
+from app.core.tenant_context import get_tenant_context, TenantContext
 from app.ingestion.service import process_file
+from app.ingestion.templates import delete_template, list_templates
+from app.cdm.models.reconciliation import IngestionJob, IngestionQuarantine
 
 router = APIRouter(tags=["Ingestion"])
 
 @router.post("/ingest")
-async def ingest_file(file: UploadFile = File(...)):
+async def ingest_file(
+    file: UploadFile = File(...),
+    target: str = Form("bank_statements", pattern="^(bank_statements|gst_sales|gst_purchases)$"),
+    bank_id: Optional[str] = Form(None),
+    context: TenantContext = Depends(get_tenant_context),
+    db: Session = Depends(get_db)
+):
     try:
-        result = await process_file(file)
+        result = await process_file(file, db, context, target=target, bank_id=bank_id)
         return {"status": "success", "data": result}
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/ingest/jobs/{job_id}/quarantine")
+async def get_quarantined_rows(
+    job_id: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    context: TenantContext = Depends(get_tenant_context),
+    db: Session = Depends(get_db)
+):
+    """Rows of an ingestion job that were skipped as malformed or invalid"""
+    job = db.query(IngestionJob).filter(
+        IngestionJob.job_id == job_id,
+        IngestionJob.company_id == context.company_id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+
+    rows = db.query(IngestionQuarantine).filter(
+        IngestionQuarantine.job_id == job_id
+    ).order_by(
+        IngestionQuarantine.line_number, IngestionQuarantine.row_number
+    ).offset(skip).limit(limit).all()
+    return {
+        "status": "success",
+        "data": {
+            "job_id": job_id,
+            "summary": (job.error_details or {}).get("quarantine"),
+            "rows": [
+                {
+                    "kind": row.kind,
+                    "line_number": row.line_number,
+                    "row_number": row.row_number,
+                    "raw_text": row.raw_text,
+                    "reason": row.reason,
+                }
+                for row in rows
+            ]
+        }
+    }
+
+@router.get("/ingest/templates")
+async def get_statement_templates(
+    target: Optional[str] = Query(None, pattern="^(bank_statements|gst_sales|gst_purchases)$"),
+    context: TenantContext = Depends(get_tenant_context),
+    db: Session = Depends(get_db)
+):
+    """Statement layouts learned from this firm's uploads"""
+    return {
+        "status": "success",
+        "data": [
+            {
+                "template_id": template.template_id,
+                "target": template.target,
+                "columns": template.columns,
+                "column_schema": template.column_schema,
+                "column_mapping": {field: template.columns[position]
+                                   for field, position in template.column_mapping.items()},
+                "learned_from_job_id": template.learned_from_job_id,
+                "use_count": template.use_count,
+                "last_used_at": template.last_used_at,
+            }
+            for template in list_templates(db, context.firm_id, target)
+        ]
+    }
+
+@router.delete("/ingest/templates/{template_id}")
+async def delete_statement_template(
+    template_id: str,
+    context: TenantContext = Depends(get_tenant_context),
+    db: Session = Depends(get_db)
+):
+    """Forget a mislearned layout; the next clean upload with that header learns it again"""
+    if not delete_template(db, context.firm_id, template_id):
+        raise HTTPException(status_code=404, detail="Statement template not found")
+    return {"status": "success", "data": {"template_id": template_id}}
@@ -1,18 +1,132 @@
 # app/ingestion/schema_detector.py
+"""
+Column type detection for parsed files.
+Types are scored from a sample of each column's values, with the header
+only as a tie-breaking hint, so "Withdrawal Amt." and "Particulars" (or a
+bank's unnamed columns) are told apart by what they contain. Results are
+cached per (company, header signature): repeat uploads of the same bank's
+layout skip detection entirely.
+"""
+
+import hashlib
 import re
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Iterable, List, Optional
+
 import pandas as pd
+from pandas.api.types import (
+    is_bool_dtype, is_datetime64_any_dtype, is_float_dtype, is_integer_dtype
+)
+
+from app.core.config import settings
+
+# Header hints, first match wins; "string" marks identifiers that look numeric
+HEADER_HINTS = [
+    ("string", re.compile(r"ref|ch(e)?q|utr|gstin|invoice\s*(no|num)|\bno\b|number|\bid\b", re.IGNORECASE)),
+    ("datetime", re.compile(r"date|\bdt\b", re.IGNORECASE)),
+    ("float", re.compile(
+        r"amount|\bamt\b|value|\brs\b|balance|withdrawal|deposit|debit|credit|tax|total|igst|cgst|sgst|cess",
+        re.IGNORECASE
+    )),
+    ("category", re.compile(r"^(dr|cr)\.?$|dr\s*/\s*cr|\btype\b|\bmode\b", re.IGNORECASE)),
+]
+
+DATE_VALUE = re.compile(
+    r"^(\d{1,2}[/\-. ](\d{1,2}|[A-Za-z]{3,9})[/\-. ,]*\d{2,4}|\d{4}[/\-]\d{1,2}[/\-]\d{1,2})"
+    r"([ T]\d{1,2}:\d{2}(:\d{2})?)?$"
+)
+AMOUNT_VALUE = re.compile(
+    r"^(rs\.?|inr|₹)?\s*\(?-?\s*(\d{1,3}(,\d{2,3})*|\d+)(\.\d+)?\)?\s*((dr|cr)\.?)?$",
+    re.IGNORECASE
+)
+
+# Share of sampled values that must match for a type, without / with a header hint
+CONFIDENT_SHARE = 0.9
+HINTED_SHARE = 0.5
+CATEGORY_MAX_DISTINCT = 10
+
+_cache: "OrderedDict[tuple, List[str]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def header_signature(columns: Iterable) -> str:
+    """Stable fingerprint of a file's header row"""
+    normalized = "\x1f".join(" ".join(str(c).lower().split()) for c in columns)
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def clear_schema_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _header_hint(name: str) -> Optional[str]:
+    for label, pattern in HEADER_HINTS:
+        if pattern.search(name):
+            return label
+    return None
+
+
+def _share(values: pd.Series, pattern: re.Pattern) -> float:
+    return sum(1 for v in values if pattern.match(v)) / len(values)
+
+
+def classify_column(name: str, series: pd.Series, sample_size: int = None) -> str:
+    """Type label ("datetime", "float", "category", "string") for one column"""
+    hint = _header_hint(str(name))
+    if hint == "string":
+        return "string"
+
+    # Columns the parser already typed (Excel dates/numbers, PDF tables)
+    if is_datetime64_any_dtype(series):
+        return "datetime"
+    if is_bool_dtype(series):
+        return "category"
+    if is_float_dtype(series):
+        return "float"
+    if is_integer_dtype(series):
+        return "float" if hint == "float" else "string"
+
+    present = series.dropna()
+    if not present.empty and isinstance(present.iloc[0], date):
+        return "datetime"
+    sample = present.astype(str).str.strip()
+    sample = sample[sample != ""].head(sample_size or settings.INGEST_SCHEMA_SAMPLE_ROWS)
+    if sample.empty:
+        return hint or "string"
+
+    for label, pattern in (("datetime", DATE_VALUE), ("float", AMOUNT_VALUE)):
+        required = HINTED_SHARE if hint == label else CONFIDENT_SHARE
+        if _share(sample, pattern) >= required:
+            return label
+
+    distinct = sample.nunique()
+    if distinct <= CATEGORY_MAX_DISTINCT and (hint == "category" or distinct * 2 <= len(sample)):
+        return "category"
+    return "string"
+
+
+def detect_schema(df: pd.DataFrame, company_id: str = None) -> dict:
+    """
+    Column -> type label for a parsed chunk. With `company_id` the result is
+    cached under the chunk's header signature for later uploads.
+    """
+    key = (company_id, header_signature(df.columns)) if company_id else None
+    if key is not None:
+        with _cache_lock:
+            labels = _cache.get(key)
+            if labels is not None:
+                _cache.move_to_end(key)
+                # Signatures ignore case/spacing, so map labels back by position
+                return dict(zip(df.columns, labels))
+
+    schema = {col: classify_column(col, df[col]) for col in df.columns}
 
-def detect_schema(df: pd.DataFrame) -> dict:
-    schema = {}
-    for col in df.columns:
-        col_lower = col.lower()
-
-        if re.search(r"date", col_lower):
-            schema[col] = "datetime"
-        elif re.search(r"amount|amt|value|rs", col_lower):
-            schema[col] = "float"
-        elif re.search(r"dr|cr|debit|credit", col_lower):
-            schema[col] = "category"
-        else:
-            schema[col] = "string"
-    return schema
\ No newline at end of file
+    if key is not None:
+        with _cache_lock:
+            _cache[key] = list(schema.values())
+            while len(_cache) > settings.INGEST_SCHEMA_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return schema
@@ -1,25 +1,217 @@
 # app/ingestion/service.py
-from io import BytesIO
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable
 import pandas as pd
-from app.ingestion.file_parser import parse_file
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from app.ingestion.file_parser import (
+    spool_upload, iter_file_chunks, iter_pdf_chunks, file_extension, is_streamable, parse_path,
+    split_frame
+)
+from app.ingestion.parser_pool import run_in_parser_pool
 from app.ingestion.schema_detector import detect_schema
+from app.ingestion.coercion import coerce_frame
+from app.ingestion.templates import find_template, apply_template, learn_template
+from app.ingestion.quarantine import QuarantineSink
+from app.ingestion.loader import TARGET_MODELS, map_columns, build_rows, insert_ignoring_duplicates
 from app.core.logger import log_error
+from app.core.tenant_context import TenantContext
+from app.cdm.models.master import Ledger
+from app.cdm.models.reconciliation import IngestionJob
+
+def find_completed_job(db: Session, company_id: str, file_hash: str, target: str, bank_id: str = None):
+    """Most recent completed ingestion of the same file into the same table (and bank ledger)"""
+    return db.query(IngestionJob).filter(
+        IngestionJob.company_id == company_id,
+        IngestionJob.file_hash == file_hash,
+        IngestionJob.target == target,
+        IngestionJob.bank_id == bank_id if bank_id is not None else IngestionJob.bank_id.is_(None),
+        IngestionJob.status == "Completed",
+        IngestionJob.result.isnot(None)
+    ).order_by(IngestionJob.end_time.desc()).first()
+
+def _load_chunks(
+    db: Session,
+    job: IngestionJob,
+    chunks: Iterable[pd.DataFrame],
+    target: str,
+    firm_id: str,
+    company_id: str,
+    bank_id: str,
+    progress: Dict,
+    quarantine: QuarantineSink
+):
+    """Map, coerce and insert each chunk, committing as it goes"""
+    for chunk in chunks:
+        bad_lines = chunk.attrs.get("bad_lines")
+        if bad_lines:
+            quarantine.add_bad_lines(bad_lines)
+        if chunk.empty:
+            quarantine.flush(db)
+            db.commit()
+            continue
+
+        if progress["schema"] is None:
+            columns = list(chunk.columns)
+            template = find_template(db, columns, target, firm_id)
+            if template is not None:
+                # Known bank layout: no detection or mapping needed
+                progress["schema"], progress["mapping"] = apply_template(db, template, columns)
+                progress["template_id"] = template.template_id
+            else:
+                progress["schema"] = detect_schema(chunk, company_id)
+                progress["mapping"] = map_columns(columns, target)
+                progress["columns"] = columns
+
+        typed, errors = coerce_frame(chunk, progress["schema"], date_formats=progress["date_formats"])
+        for column, count in errors.items():
+            progress["coercion_errors"][column] = progress["coercion_errors"].get(column, 0) + count
+
+        rows, rejected = build_rows(target, typed, progress["mapping"], company_id, bank_id, raw=chunk)
+        progress["inserted"] += insert_ignoring_duplicates(db, target, rows)
+        progress["records"] += len(chunk)
+        progress["invalid"] += len(rejected)
+        quarantine.add_rejected(chunk, rejected)
+        quarantine.flush(db)
+
+        job.records_processed = progress["inserted"]
+        job.records_failed = progress["invalid"]
+        db.commit()
+
+async def process_file(
+    file,
+    db: Session,
+    context: TenantContext,
+    target: str = "bank_statements",
+    bank_id: str = None
+):
+    """
+    Stream an uploaded file into the CDM table for `target`, committing per
+    chunk. Re-uploading the same rows is harmless: duplicates are skipped on
+    their dedup hash. Counts and timing are recorded on an IngestionJob.
+    A byte-identical file that was already ingested for the company (into
+    the same table and bank ledger) is not parsed again; the earlier job's
+    result is returned instead.
+    """
+    if target not in TARGET_MODELS:
+        raise ValueError(f"Unsupported ingestion target: {target}")
+    if target == "bank_statements":
+        bank_ledger = db.query(Ledger).filter(
+            Ledger.ledger_id == bank_id,
+            Ledger.company_id == context.company_id
+        ).first() if bank_id else None
+        if not bank_ledger:
+            raise ValueError("bank_id must be a ledger of the current company")
 
-async def process_file(file):
-    file_bytes = await file.read()
     file_path = file.filename
+    started = time.perf_counter()
+    spooled_path, file_hash = await spool_upload(file)
+
+    # Until the job row exists the try/finally below does not own the spooled file
+    job = None
+    try:
+        previous = find_completed_job(db, context.company_id, file_hash, target, bank_id)
+        if previous is not None:
+            return {**previous.result, "duplicate_upload": True, "original_job_id": previous.job_id}
+
+        job = IngestionJob(
+            company_id=context.company_id,
+            file_name=file_path,
+            file_type=file_extension(file_path),
+            file_size=os.path.getsize(spooled_path),
+            file_hash=file_hash,
+            target=target,
+            bank_id=bank_id,
+            status="Processing"
+        )
+        db.add(job)
+        db.commit()
+    except Exception:
+        job = None
+        db.rollback()
+        raise
+    finally:
+        if job is None:
+            os.remove(spooled_path)
 
+    progress = {"records": 0, "inserted": 0, "invalid": 0, "schema": None, "mapping": None,
+                "coercion_errors": {}, "template_id": None, "columns": None, "date_formats": {}}
+    quarantine = QuarantineSink(job.job_id, context.company_id)
     try:
-        df = parse_file(BytesIO(file_bytes), file_path)
-        schema = detect_schema(df)
+        if is_streamable(file_path):
+            # CSV, and Excel when a streaming reader is installed
+            chunks = iter_file_chunks(spooled_path, file_path)
+        elif file_extension(file_path) == "pdf":
+            # Page ranges are extracted in parallel and streamed as they finish
+            chunks = iter_pdf_chunks(spooled_path)
+        else:
+            # CPU-bound formats are parsed in the process pool, off the event loop
+            chunks = split_frame(await run_in_parser_pool(parse_path, spooled_path, file_path))
+
+        # Chunk reads, coercion and inserts are blocking; keep them off the loop too
+        await run_in_threadpool(
+            _load_chunks, db, job, chunks, target, context.firm_id, context.company_id, bank_id, progress,
+            quarantine
+        )
+        records, inserted, invalid = progress["records"], progress["inserted"], progress["invalid"]
+        schema, mapping = progress["schema"], progress["mapping"]
+
+        duplicates = records - invalid - inserted
+        if progress["columns"] is not None and inserted + duplicates > 0:
+            template = learn_template(
+                db, progress["columns"], target, context.firm_id, schema, mapping, job_id=job.job_id
+            )
+            progress["template_id"] = template.template_id if template else None
         response = {
             "file_name": file_path,
-            "records_ingested": len(df),
-            "schema": schema,
+            "job_id": job.job_id,
+            "target": target,
+            "records_read": records,
+            "records_ingested": inserted,
+            "duplicates_skipped": duplicates,
+            "records_failed": invalid,
+            "column_mapping": mapping or {},
+            "schema": schema or {},
+            "template_id": progress["template_id"],
+            "template_reused": progress["columns"] is None and progress["template_id"] is not None,
+            "coercion_errors": progress["coercion_errors"],
+            "records_quarantined": quarantine.total,
             "errors": []
         }
+
+        job.status = "Completed"
+        job.error_details = {
+            "duplicates_skipped": duplicates,
+            "invalid_rows": invalid,
+            "coercion_errors": progress["coercion_errors"],
+            "quarantine": quarantine.summary()
+        }
+        job.result = response
+        job.end_time = datetime.now(timezone.utc)
+        job.processing_duration = round(time.perf_counter() - started, 3)
+        db.commit()
         return response
 
     except Exception as e:
-        log_error("IngestionPipeline", type(e).__name__, str(e))
-        raise e
\ No newline at end of file
+        db.rollback()
+        log_error(
+            "IngestionPipeline", type(e).__name__, str(e), sample_row=file_path,
+            company_id=context.company_id, job_id=job.job_id
+        )
+        job.status = "Failed"
+        job.records_processed = progress["inserted"]
+        job.records_failed = progress["invalid"]
+        job.error_details = {
+            "error_type": type(e).__name__,
+            "message": str(e),
+            "quarantine": quarantine.summary()
+        }
+        job.end_time = datetime.now(timezone.utc)
+        job.processing_duration = round(time.perf_counter() - started, 3)
+        db.commit()
+        raise e
+
+    finally:
+        os.remove(spooled_path)
@@ -0,0 +1,99 @@
+# app/ingestion/templates.py
+"""
+Registry of known statement layouts.
+Clients bank with the same handful of banks, and every export from one bank
+has the same header row. The column types and CDM mapping worked out on the
+first ingest of a layout are stored under its header fingerprint; later
+files with that header skip detection and mapping and go straight to the
+bulk load. Templates belong to the firm whose ingest taught them and are
+shared across that firm's companies only, so one firm's mislearned layout
+never steers another's loads; a firm can list its templates and delete a
+wrong one, which is then relearned from the next clean upload.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.cdm.models.reconciliation import StatementTemplate
+from app.ingestion.schema_detector import header_signature
+
+
+def find_template(db: Session, columns: List, target: str, firm_id: str) -> Optional[StatementTemplate]:
+    return db.query(StatementTemplate).filter(
+        StatementTemplate.firm_id == firm_id,
+        StatementTemplate.target == target,
+        StatementTemplate.header_fingerprint == header_signature(columns)
+    ).first()
+
+
+def apply_template(
+    db: Session,
+    template: StatementTemplate,
+    columns: List
+) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Schema and column mapping for a file's actual header, recording the use"""
+    schema = dict(zip(columns, template.column_schema))
+    mapping = {field: columns[position] for field, position in template.column_mapping.items()}
+    db.execute(
+        update(StatementTemplate)
+        .where(StatementTemplate.template_id == template.template_id)
+        .values(
+            use_count=StatementTemplate.use_count + 1,
+            last_used_at=datetime.now(timezone.utc)
+        )
+    )
+    return schema, mapping
+
+
+def learn_template(
+    db: Session,
+    columns: List,
+    target: str,
+    firm_id: str,
+    schema: Dict[str, str],
+    mapping: Dict[str, str],
+    job_id: str = None
+) -> Optional[StatementTemplate]:
+    """
+    Store the layout of a successfully ingested file for the firm. Returns
+    None if another ingest registered the same layout first.
+    """
+    columns = list(columns)
+    template = StatementTemplate(
+        firm_id=firm_id,
+        target=target,
+        header_fingerprint=header_signature(columns),
+        columns=[str(c) for c in columns],
+        column_schema=[schema[c] for c in columns],
+        column_mapping={field: columns.index(column) for field, column in mapping.items()},
+        learned_from_job_id=job_id,
+        use_count=0
+    )
+    db.add(template)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None
+    return template
+
+
+def list_templates(db: Session, firm_id: str, target: str = None) -> List[StatementTemplate]:
+    query = db.query(StatementTemplate).filter(StatementTemplate.firm_id == firm_id)
+    if target:
+        query = query.filter(StatementTemplate.target == target)
+    return query.order_by(StatementTemplate.target, StatementTemplate.created_at).all()
+
+
+def delete_template(db: Session, firm_id: str, template_id: str) -> bool:
+    """Forget one of the firm's layouts; False if the firm has no such template"""
+    deleted = db.query(StatementTemplate).filter(
+        StatementTemplate.template_id == template_id,
+        StatementTemplate.firm_id == firm_id
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted > 0
@@ -1,20 +1,39 @@
 # app/main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from app.ingestion.routes import router as ingestion_router
 from app.cdm.routes import router as cdm_router
 from app.tenant.routes import firm_router, user_router
 from app.auth.routes import router as auth_router
 from app.api.ai_routes import router as ai_router
-from app.core.database import engine, Base
+from app.core.database import engine, Base, dispose_async_engine
+from app.ingestion.parser_pool import shutdown_parser_pool
+from app.services.reconciliation_jobs import recover_interrupted_jobs, shutdown_job_executor
+from app.core.logger import log_error, shutdown_error_logger
 
 # Database tables are now managed by Alembic migrations
 # Run: alembic upgrade head
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await run_in_threadpool(recover_interrupted_jobs)
+    except Exception as e:
+        # A missing table or unreachable database must not keep the API down
+        log_error("ReconciliationJob", type(e).__name__, f"Startup job recovery failed: {e}")
+    yield
+    shutdown_job_executor()
+    shutdown_parser_pool()
+    shutdown_error_logger()
+    await dispose_async_engine()
+
 app = FastAPI(
     title="Multi-Tenant CA Firm Management API with JWT Authentication",
     description="Secure backend for CA firms managing multiple clients with JWT authentication and data isolation",
-    version="2.1.0"
+    version="2.1.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware for frontend integration
@@ -24,6 +43,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],  # Cursor pagination on list endpoints
 )
 
 # Include routers
@@ -4,18 +4,47 @@ AI-Powered Reconciliation Service
 Integrates LLM capabilities with the CDM reconciliation engine
 """
 
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
+from bisect import bisect_left
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime, timedelta
 import json
 
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from app.core.init_llm import make_llm
+from app.core.config import settings
+from app.core.logger import log_error
 from app.core.tenant_context import TenantContext
-from app.cdm.models.reconciliation import ReconciliationLog, AIFeedback
-from app.cdm.models.transaction import VoucherHeader
+from app.cdm.models.reconciliation import ReconciliationLog, ReconciliationWatermark, AIFeedback
+from app.cdm.models.transaction import VoucherHeader, ReconciliationStatus
 from app.cdm.models.external import BankStatement
 from app.core.database import get_db
+from app.services.candidate_blocking import CandidateIndex
+from app.services.rule_reconciler import match_by_rules
+from app.services.llm_executor import LLMExecutor, estimate_tokens, pack_by_token_budget
+from app.services.llm_cache import LLMResponseCache
+from app.services.reconciliation_writer import ReconciliationWriter
+
+# Matches at or below this confidence are left for a reviewer
+DEFAULT_AUTO_MATCH_THRESHOLD = 0.85
+
+
+def summarize_reconciliation(total_vouchers: int, results: List[Dict], processing_time: float) -> Dict:
+    """Aggregate per-voucher results into the statistics reported to clients"""
+    matched = [r for r in results if r['matched']]
+    matched_count = sum(1 for r in matched if not r['requires_review'])
+    review_count = sum(1 for r in matched if r['requires_review'])
+    avg_confidence = sum(r['confidence'] for r in matched) / len(matched) if matched else 0.0
+    
+    return {
+        "total_vouchers": total_vouchers,
+        "matched_count": matched_count,
+        "requires_review_count": review_count,
+        "unmatched_count": total_vouchers - len(matched),
+        "average_confidence": round(avg_confidence, 4),
+        "processing_time_seconds": round(processing_time, 2)
+    }
 
 
 class AIReconciliationService:
@@ -28,82 +57,337 @@ class AIReconciliationService:
         self.db = db
         self.context = context
         self.llm = make_llm(temperature=0.2)  # Low temperature for consistency
+        cache = (
+            LLMResponseCache.for_llm(self.llm, company_id=context.company_id)
+            if settings.LLM_CACHE_ENABLED else None
+        )
+        self.llm_executor = LLMExecutor(self.llm, cache=cache)
+    
+    def load_bank_reconciliation_inputs(
+        self,
+        start_date: date,
+        end_date: date,
+        incremental: bool = False
+    ) -> Tuple[List[VoucherHeader], List[BankStatement]]:
+        """
+        Load vouchers in the range that are still unreconciled, and the unlinked
+        bank statements within the blocking date window of them.
+        
+        In incremental mode only the delta since the company's watermark is
+        loaded: vouchers created or changed since then, plus older unreconciled
+        vouchers that have new bank statements within the blocking window.
+        Without a watermark an incremental run behaves like a full one.
+        """
+        window = timedelta(days=settings.RECON_DATE_WINDOW_DAYS)
+        vouchers_query = self._unreconciled_vouchers().filter(
+            VoucherHeader.voucher_date >= start_date,
+            VoucherHeader.voucher_date <= end_date
+        )
+        
+        watermark = self.get_watermark() if incremental else None
+        if watermark is not None:
+            vouchers = self._voucher_deltas(vouchers_query, watermark, start_date, end_date, window)
+        else:
+            vouchers = vouchers_query.all()
+        
+        if not vouchers:
+            return [], []
+        
+        voucher_dates = [v.voucher_date for v in vouchers]
+        bank_statements = self._unlinked_statements().filter(
+            BankStatement.txn_date >= min(voucher_dates) - window,
+            BankStatement.txn_date <= max(voucher_dates) + window
+        ).all()
+        
+        return vouchers, bank_statements
+    
+    def _unreconciled_vouchers(self):
+        """Vouchers not yet matched and not linked from any bank statement"""
+        linked = self.db.query(BankStatement.bank_txn_id).filter(
+            BankStatement.linked_voucher_id == VoucherHeader.voucher_id
+        ).exists()
+        return self.db.query(VoucherHeader).filter(
+            VoucherHeader.company_id == self.context.company_id,
+            or_(
+                VoucherHeader.reconciliation_status == ReconciliationStatus.UNMATCHED,
+                VoucherHeader.reconciliation_status.is_(None)
+            ),
+            ~linked
+        )
+    
+    def _unlinked_statements(self):
+        return self.db.query(BankStatement).filter(
+            BankStatement.company_id == self.context.company_id,
+            BankStatement.reconciliation_status == "Unmatched",
+            BankStatement.linked_voucher_id.is_(None)
+        )
+    
+    def _voucher_deltas(
+        self,
+        vouchers_query,
+        watermark: datetime,
+        start_date: date,
+        end_date: date,
+        window: timedelta
+    ) -> List[VoucherHeader]:
+        vouchers = vouchers_query.filter(
+            or_(VoucherHeader.created_at > watermark, VoucherHeader.updated_at > watermark)
+        ).all()
+        
+        new_dates = sorted(
+            txn_date for (txn_date,) in self._unlinked_statements().filter(
+                BankStatement.created_at > watermark,
+                BankStatement.txn_date >= start_date - window,
+                BankStatement.txn_date <= end_date + window
+            ).with_entities(BankStatement.txn_date).distinct()
+        )
+        if not new_dates:
+            return vouchers
+        
+        # Older vouchers get another look only when a new statement lands near them
+        seen = {v.voucher_id for v in vouchers}
+        nearby = vouchers_query.filter(
+            VoucherHeader.voucher_date >= new_dates[0] - window,
+            VoucherHeader.voucher_date <= new_dates[-1] + window
+        ).all()
+        for voucher in nearby:
+            if voucher.voucher_id in seen:
+                continue
+            i = bisect_left(new_dates, voucher.voucher_date - window)
+            if i < len(new_dates) and new_dates[i] <= voucher.voucher_date + window:
+                vouchers.append(voucher)
+        return vouchers
+    
+    def get_watermark(self, recon_type: str = "bank") -> Optional[datetime]:
+        """Start time of the company's last successful incremental run"""
+        watermark = self.db.query(ReconciliationWatermark).filter(
+            ReconciliationWatermark.company_id == self.context.company_id,
+            ReconciliationWatermark.recon_type == recon_type
+        ).first()
+        return watermark.watermark_at if watermark else None
+    
+    def advance_watermark(
+        self,
+        run_started_at: datetime,
+        job_id: Optional[str] = None,
+        recon_type: str = "bank"
+    ):
+        """
+        Move the watermark to the start of a successful run. Using the start
+        (not end) time means records written during the run are picked up by
+        the next one. The caller commits.
+        """
+        watermark = self.db.query(ReconciliationWatermark).filter(
+            ReconciliationWatermark.company_id == self.context.company_id,
+            ReconciliationWatermark.recon_type == recon_type
+        ).first()
+        if watermark is None:
+            watermark = ReconciliationWatermark(
+                company_id=self.context.company_id,
+                recon_type=recon_type
+            )
+            self.db.add(watermark)
+        watermark.watermark_at = run_started_at
+        watermark.last_job_id = job_id
     
     async def intelligent_bank_reconciliation(
         self, 
         vouchers: List[VoucherHeader], 
-        bank_statements: List[BankStatement]
+        bank_statements: List[BankStatement],
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        auto_match_threshold: Optional[float] = None
     ) -> List[Dict]:
         """
-        Use AI to intelligently match vouchers with bank statements
+        Match vouchers with bank statements.
+        Trivial pairs are settled by the EXACT/NEAR rule pass; only the residue
+        goes to the LLM, and each residual voucher is compared against the few
+        bank statements that survive candidate blocking (direction, amount
+        bucket, date window, cheque ref).
+        
+        `progress_callback(processed, total)` is called as vouchers are settled.
+        Matches at or below `auto_match_threshold` confidence (default
+        DEFAULT_AUTO_MATCH_THRESHOLD) are flagged for review.
         """
+        if auto_match_threshold is None:
+            auto_match_threshold = DEFAULT_AUTO_MATCH_THRESHOLD
         reconciliation_results = []
+        processed = 0
+        writer = ReconciliationWriter(self.context.company_id)
+        
+        def report_progress(count: int):
+            nonlocal processed
+            processed += count
+            if progress_callback:
+                progress_callback(processed, len(vouchers))
+        
+        rule_matches = match_by_rules(
+            vouchers,
+            bank_statements,
+            exact_date_window_days=settings.RECON_EXACT_DATE_WINDOW_DAYS,
+            near_date_window_days=settings.RECON_NEAR_DATE_WINDOW_DAYS,
+            near_amount_tolerance=settings.RECON_NEAR_AMOUNT_TOLERANCE
+        )
+        rule_matched_vouchers = set()
+        rule_matched_statements = set()
+        for match in rule_matches:
+            rule_matched_vouchers.add(match['voucher_id'])
+            rule_matched_statements.add(match['bank_record_id'])
+            reconciliation_results.append(
+                self._record_match(
+                    writer, match['voucher_id'], match, match['match_rule'], auto_match_threshold
+                )
+            )
+        
+        index = CandidateIndex(
+            [s for s in bank_statements if s.bank_txn_id not in rule_matched_statements],
+            amount_tolerance=settings.RECON_AMOUNT_TOLERANCE,
+            date_window_days=settings.RECON_DATE_WINDOW_DAYS
+        )
         
+        residual = []
         for voucher in vouchers:
-            # Find potential matches using AI analysis
-            potential_matches = await self._find_ai_matches(voucher, bank_statements)
+            if voucher.voucher_id in rule_matched_vouchers:
+                continue
             
-            if potential_matches:
-                best_match = potential_matches[0]  # Highest confidence
-                
-                # Create reconciliation log entry
-                recon_log = ReconciliationLog(
-                    company_id=self.context.company_id,
-                    source_table="vouchers",
-                    target_table="bank_statements", 
-                    source_record_id=voucher.voucher_id,
-                    target_record_id=best_match['bank_record_id'],
-                    match_score=best_match['confidence_score'],
-                    match_rule="AI_LLM_Analysis",
-                    rule_details={
-                        "ai_reasoning": best_match['reasoning'],
-                        "amount_variance": best_match.get('amount_variance', 0),
-                        "date_variance_days": best_match.get('date_variance', 0),
-                        "description_similarity": best_match.get('description_similarity', 0)
-                    },
-                    status="Matched" if best_match['confidence_score'] > 0.85 else "Manual_Review",
-                    ai_reasoning=best_match['reasoning']
+            candidates = index.candidates(voucher, settings.RECON_MAX_CANDIDATES)
+            if candidates:
+                residual.append((voucher, candidates))
+            # Vouchers with nothing plausible to match skip the LLM round-trip
+        
+        report_progress(len(vouchers) - len(residual))
+        
+        # Ask the LLM about every residual voucher concurrently, packing many
+        # vouchers into each prompt when batching is enabled
+        if settings.RECON_LLM_BATCH_MODE:
+            async def run_batch(batch):
+                result = await self._find_ai_matches_batch(batch)
+                report_progress(len(batch))
+                return result
+            
+            batch_results = await self.llm_executor.map(run_batch, self._pack_batches(residual))
+            matches_by_voucher = {}
+            for result in batch_results:
+                matches_by_voucher.update(result)
+            ai_matches = [matches_by_voucher.get(v.voucher_id, []) for v, _ in residual]
+        else:
+            async def run_single(item):
+                result = await self._find_ai_matches(*item)
+                report_progress(1)
+                return result
+            
+            ai_matches = await self.llm_executor.map(run_single, residual)
+        
+        for (voucher, _), potential_matches in zip(residual, ai_matches):
+            # Candidate lists were built up-front, so skip statements an
+            # earlier voucher has already claimed
+            best_match = next(
+                (m for m in potential_matches if not index.is_claimed(m['bank_record_id'])),
+                None
+            )
+            if best_match:
+                index.claim(best_match['bank_record_id'])
+                reconciliation_results.append(
+                    self._record_match(
+                        writer, voucher.voucher_id, best_match, "AI_LLM_Analysis", auto_match_threshold
+                    )
                 )
-                
-                self.db.add(recon_log)
-                reconciliation_results.append({
-                    "voucher_id": voucher.voucher_id,
-                    "matched": True,
-                    "confidence": float(best_match['confidence_score']),
-                    "requires_review": best_match['confidence_score'] <= 0.85
-                })
         
+        writer.flush(self.db)
         self.db.commit()
         return reconciliation_results
     
-    async def _find_ai_matches(
-        self, 
-        voucher: VoucherHeader, 
-        bank_statements: List[BankStatement]
-    ) -> List[Dict]:
+    def _record_match(
+        self,
+        writer: ReconciliationWriter,
+        voucher_id: str,
+        match: Dict,
+        match_rule: str,
+        auto_match_threshold: float
+    ) -> Dict:
         """
-        Use LLM to analyze and find potential matches for a voucher
+        Stage the log entry and voucher/bank statement links for a match
+        and return the summary row reported back to the caller
         """
+        requires_review = match['confidence_score'] <= auto_match_threshold
+        writer.stage(voucher_id, match['bank_record_id'], match, match_rule, requires_review)
         
-        # Prepare data for AI analysis
-        voucher_data = {
+        return {
+            "voucher_id": voucher_id,
+            "matched": True,
+            "match_rule": match_rule,
+            "confidence": float(match['confidence_score']),
+            "requires_review": requires_review
+        }
+    
+    @staticmethod
+    def _voucher_payload(voucher: VoucherHeader) -> Dict:
+        return {
             "date": voucher.voucher_date.isoformat(),
             "amount": float(voucher.total_amount),
             "description": voucher.narration or "",
             "type": voucher.voucher_type,
             "party": voucher.party_ledger_id
         }
+    
+    @staticmethod
+    def _bank_payload(stmt: BankStatement) -> Dict:
+        return {
+            "id": stmt.bank_txn_id,
+            "date": stmt.txn_date.isoformat(),
+            "amount": float(stmt.amount),
+            "description": stmt.narration or "",
+            "reference": stmt.cheque_ref or "",
+            "type": stmt.dr_cr
+        }
+    
+    @staticmethod
+    def _validate_matches(matches, candidate_ids: set) -> List[Dict]:
+        """Keep well-formed matches that point at one of the offered candidates"""
+        valid_matches = []
+        for match in matches if isinstance(matches, list) else []:
+            if (isinstance(match, dict) and
+                match.get('bank_record_id') in candidate_ids and
+                isinstance(match.get('confidence_score'), (int, float)) and 
+                0.0 <= match['confidence_score'] <= 1.0):
+                
+                # Convert confidence to Decimal for database storage
+                match['confidence_score'] = Decimal(str(match['confidence_score']))
+                valid_matches.append(match)
         
-        bank_data = []
-        for stmt in bank_statements:
-            bank_data.append({
-                "id": stmt.statement_id,
-                "date": stmt.transaction_date.isoformat(),
-                "amount": float(stmt.amount),
-                "description": stmt.description or "",
-                "reference": stmt.reference_number or "",
-                "type": stmt.transaction_type
-            })
+        return sorted(valid_matches, key=lambda m: m['confidence_score'], reverse=True)
+    
+    def _pack_batches(
+        self,
+        residual: List[Tuple[VoucherHeader, List[BankStatement]]]
+    ) -> List[List[Tuple[VoucherHeader, List[BankStatement]]]]:
+        """Group residual vouchers into prompts that fit the batch token budget"""
+        return pack_by_token_budget(
+            residual,
+            cost=lambda item: estimate_tokens(json.dumps(self._batch_entry(*item))),
+            token_budget=settings.RECON_BATCH_TOKEN_BUDGET,
+            max_items=settings.RECON_BATCH_MAX_VOUCHERS
+        )
+    
+    def _batch_entry(self, voucher: VoucherHeader, bank_statements: List[BankStatement]) -> Dict:
+        return {
+            "voucher_id": voucher.voucher_id,
+            "voucher": self._voucher_payload(voucher),
+            "candidates": [self._bank_payload(stmt) for stmt in bank_statements]
+        }
+    
+    async def _find_ai_matches(
+        self, 
+        voucher: VoucherHeader, 
+        bank_statements: List[BankStatement]
+    ) -> List[Dict]:
+        """
+        Use LLM to analyze and find potential matches for a voucher
+        """
+        
+        # Prepare data for AI analysis
+        voucher_data = self._voucher_payload(voucher)
+        bank_data = [self._bank_payload(stmt) for stmt in bank_statements]
+        candidate_ids = {stmt.bank_txn_id for stmt in bank_statements}
         
         # Create AI prompt for reconciliation analysis
         prompt = f"""
@@ -127,28 +411,69 @@ class AIReconciliationService:
         """
         
         try:
-            response = self.llm.invoke(prompt)
-            
-            # Parse AI response
-            matches = json.loads(response.content)
-            
-            # Validate and filter matches
-            valid_matches = []
-            for match in matches:
-                if (isinstance(match.get('confidence_score'), (int, float)) and 
-                    0.0 <= match['confidence_score'] <= 1.0):
-                    
-                    # Convert confidence to Decimal for database storage
-                    match['confidence_score'] = Decimal(str(match['confidence_score']))
-                    valid_matches.append(match)
-            
-            return valid_matches
+            # Parse AI response; only a parseable one is cached
+            return await self.llm_executor.ainvoke_parsed(
+                prompt, lambda content: self._validate_matches(json.loads(content), candidate_ids)
+            )
             
         except (json.JSONDecodeError, Exception) as e:
-            # Log error and return empty matches
-            print(f"AI reconciliation error: {e}")
+            log_error(
+                "AIReconciliation", type(e).__name__, f"AI reconciliation error: {e}",
+                company_id=self.context.company_id, voucher_ids=[voucher.voucher_id]
+            )
             return []
     
+    async def _find_ai_matches_batch(
+        self,
+        batch: List[Tuple[VoucherHeader, List[BankStatement]]]
+    ) -> Dict[str, List[Dict]]:
+        """
+        Use one LLM call to find matches for several vouchers, each with its
+        own candidate bank statements. Returns matches keyed by voucher_id.
+        """
+        entries = [self._batch_entry(voucher, candidates) for voucher, candidates in batch]
+        candidate_ids = {
+            voucher.voucher_id: {stmt.bank_txn_id for stmt in candidates}
+            for voucher, candidates in batch
+        }
+        
+        prompt = f"""
+        You are a financial reconciliation expert. For EACH voucher below, find the best matching bank statement(s) among that voucher's own candidates only.
+        
+        VOUCHERS WITH CANDIDATE BANK STATEMENTS:
+        {json.dumps(entries)}
+        
+        For each potential match, provide:
+        1. Confidence score (0.0 to 1.0)
+        2. Brief reasoning for the match
+        3. Amount variance (if any)
+        4. Date variance in days (if any) 
+        5. Description similarity assessment
+        
+        Return ONLY a JSON object keyed by voucher_id, each value an array of matches ordered by confidence score (highest first). Use an empty array when nothing matches.
+        Format: {{"<voucher_id>": [{{"bank_record_id": "id", "confidence_score": 0.95, "reasoning": "explanation", "amount_variance": 0.0, "date_variance": 0, "description_similarity": 0.9}}]}}
+        """
+        
+        def parse(content: str) -> Dict[str, List[Dict]]:
+            parsed = json.loads(content)
+            if not isinstance(parsed, dict):
+                raise ValueError("Batch response is not a JSON object")
+            return {
+                voucher_id: self._validate_matches(parsed.get(voucher_id), ids)
+                for voucher_id, ids in candidate_ids.items()
+            }
+        
+        try:
+            return await self.llm_executor.ainvoke_parsed(prompt, parse)
+            
+        except (json.JSONDecodeError, Exception) as e:
+            # Every voucher in the batch stays unmatched; record which ones
+            log_error(
+                "AIReconciliation", type(e).__name__, f"AI batch reconciliation error: {e}",
+                company_id=self.context.company_id, voucher_ids=list(candidate_ids)
+            )
+            return {}
+    
     async def analyze_financial_anomalies(
         self, 
         vouchers: List[VoucherHeader]
@@ -185,9 +510,7 @@ class AIReconciliationService:
         """
         
         try:
-            response = self.llm.invoke(prompt)
-            analysis = json.loads(response.content)
-            return analysis
+            return await self.llm_executor.ainvoke_parsed(prompt, json.loads)
             
         except Exception as e:
             return {
@@ -199,18 +522,22 @@ class AIReconciliationService:
     async def generate_reconciliation_report(
         self, 
         start_date: datetime, 
-        end_date: datetime
+        end_date: datetime,
+        recon_logs: Optional[List[ReconciliationLog]] = None
     ) -> str:
         """
-        Generate AI-powered reconciliation insights report
+        Generate AI-powered reconciliation insights report.
+        Pass `recon_logs` if the caller already loaded the period's logs
+        (e.g. through an AsyncSession); otherwise they are queried here.
         """
         
         # Get reconciliation data from database
-        recon_logs = self.db.query(ReconciliationLog).filter(
-            ReconciliationLog.company_id == self.context.company_id,
-            ReconciliationLog.created_at >= start_date,
-            ReconciliationLog.created_at <= end_date
-        ).all()
+        if recon_logs is None:
+            recon_logs = self.db.query(ReconciliationLog).filter(
+                ReconciliationLog.company_id == self.context.company_id,
+                ReconciliationLog.created_at >= start_date,
+                ReconciliationLog.created_at <= end_date
+            ).all()
         
         # Prepare data for AI report generation
         recon_data = []
@@ -242,7 +569,7 @@ class AIReconciliationService:
         """
         
         try:
-            response = self.llm.invoke(prompt)
+            response = await self.llm_executor.ainvoke(prompt)
             return response.content
             
         except Exception as e:
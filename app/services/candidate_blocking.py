@@ -0,0 +1,141 @@
+# app/services/candidate_blocking.py
+"""
+Deterministic candidate blocking for bank reconciliation.
+Narrows the bank statement pool down to a handful of plausible candidates
+per voucher so the LLM only ever sees a short, relevant list.
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.cdm.models.transaction import VoucherHeader
+from app.cdm.models.external import BankStatement
+
+# Money comes into the bank for these voucher types, goes out for the others
+CREDIT_VOUCHER_TYPES = {"sales", "receipt", "credit note"}
+DEBIT_VOUCHER_TYPES = {"purchase", "payment", "debit note"}
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9]")
+
+
+def expected_dr_cr(voucher_type: Optional[str]) -> Optional[str]:
+    """Bank side (DR/CR) a voucher of this type should appear on, if known"""
+    vtype = (voucher_type or "").strip().lower()
+    if vtype in CREDIT_VOUCHER_TYPES:
+        return "CR"
+    if vtype in DEBIT_VOUCHER_TYPES:
+        return "DR"
+    return None
+
+
+def normalize_dr_cr(dr_cr: Optional[str]) -> str:
+    """Normalize 'Dr', 'DR', 'debit' etc. to 'DR'/'CR'"""
+    return (dr_cr or "").strip().upper()[:2]
+
+
+def normalize_ref(ref: Optional[str]) -> str:
+    """Normalize cheque/reference numbers for exact comparison"""
+    return _NON_ALNUM.sub("", (ref or "").upper())
+
+
+def amount_in_paise(amount) -> int:
+    """Convert a monetary amount to integer paise to avoid float comparisons"""
+    return int((Decimal(str(amount)) * 100).to_integral_value())
+
+
+class CandidateIndex:
+    """
+    In-memory index of bank statements keyed by (dr_cr, amount bucket) with
+    date-sorted postings, plus an exact lookup on cheque reference.
+
+    Buckets are as wide as the amount tolerance, so any statement within
+    tolerance of a voucher lives in the voucher's bucket or a neighbour.
+    """
+
+    def __init__(
+        self,
+        bank_statements: Iterable[BankStatement],
+        amount_tolerance: float,
+        date_window_days: int
+    ):
+        self.amount_tolerance_paise = max(1, amount_in_paise(amount_tolerance))
+        self.date_window = timedelta(days=date_window_days)
+
+        buckets: Dict[Tuple[str, int], List[BankStatement]] = defaultdict(list)
+        self._by_ref: Dict[str, List[BankStatement]] = defaultdict(list)
+        self._paise: Dict[str, int] = {}
+        self._claimed: Set[str] = set()
+
+        for stmt in bank_statements:
+            paise = amount_in_paise(stmt.amount)
+            self._paise[stmt.bank_txn_id] = paise
+            buckets[(normalize_dr_cr(stmt.dr_cr), self._bucket(paise))].append(stmt)
+            ref = normalize_ref(stmt.cheque_ref)
+            if ref:
+                self._by_ref[ref].append(stmt)
+
+        # Keep each bucket date-sorted with a parallel key list for bisect
+        self._buckets: Dict[Tuple[str, int], Tuple[list, List[BankStatement]]] = {}
+        for key, rows in buckets.items():
+            rows.sort(key=lambda s: s.txn_date)
+            self._buckets[key] = ([s.txn_date for s in rows], rows)
+
+    def __len__(self) -> int:
+        return len(self._paise) - len(self._claimed)
+
+    def _bucket(self, paise: int) -> int:
+        return paise // self.amount_tolerance_paise
+
+    def claim(self, bank_txn_id: str):
+        """Remove a statement from future candidate lists once it is matched"""
+        self._claimed.add(bank_txn_id)
+
+    def is_claimed(self, bank_txn_id: str) -> bool:
+        return bank_txn_id in self._claimed
+
+    def candidates(self, voucher: VoucherHeader, limit: int) -> List[BankStatement]:
+        """
+        Return at most `limit` unclaimed statements for a voucher, best first.
+        Reference matches rank ahead of amount/date matches.
+        """
+        target = amount_in_paise(voucher.total_amount)
+        direction = expected_dr_cr(voucher.voucher_type)
+        directions = [direction] if direction else ["DR", "CR"]
+        window_start = voucher.voucher_date - self.date_window
+        window_end = voucher.voucher_date + self.date_window
+
+        scored: Dict[str, Tuple[int, int, int, BankStatement]] = {}
+
+        def score(stmt: BankStatement, ref_rank: int):
+            if stmt.bank_txn_id in self._claimed:
+                return
+            amount_gap = abs(self._paise[stmt.bank_txn_id] - target)
+            date_gap = abs((stmt.txn_date - voucher.voucher_date).days)
+            key = (ref_rank, amount_gap, date_gap, stmt)
+            existing = scored.get(stmt.bank_txn_id)
+            if existing is None or key[:3] < existing[:3]:
+                scored[stmt.bank_txn_id] = key
+
+        for ref in {normalize_ref(voucher.ref_document), normalize_ref(voucher.voucher_number)}:
+            for stmt in self._by_ref.get(ref, []) if ref else []:
+                score(stmt, 0)
+
+        bucket = self._bucket(target)
+        for dr_cr in directions:
+            for neighbour in (bucket - 1, bucket, bucket + 1):
+                entry = self._buckets.get((dr_cr, neighbour))
+                if not entry:
+                    continue
+                dates, rows = entry
+                lo = bisect_left(dates, window_start)
+                hi = bisect_right(dates, window_end)
+                for stmt in rows[lo:hi]:
+                    if abs(self._paise[stmt.bank_txn_id] - target) <= self.amount_tolerance_paise:
+                        score(stmt, 1)
+
+        ranked = sorted(scored.values(), key=lambda item: item[:3])
+        return [item[3] for item in ranked[:limit]]
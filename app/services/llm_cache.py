@@ -0,0 +1,152 @@
+# app/services/llm_cache.py
+"""
+Persistent, content-addressed cache of LLM responses.
+Keys are a fingerprint of (company, model, temperature, normalized prompt),
+so re-running the same reconciliation or report costs a DB lookup instead
+of a model call.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from langchain_core.messages import AIMessage
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.cdm.models.reconciliation import LLMCacheEntry
+
+# Run the (comparatively expensive) eviction sweep once per this many writes
+EVICTION_INTERVAL = 100
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so indentation changes don't bust the cache"""
+    return " ".join(prompt.split())
+
+
+class LLMResponseCache:
+    """
+    DB-backed LLM response cache with TTL expiry and LRU eviction.
+    Uses short-lived sessions of its own so cache writes never ride along
+    with (or get rolled back by) the caller's transaction.
+    """
+
+    _writes = 0
+    _writes_lock = threading.Lock()
+
+    def __init__(
+        self,
+        model_name: str,
+        temperature: Optional[float],
+        company_id: Optional[str] = None,
+        ttl_seconds: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        session_factory: Callable[[], Session] = SessionLocal
+    ):
+        self.model_name = model_name
+        self.temperature = temperature
+        self.company_id = company_id
+        self.ttl = timedelta(seconds=ttl_seconds or settings.LLM_CACHE_TTL_SECONDS)
+        self.max_entries = max_entries or settings.LLM_CACHE_MAX_ENTRIES
+        self.session_factory = session_factory
+
+    @classmethod
+    def for_llm(cls, llm, company_id: Optional[str] = None, **kwargs) -> "LLMResponseCache":
+        """Build a cache scoped to a LangChain chat model's name and temperature"""
+        model_name = getattr(llm, "model_name", None) or getattr(llm, "model", None) or "unknown"
+        return cls(model_name, getattr(llm, "temperature", None), company_id=company_id, **kwargs)
+
+    def key_for(self, prompt: str) -> str:
+        fingerprint = json.dumps(
+            [self.company_id, self.model_name, self.temperature, normalize_prompt(prompt)]
+        )
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str) -> Optional[AIMessage]:
+        """Return the cached response for a prompt, or None on a miss"""
+        now = datetime.now(timezone.utc)
+        db = self.session_factory()
+        try:
+            entry = db.query(LLMCacheEntry).filter(
+                LLMCacheEntry.cache_key == self.key_for(prompt),
+                LLMCacheEntry.expires_at > now
+            ).first()
+            if entry is None:
+                return None
+            entry.hit_count = (entry.hit_count or 0) + 1
+            entry.last_accessed_at = now
+            content = entry.response_text
+            db.commit()
+            return AIMessage(content=content)
+        finally:
+            db.close()
+
+    def set(self, prompt: str, content: str):
+        """Store (or refresh) the response for a prompt"""
+        now = datetime.now(timezone.utc)
+        db = self.session_factory()
+        try:
+            db.merge(LLMCacheEntry(
+                cache_key=self.key_for(prompt),
+                company_id=self.company_id,
+                model_name=self.model_name,
+                temperature=self.temperature,
+                response_text=content,
+                hit_count=0,
+                created_at=now,
+                last_accessed_at=now,
+                expires_at=now + self.ttl
+            ))
+            db.commit()
+            if self._should_evict():
+                self.evict(db)
+        finally:
+            db.close()
+
+    def delete(self, prompt: str):
+        """Drop the response for a prompt, e.g. one its caller could not use"""
+        db = self.session_factory()
+        try:
+            db.query(LLMCacheEntry).filter(
+                LLMCacheEntry.cache_key == self.key_for(prompt)
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    @classmethod
+    def _should_evict(cls) -> bool:
+        with cls._writes_lock:
+            cls._writes += 1
+            return cls._writes % EVICTION_INTERVAL == 0
+
+    def evict(self, db: Session):
+        """Drop expired entries, then the least recently used beyond max_entries"""
+        now = datetime.now(timezone.utc)
+        db.query(LLMCacheEntry).filter(
+            LLMCacheEntry.expires_at <= now
+        ).delete(synchronize_session=False)
+
+        excess = db.query(LLMCacheEntry).count() - self.max_entries
+        if excess > 0:
+            stale_keys = db.query(LLMCacheEntry.cache_key).order_by(
+                LLMCacheEntry.last_accessed_at.asc()
+            ).limit(excess).subquery()
+            db.query(LLMCacheEntry).filter(
+                LLMCacheEntry.cache_key.in_(stale_keys.select())
+            ).delete(synchronize_session=False)
+        db.commit()
+
+    async def aget(self, prompt: str) -> Optional[AIMessage]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, prompt)
+
+    async def aset(self, prompt: str, content: str):
+        await asyncio.get_running_loop().run_in_executor(None, self.set, prompt, content)
+
+    async def adelete(self, prompt: str):
+        await asyncio.get_running_loop().run_in_executor(None, self.delete, prompt)
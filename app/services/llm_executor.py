@@ -0,0 +1,194 @@
+# app/services/llm_executor.py
+"""
+Concurrent, rate-limited access to the LLM.
+Wraps the async client with a concurrency cap, a process-wide token bucket
+and per-call timeouts so fan-out never blocks the event loop. An optional
+response cache is consulted before any of that.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.logger import log_error
+
+T = TypeVar("T")
+
+# Rough chars-per-token ratio for English/JSON prompts on GPT-family models
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for prompt packing"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def pack_by_token_budget(
+    items: Iterable[T],
+    cost: Callable[[T], int],
+    token_budget: int,
+    max_items: int
+) -> List[List[T]]:
+    """
+    Greedily pack items, in order, into batches whose summed cost stays within
+    `token_budget` and whose length stays within `max_items`. An item larger
+    than the budget on its own still gets a batch of its own.
+    """
+    batches: List[List[T]] = []
+    current: List[T] = []
+    used = 0
+    for item in items:
+        item_cost = cost(item)
+        if current and (used + item_cost > token_budget or len(current) >= max_items):
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += item_cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Not tied to an event loop, so one bucket can
+    throttle calls coming from request handlers and background workers alike.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: int):
+        self.rate = max(rate_per_second, 0.001)
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token, returning how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    async def acquire(self):
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_rate_limiter: Optional[TokenBucket] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_llm_rate_limiter() -> TokenBucket:
+    """Process-wide rate limiter shared by every LLMExecutor"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucket(
+                rate_per_second=settings.LLM_REQUESTS_PER_SECOND,
+                capacity=settings.LLM_MAX_CONCURRENCY
+            )
+        return _rate_limiter
+
+
+class LLMExecutor:
+    """
+    Runs LLM calls through `ainvoke` with at most `max_concurrency` in flight,
+    throttled by the shared token bucket and bounded by `timeout_seconds`.
+    Cache hits skip the semaphore and rate limiter entirely.
+    """
+
+    def __init__(
+        self,
+        llm,
+        max_concurrency: Optional[int] = None,
+        timeout_seconds: Optional[float] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        cache=None
+    ):
+        self.llm = llm
+        self.cache = cache
+        self.max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        self.timeout_seconds = timeout_seconds or settings.LLM_TIMEOUT_SECONDS
+        self.rate_limiter = rate_limiter or get_llm_rate_limiter()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the loop that actually runs the calls
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _cached(self, prompt: str):
+        if self.cache is None:
+            return None
+        try:
+            return await self.cache.aget(prompt)
+        except Exception as e:
+            # A broken cache must never take the LLM path down with it
+            log_error("LLMExecutor", type(e).__name__, f"LLM cache lookup failed: {e}")
+            return None
+
+    async def _store(self, prompt: str, content: str):
+        if self.cache is None:
+            return
+        try:
+            await self.cache.aset(prompt, content)
+        except Exception as e:
+            log_error("LLMExecutor", type(e).__name__, f"LLM cache store failed: {e}")
+
+    async def _forget(self, prompt: str):
+        try:
+            await self.cache.adelete(prompt)
+        except Exception as e:
+            log_error("LLMExecutor", type(e).__name__, f"LLM cache delete failed: {e}")
+
+    async def _call(self, prompt: str) -> Any:
+        async with self.semaphore:
+            await self.rate_limiter.acquire()
+            return await asyncio.wait_for(self.llm.ainvoke(prompt), timeout=self.timeout_seconds)
+
+    async def ainvoke(self, prompt: str) -> Any:
+        """
+        Invoke the LLM once; raises asyncio.TimeoutError on timeout. Every
+        response is cached, so use ainvoke_parsed when the caller can reject it.
+        """
+        cached = await self._cached(prompt)
+        if cached is not None:
+            return cached
+        response = await self._call(prompt)
+        await self._store(prompt, response.content)
+        return response
+
+    async def ainvoke_parsed(self, prompt: str, parse: Callable[[str], T]) -> T:
+        """
+        Invoke the LLM and return `parse(response.content)`. A response is
+        cached only once `parse` accepts it; a cached response it rejects is
+        dropped and the model asked again. Errors from `parse` propagate.
+        """
+        cached = await self._cached(prompt)
+        if cached is not None:
+            try:
+                return parse(cached.content)
+            except Exception as e:
+                log_error("LLMExecutor", type(e).__name__, f"Dropping unparseable cached LLM response: {e}")
+                await self._forget(prompt)
+
+        response = await self._call(prompt)
+        parsed = parse(response.content)
+        await self._store(prompt, response.content)
+        return parsed
+
+    async def map(self, func: Callable[[T], Awaitable[Any]], items: Iterable[T]) -> List[Any]:
+        """
+        Run `func` over `items` concurrently (bounded by the semaphore inside
+        `ainvoke`) and return results in input order
+        """
+        return await asyncio.gather(*(func(item) for item in items))
@@ -0,0 +1,203 @@
+# app/services/reconciliation_jobs.py
+"""
+Background execution of AI reconciliation runs.
+Requests enqueue a ReconciliationJob and return immediately; a bounded
+worker pool runs the job with its own DB session and event loop and keeps
+the job's progress counters (and heartbeat) current for polling, writing
+them at most every RECON_PROGRESS_EVERY vouchers or
+RECON_PROGRESS_INTERVAL_SECONDS. On startup, recover_interrupted_jobs
+hands queued jobs to the pool again and fails the ones whose worker died.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.logger import log_error
+from app.core.tenant_context import TenantContext
+from app.cdm.models.reconciliation import ReconciliationJob
+from app.services.ai_reconciliation import AIReconciliationService, summarize_reconciliation
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_job_executor() -> ThreadPoolExecutor:
+    """Process-wide worker pool for reconciliation jobs"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.RECON_JOB_WORKERS,
+            thread_name_prefix="recon-job"
+        )
+    return _executor
+
+
+def shutdown_job_executor():
+    """
+    Stop accepting work and drop jobs that have not started (they stay
+    Queued for the next startup); running jobs are left to finish.
+    """
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def enqueue_bank_reconciliation(
+    db: Session,
+    context: TenantContext,
+    start_date: date,
+    end_date: date,
+    auto_match_threshold: Optional[float] = None,
+    incremental: bool = False
+) -> ReconciliationJob:
+    """Persist a queued job and hand it to the worker pool"""
+    job = ReconciliationJob(
+        company_id=context.company_id,
+        firm_id=context.firm_id,
+        requested_by=context.user_id,
+        job_type="bank_reconciliation",
+        parameters={
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "auto_match_threshold": auto_match_threshold,
+            "incremental": incremental
+        },
+        status="Queued"
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    get_job_executor().submit(run_bank_reconciliation_job, job.job_id)
+    return job
+
+
+def _update_job(session_factory: Callable[[], Session], job_id: str, **fields):
+    db = session_factory()
+    try:
+        db.query(ReconciliationJob).filter(ReconciliationJob.job_id == job_id).update(
+            fields, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def recover_interrupted_jobs(session_factory: Callable[[], Session] = SessionLocal) -> Dict[str, int]:
+    """
+    Startup sweep. Queued jobs are submitted to the pool again (the claim
+    in run_bank_reconciliation_job keeps a job from running twice when
+    several processes do this). Processing jobs without a heartbeat for
+    RECON_JOB_STALE_SECONDS lost their worker and are marked Failed.
+    """
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(seconds=settings.RECON_JOB_STALE_SECONDS)
+    db = session_factory()
+    try:
+        queued = [job_id for (job_id,) in db.query(ReconciliationJob.job_id).filter(
+            ReconciliationJob.status == "Queued"
+        )]
+        interrupted = db.query(ReconciliationJob).filter(
+            ReconciliationJob.status == "Processing",
+            (ReconciliationJob.heartbeat_at < cutoff) | ReconciliationJob.heartbeat_at.is_(None)
+        ).update({
+            "status": "Failed",
+            "error_details": {"error_type": "Interrupted", "message": "Worker stopped before the job finished"},
+            "end_time": now
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+    for job_id in queued:
+        get_job_executor().submit(run_bank_reconciliation_job, job_id)
+    return {"requeued": len(queued), "failed": interrupted}
+
+
+def run_bank_reconciliation_job(job_id: str, session_factory: Callable[[], Session] = SessionLocal):
+    """Worker entry point: run one queued bank reconciliation job to completion"""
+    started = time.perf_counter()
+    db = session_factory()
+    company_id = None
+    try:
+        # Claim the job atomically so a job submitted twice runs once
+        run_started_at = datetime.now(timezone.utc)
+        claimed = db.query(ReconciliationJob).filter(
+            ReconciliationJob.job_id == job_id,
+            ReconciliationJob.status == "Queued"
+        ).update({
+            "status": "Processing",
+            "start_time": run_started_at,
+            "heartbeat_at": run_started_at
+        }, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            return
+        job = db.query(ReconciliationJob).filter(ReconciliationJob.job_id == job_id).one()
+        company_id = job.company_id
+        incremental = bool(job.parameters.get("incremental"))
+
+        context = TenantContext(
+            firm_id=job.firm_id,
+            company_id=job.company_id,
+            user_id=job.requested_by
+        )
+        service = AIReconciliationService(db, context)
+        vouchers, bank_statements = service.load_bank_reconciliation_inputs(
+            date.fromisoformat(job.parameters["start_date"]),
+            date.fromisoformat(job.parameters["end_date"]),
+            incremental=incremental
+        )
+        _update_job(session_factory, job_id, progress_total=len(vouchers))
+
+        last_write = {"done": 0, "at": time.monotonic()}
+
+        def on_progress(processed: int, total: int):
+            # Runs on the job's event loop: throttle the blocking write
+            now = time.monotonic()
+            if (processed - last_write["done"] < settings.RECON_PROGRESS_EVERY
+                    and now - last_write["at"] < settings.RECON_PROGRESS_INTERVAL_SECONDS):
+                return
+            last_write.update(done=processed, at=now)
+            _update_job(session_factory, job_id, progress_done=processed,
+                        heartbeat_at=datetime.now(timezone.utc))
+
+        results = asyncio.run(
+            service.intelligent_bank_reconciliation(
+                vouchers, bank_statements, progress_callback=on_progress,
+                auto_match_threshold=job.parameters.get("auto_match_threshold")
+            )
+        )
+        if incremental:
+            service.advance_watermark(run_started_at, job_id=job_id)
+            db.commit()
+
+        duration = time.perf_counter() - started
+        _update_job(
+            session_factory, job_id,
+            status="Completed",
+            progress_done=len(vouchers),
+            result=summarize_reconciliation(len(vouchers), results, duration),
+            end_time=datetime.now(timezone.utc),
+            processing_duration=round(duration, 3)
+        )
+
+    except Exception as e:
+        db.rollback()
+        log_error("ReconciliationJob", type(e).__name__, str(e), company_id=company_id, job_id=job_id)
+        _update_job(
+            session_factory, job_id,
+            status="Failed",
+            error_details={"error_type": type(e).__name__, "message": str(e)},
+            end_time=datetime.now(timezone.utc),
+            processing_duration=round(time.perf_counter() - started, 3)
+        )
+    finally:
+        db.close()
@@ -0,0 +1,96 @@
+# app/services/reconciliation_writer.py
+"""
+Bulk write path for reconciliation outcomes.
+Matches are staged as plain rows during a run and written with chunked
+executemany statements instead of one ORM object per match, so large runs
+avoid unit-of-work overhead.
+"""
+
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.cdm.models.reconciliation import ReconciliationLog
+from app.cdm.models.transaction import VoucherHeader, ReconciliationStatus
+from app.cdm.models.external import BankStatement
+
+
+def _chunks(rows: List[Dict], size: int) -> Iterator[List[Dict]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+class ReconciliationWriter:
+    """
+    Collects ReconciliationLog rows plus the voucher and bank statement
+    updates that go with them, and writes all three in one transaction
+    """
+
+    def __init__(self, company_id: str, chunk_size: Optional[int] = None):
+        self.company_id = company_id
+        self.chunk_size = max(1, chunk_size or settings.RECON_WRITE_CHUNK_SIZE)
+        self.log_rows: List[Dict] = []
+        self.voucher_rows: List[Dict] = []
+        self.statement_rows: List[Dict] = []
+
+    def __len__(self) -> int:
+        return len(self.log_rows)
+
+    def stage(
+        self,
+        voucher_id: str,
+        bank_txn_id: str,
+        match: Dict,
+        match_rule: str,
+        requires_review: bool
+    ):
+        """Queue one voucher/bank statement match for writing"""
+        self.log_rows.append({
+            "company_id": self.company_id,
+            "source_table": "vouchers",
+            "target_table": "bank_statements",
+            "source_record_id": voucher_id,
+            "target_record_id": bank_txn_id,
+            "match_score": match['confidence_score'],
+            "match_rule": match_rule,
+            "rule_details": {
+                "ai_reasoning": match['reasoning'],
+                "amount_variance": match.get('amount_variance', 0),
+                "date_variance_days": match.get('date_variance', 0),
+                "description_similarity": match.get('description_similarity', 0)
+            },
+            "status": "Manual_Review" if requires_review else "Matched",
+            "ai_reasoning": match['reasoning']
+        })
+        # Pairs sent to review stay Unmatched on the voucher but are linked,
+        # so later runs still skip them
+        self.voucher_rows.append({
+            "voucher_id": voucher_id,
+            "reconciliation_status": (
+                ReconciliationStatus.UNMATCHED if requires_review else ReconciliationStatus.AUTO_MATCHED
+            ),
+            "reconciliation_source": match_rule,
+            "reconciliation_confidence": match['confidence_score']
+        })
+        self.statement_rows.append({
+            "bank_txn_id": bank_txn_id,
+            "linked_voucher_id": voucher_id,
+            "reconciliation_status": "Near_Match" if requires_review else "Matched"
+        })
+
+    def flush(self, db: Session):
+        """
+        Write everything staged so far using the caller's session (and so
+        its transaction); the caller commits
+        """
+        for chunk in _chunks(self.log_rows, self.chunk_size):
+            db.execute(insert(ReconciliationLog), chunk)
+        # ORM bulk UPDATE by primary key: one executemany per chunk
+        for chunk in _chunks(self.voucher_rows, self.chunk_size):
+            db.execute(update(VoucherHeader), chunk)
+        for chunk in _chunks(self.statement_rows, self.chunk_size):
+            db.execute(update(BankStatement), chunk)
+
+        self.log_rows, self.voucher_rows, self.statement_rows = [], [], []
@@ -0,0 +1,164 @@
+# app/services/rule_reconciler.py
+"""
+Rule-based voucher <-> bank statement matching.
+Vectorized pre-pass that settles the trivially reconcilable population
+(same amount, same side, close dates) without involving the LLM.
+"""
+
+from decimal import Decimal
+from typing import Dict, List
+
+import pandas as pd
+
+from app.cdm.models.transaction import VoucherHeader
+from app.cdm.models.external import BankStatement
+from app.services.candidate_blocking import (
+    amount_in_paise,
+    expected_dr_cr,
+    normalize_dr_cr,
+    normalize_ref
+)
+
+EXACT_CONFIDENCE = Decimal("0.9900")
+NEAR_CONFIDENCE_CEILING = 0.95
+NEAR_CONFIDENCE_FLOOR = 0.80
+
+
+def _voucher_frame(vouchers: List[VoucherHeader]) -> pd.DataFrame:
+    df = pd.DataFrame({
+        "voucher_id": [v.voucher_id for v in vouchers],
+        "v_paise": [amount_in_paise(v.total_amount) for v in vouchers],
+        "v_date": pd.to_datetime([v.voucher_date for v in vouchers]),
+        "direction": [expected_dr_cr(v.voucher_type) for v in vouchers],
+        "v_ref": [normalize_ref(v.ref_document) for v in vouchers],
+    })
+    # Vouchers of unknown direction may match either side of the bank book
+    unknown = df["direction"].isna()
+    if unknown.any():
+        either = df[unknown]
+        df = pd.concat([
+            df[~unknown],
+            either.assign(direction="DR"),
+            either.assign(direction="CR"),
+        ], ignore_index=True)
+    return df
+
+
+def _bank_frame(bank_statements: List[BankStatement]) -> pd.DataFrame:
+    return pd.DataFrame({
+        "bank_txn_id": [s.bank_txn_id for s in bank_statements],
+        "b_paise": [amount_in_paise(s.amount) for s in bank_statements],
+        "b_date": pd.to_datetime([s.txn_date for s in bank_statements]),
+        "direction": [normalize_dr_cr(s.dr_cr) for s in bank_statements],
+        "b_ref": [normalize_ref(s.cheque_ref) for s in bank_statements],
+    })
+
+
+def _resolve_one_to_one(pairs: pd.DataFrame) -> pd.DataFrame:
+    """Greedily keep the best pair per voucher and per bank statement"""
+    pairs = pairs.sort_values(["ref_match", "amount_gap", "date_gap"], ascending=[False, True, True])
+    pairs = pairs.drop_duplicates("voucher_id")
+    return pairs.drop_duplicates("bank_txn_id")
+
+
+def _candidate_pairs(
+    vdf: pd.DataFrame,
+    bdf: pd.DataFrame,
+    left_on: List[str],
+    right_on: List[str],
+    max_days: int
+) -> pd.DataFrame:
+    pairs = vdf.merge(bdf, left_on=left_on, right_on=right_on, how="inner")
+    pairs["amount_gap"] = (pairs["b_paise"] - pairs["v_paise"]).abs()
+    pairs["date_gap"] = (pairs["b_date"] - pairs["v_date"]).dt.days.abs()
+    # Conflicting references on both sides rule a pair out
+    both_refs = (pairs["v_ref"] != "") & (pairs["b_ref"] != "")
+    pairs["ref_match"] = both_refs & (pairs["v_ref"] == pairs["b_ref"])
+    return pairs[(pairs["date_gap"] <= max_days) & (~both_refs | pairs["ref_match"])]
+
+
+def match_by_rules(
+    vouchers: List[VoucherHeader],
+    bank_statements: List[BankStatement],
+    exact_date_window_days: int,
+    near_date_window_days: int,
+    near_amount_tolerance: float
+) -> List[Dict]:
+    """
+    Match vouchers to bank statements using deterministic rules.
+
+    EXACT: same side, identical amount, dates within `exact_date_window_days`.
+    NEAR:  same side, amount within `near_amount_tolerance`, dates within
+           `near_date_window_days`.
+
+    Each voucher and statement is used at most once. Returns match dicts in
+    the same shape as the AI matcher, with an extra `match_rule` key.
+    """
+    if not vouchers or not bank_statements:
+        return []
+
+    vdf = _voucher_frame(vouchers)
+    bdf = _bank_frame(bank_statements)
+    results: List[Dict] = []
+
+    # --- EXACT: equi-join on side and amount ---
+    exact = _resolve_one_to_one(_candidate_pairs(
+        vdf, bdf,
+        left_on=["direction", "v_paise"],
+        right_on=["direction", "b_paise"],
+        max_days=exact_date_window_days
+    ))
+    for row in exact.itertuples(index=False):
+        results.append({
+            "voucher_id": row.voucher_id,
+            "bank_record_id": row.bank_txn_id,
+            "match_rule": "EXACT",
+            "confidence_score": EXACT_CONFIDENCE,
+            "reasoning": f"Exact amount on the same side, {row.date_gap} day(s) apart",
+            "amount_variance": 0.0,
+            "date_variance": int(row.date_gap),
+            "description_similarity": 1.0 if row.ref_match else 0.0
+        })
+
+    # --- NEAR: join on side and amount bucket, then check tolerance ---
+    vdf = vdf[~vdf["voucher_id"].isin(exact["voucher_id"])]
+    bdf = bdf[~bdf["bank_txn_id"].isin(exact["bank_txn_id"])]
+    tolerance = max(1, amount_in_paise(near_amount_tolerance))
+    if vdf.empty or bdf.empty:
+        return results
+
+    bdf = bdf.assign(bucket=bdf["b_paise"] // tolerance)
+    vdf = pd.concat(
+        [vdf.assign(bucket=vdf["v_paise"] // tolerance + offset) for offset in (-1, 0, 1)],
+        ignore_index=True
+    )
+    near = _candidate_pairs(
+        vdf, bdf,
+        left_on=["direction", "bucket"],
+        right_on=["direction", "bucket"],
+        max_days=near_date_window_days
+    )
+    near = _resolve_one_to_one(near[near["amount_gap"] <= tolerance])
+
+    spread = NEAR_CONFIDENCE_CEILING - NEAR_CONFIDENCE_FLOOR
+    penalty = (
+        (near["amount_gap"] / tolerance) * (spread / 2) +
+        (near["date_gap"] / max(1, near_date_window_days)) * (spread / 2)
+    )
+    near = near.assign(confidence=(NEAR_CONFIDENCE_CEILING - penalty).round(4))
+    for row in near.itertuples(index=False):
+        results.append({
+            "voucher_id": row.voucher_id,
+            "bank_record_id": row.bank_txn_id,
+            "match_rule": "NEAR",
+            "confidence_score": Decimal(str(row.confidence)),
+            "reasoning": (
+                f"Amount within {row.amount_gap / 100:.2f} on the same side, "
+                f"{row.date_gap} day(s) apart"
+            ),
+            "amount_variance": float(row.b_paise - row.v_paise) / 100,
+            "date_variance": int(row.date_gap),
+            "description_similarity": 1.0 if row.ref_match else 0.0
+        })
+
+    return results
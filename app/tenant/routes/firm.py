@@ -1,8 +1,9 @@
 # app/tenant/routes/firm.py
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import Optional, List
-from app.core.database import get_db
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.core.database import get_async_db, get_async_read_db
 from app.core.auth import (
     get_current_active_user, 
     require_trenor_admin, 
@@ -10,6 +11,8 @@ from app.core.auth import (
     AuthenticatedUser,
     get_user_accessible_firms
 )
+from app.core.pagination import keyset_page, next_cursor
+from app.core.tenant_access import invalidate_access
 from app.tenant.models.firm import CAFirm
 from app.tenant.models.user import User, UserRole
 from app.cdm.models.entity import Entity
@@ -23,28 +26,19 @@ from app.tenant.schemas.firm import (
 
 router = APIRouter(prefix="/firms", tags=["CA Firms"])
 
+FIRM_PAGE_KEY = (CAFirm.firm_name, CAFirm.firm_id)
 
-def get_user_accessible_firms(db: Session, user: AuthenticatedUser) -> List[str]:
-    """Get list of firm IDs that the user has access to"""
-    if user.role == UserRole.TRENOR_ADMIN:
-        # Trenor admins can access all firms
-        firms = db.query(CAFirm.firm_id).all()
-        return [firm.firm_id for firm in firms]
-    elif user.firm_id:
-        # Other users can only access their own firm
-        return [user.firm_id]
-    else:
-        return []
 
 @router.post("/", response_model=CAFirmResponse)
 async def create_firm(
     firm_data: CAFirmCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthenticatedUser = Depends(require_trenor_admin)
 ):
     """Create a new CA firm"""
     # Check if firm code already exists
-    existing_firm = db.query(CAFirm).filter(CAFirm.firm_code == firm_data.firm_code).first()
+    result = await db.execute(select(CAFirm).where(CAFirm.firm_code == firm_data.firm_code))
+    existing_firm = result.scalars().first()
     if existing_firm:
         raise HTTPException(
             status_code=400,
@@ -52,7 +46,8 @@ async def create_firm(
         )
     
     # Check if email already exists
-    existing_email = db.query(CAFirm).filter(CAFirm.email == firm_data.email).first()
+    result = await db.execute(select(CAFirm).where(CAFirm.email == firm_data.email))
+    existing_email = result.scalars().first()
     if existing_email:
         raise HTTPException(
             status_code=400,
@@ -61,8 +56,9 @@ async def create_firm(
     
     firm = CAFirm(**firm_data.model_dump())
     db.add(firm)
-    db.commit()
-    db.refresh(firm)
+    await db.commit()
+    await db.refresh(firm)
+    invalidate_access(firm.firm_id)
     
     return firm
 
@@ -72,55 +68,66 @@ async def list_firms(
     per_page: int = Query(20, ge=1, le=100),
     active_only: bool = Query(True),
     search: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(True),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthenticatedUser = Depends(get_current_active_user)
 ):
-    """List CA firms with pagination and filtering"""
-    query = db.query(CAFirm)
+    """
+    List CA firms by name. Pass `next_cursor` back as `cursor` for the next
+    page; `page` is still honoured without a cursor. Set include_total=false
+    to skip the count.
+    """
+    query = select(CAFirm)
     
     if active_only:
-        query = query.filter(CAFirm.is_active == True)
+        query = query.where(CAFirm.is_active == True)
     
     if search:
-        query = query.filter(
+        query = query.where(
             CAFirm.firm_name.ilike(f"%{search}%") |
             CAFirm.firm_code.ilike(f"%{search}%") |
             CAFirm.email.ilike(f"%{search}%")
         )
     
     # Filter firms based on user role and permissions
-    accessible_firms = get_user_accessible_firms(db, current_user)
+    accessible_firms = await db.run_sync(get_user_accessible_firms, current_user)
     if current_user.role != UserRole.TRENOR_ADMIN:
-        query = query.filter(CAFirm.firm_id.in_(accessible_firms))
+        query = query.where(CAFirm.firm_id.in_(accessible_firms))
     
-    total = query.count()
-    firms = query.offset((page - 1) * per_page).limit(per_page).all()
+    total = None
+    if include_total:
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+    query = keyset_page(query, FIRM_PAGE_KEY, per_page, cursor)
+    if page > 1 and not cursor:
+        query = query.offset((page - 1) * per_page)
+    result = await db.execute(query)
+    firms, following = next_cursor(result.scalars().all(), FIRM_PAGE_KEY, per_page)
     
     return CAFirmList(
         firms=firms,
         total=total,
         page=page,
-        per_page=per_page
+        per_page=per_page,
+        next_cursor=following
     )
 
 @router.get("/{firm_id}", response_model=CAFirmResponse)
 async def get_firm(
     firm_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthenticatedUser = Depends(get_current_active_user)
 ):
     """Get CA firm by ID"""
     # Check if user has access to this firm
-    accessible_firms = get_user_accessible_firms(db, current_user)
+    accessible_firms = await db.run_sync(get_user_accessible_firms, current_user)
     if firm_id not in accessible_firms:
         raise HTTPException(
             status_code=403,
             detail="Access denied to this firm"
         )
     
-    query = db.query(CAFirm).filter(CAFirm.firm_id == firm_id)
-    
-    firm = query.first()
+    firm = await db.get(CAFirm, firm_id)
     if not firm:
         raise HTTPException(status_code=404, detail="Firm not found")
     
@@ -130,7 +137,7 @@ async def get_firm(
 async def update_firm(
     firm_id: str,
     firm_data: CAFirmUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthenticatedUser = Depends(require_firm_admin)
 ):
     """Update CA firm details"""
@@ -141,9 +148,7 @@ async def update_firm(
             detail="Access denied to update this firm"
         )
     
-    query = db.query(CAFirm).filter(CAFirm.firm_id == firm_id)
-    
-    firm = query.first()
+    firm = await db.get(CAFirm, firm_id)
     if not firm:
         raise HTTPException(status_code=404, detail="Firm not found")
     
@@ -152,15 +157,16 @@ async def update_firm(
     for field, value in update_data.items():
         setattr(firm, field, value)
     
-    db.commit()
-    db.refresh(firm)
+    await db.commit()
+    invalidate_access(firm_id)
+    await db.refresh(firm)
     
     return firm
 
 @router.delete("/{firm_id}")
 async def delete_firm(
     firm_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthenticatedUser = Depends(require_firm_admin)
 ):
     """Soft delete CA firm (set inactive)"""
@@ -171,49 +177,48 @@ async def delete_firm(
             detail="Access denied to delete this firm"
         )
     
-    query = db.query(CAFirm).filter(CAFirm.firm_id == firm_id)
-    
-    firm = query.first()
+    firm = await db.get(CAFirm, firm_id)
     if not firm:
         raise HTTPException(status_code=404, detail="Firm not found")
     
     firm.is_active = False
-    db.commit()
+    await db.commit()
+    invalidate_access(firm_id)
     
     return {"message": "Firm deleted successfully"}
 
 @router.get("/{firm_id}/summary", response_model=CAFirmSummary)
 async def get_firm_summary(
     firm_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: AuthenticatedUser = Depends(get_current_active_user)
 ):
     """Get CA firm summary with statistics"""
     # Check if user has access to this firm
-    accessible_firms = get_user_accessible_firms(db, current_user)
+    accessible_firms = await db.run_sync(get_user_accessible_firms, current_user)
     if firm_id not in accessible_firms:
         raise HTTPException(
             status_code=403,
             detail="Access denied to this firm"
         )
     
-    firm = db.query(CAFirm).filter(CAFirm.firm_id == firm_id).first()
+    firm = await db.get(CAFirm, firm_id)
     if not firm:
         raise HTTPException(status_code=404, detail="Firm not found")
     
     # Get client statistics
-    total_clients = db.query(Entity).filter(Entity.firm_id == firm_id).count()
-    active_clients = db.query(Entity).filter(
+    total_clients = await db.scalar(select(func.count()).select_from(Entity).where(Entity.firm_id == firm_id))
+    active_clients = await db.scalar(select(func.count()).select_from(Entity).where(
         Entity.firm_id == firm_id,
         Entity.is_active == True
-    ).count()
+    ))
     
     # Get user statistics
-    total_users = db.query(User).filter(User.firm_id == firm_id).count()
-    active_users = db.query(User).filter(
+    total_users = await db.scalar(select(func.count()).select_from(User).where(User.firm_id == firm_id))
+    active_users = await db.scalar(select(func.count()).select_from(User).where(
         User.firm_id == firm_id,
         User.is_active == True
-    ).count()
+    ))
     
     return CAFirmSummary(
         firm_id=firm.firm_id,
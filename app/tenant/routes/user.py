@@ -1,18 +1,20 @@
 # app/tenant/routes/user.py
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.auth import (
     get_current_active_user, 
     require_firm_admin, 
     require_staff_access,
     AuthenticatedUser,
-    UserRole
+    UserRole,
+    get_user_accessible_firms
 )
+from app.core.auth_cache import invalidate_user
+from app.core.tenant_access import can_access_company, get_company_firm, invalidate_access
 from app.tenant.models.user import User, UserEntityMap
-from app.tenant.models.firm import CAFirm
-from app.cdm.models.entity import Entity
 from app.tenant.schemas.user import (
     UserCreate,
     UserUpdate,
@@ -28,22 +30,10 @@ from app.tenant.schemas.user import (
 router = APIRouter(prefix="/users", tags=["Users"])
 
 
-def get_user_accessible_firms(db: Session, user: AuthenticatedUser) -> List[str]:
-    """Get list of firm IDs that the user has access to"""
-    if user.role == UserRole.TRENOR_ADMIN:
-        # Trenor admins can access all firms
-        firms = db.query(CAFirm.firm_id).all()
-        return [firm.firm_id for firm in firms]
-    elif user.firm_id:
-        # Other users can only access their own firm
-        return [user.firm_id]
-    else:
-        return []
-
 @router.post("/", response_model=UserResponse)
 async def create_user(
     user_data: UserCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthenticatedUser = Depends(require_firm_admin)
 ):
     """Create a new user within a CA firm"""
@@ -55,7 +45,8 @@ async def create_user(
         )
     
     # Check if email already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    result = await db.execute(select(User).where(User.email == user_data.email))
+    existing_user = result.scalars().first()
     if existing_user:
         raise HTTPException(
             status_code=400,
@@ -68,8 +59,8 @@ async def create_user(
     user.set_password(user_data.password)  # Assuming we implement this method
     
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     return user
 
@@ -80,29 +71,30 @@ async def list_users(
     active_only: bool = Query(True),
     role: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthenticatedUser = Depends(require_staff_access)
 ):
     """List users within the current CA firm"""
     # Filter by user's accessible firms
-    accessible_firms = get_user_accessible_firms(db, current_user)
-    query = db.query(User).filter(User.firm_id.in_(accessible_firms))
+    accessible_firms = await db.run_sync(get_user_accessible_firms, current_user)
+    query = select(User).where(User.firm_id.in_(accessible_firms))
     
     if active_only:
-        query = query.filter(User.is_active == True)
+        query = query.where(User.is_active == True)
     
     if role:
-        query = query.filter(User.role == role)
+        query = query.where(User.role == role)
     
     if search:
-        query = query.filter(
+        query = query.where(
             User.first_name.ilike(f"%{search}%") |
             User.last_name.ilike(f"%{search}%") |
             User.email.ilike(f"%{search}%")
         )
     
-    total = query.count()
-    users = query.offset((page - 1) * per_page).limit(per_page).all()
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
+    result = await db.execute(query.offset((page - 1) * per_page).limit(per_page))
+    users = result.scalars().all()
     
     return UserList(
         users=users,
@@ -114,15 +106,16 @@ async def list_users(
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthenticatedUser = Depends(require_staff_access)
 ):
     """Get user by ID within current firm"""
-    accessible_firms = get_user_accessible_firms(db, current_user)
-    user = db.query(User).filter(
+    accessible_firms = await db.run_sync(get_user_accessible_firms, current_user)
+    result = await db.execute(select(User).where(
         User.user_id == user_id,
         User.firm_id.in_(accessible_firms)
-    ).first()
+    ))
+    user = result.scalars().first()
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -133,15 +126,16 @@ async def get_user(
 async def update_user(
     user_id: str,
     user_data: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthenticatedUser = Depends(require_firm_admin)
 ):
     """Update user details"""
-    accessible_firms = get_user_accessible_firms(db, current_user)
-    user = db.query(User).filter(
+    accessible_firms = await db.run_sync(get_user_accessible_firms, current_user)
+    result = await db.execute(select(User).where(
         User.user_id == user_id,
         User.firm_id.in_(accessible_firms)
-    ).first()
+    ))
+    user = result.scalars().first()
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -151,29 +145,32 @@ async def update_user(
     for field, value in update_data.items():
         setattr(user, field, value)
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    invalidate_user(user.user_id)
+    await db.refresh(user)
     
     return user
 
 @router.delete("/{user_id}")
 async def delete_user(
     user_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthenticatedUser = Depends(require_firm_admin)
 ):
     """Soft delete user (set inactive)"""
-    accessible_firms = get_user_accessible_firms(db, current_user)
-    user = db.query(User).filter(
+    accessible_firms = await db.run_sync(get_user_accessible_firms, current_user)
+    result = await db.execute(select(User).where(
         User.user_id == user_id,
         User.firm_id.in_(accessible_firms)
-    ).first()
+    ))
+    user = result.scalars().first()
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     user.is_active = False
-    db.commit()
+    await db.commit()
+    invalidate_user(user.user_id)
     
     return {"message": "User deleted successfully"}
 
@@ -181,7 +178,7 @@ async def delete_user(
 async def change_password(
     user_id: str,
     password_data: ChangePassword,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthenticatedUser = Depends(get_current_active_user)
 ):
     """Change user password"""
@@ -192,11 +189,12 @@ async def change_password(
             detail="You can only change your own password"
         )
     
-    accessible_firms = get_user_accessible_firms(db, current_user)
-    user = db.query(User).filter(
+    accessible_firms = await db.run_sync(get_user_accessible_firms, current_user)
+    result = await db.execute(select(User).where(
         User.user_id == user_id,
         User.firm_id.in_(accessible_firms)
-    ).first()
+    ))
+    user = result.scalars().first()
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -209,7 +207,8 @@ async def change_password(
         )
     
     user.set_password(password_data.new_password)
-    db.commit()
+    await db.commit()
+    invalidate_user(user.user_id)
     
     return {"message": "Password changed successfully"}
 
@@ -219,34 +218,31 @@ async def change_password(
 async def grant_entity_access(
     user_id: str,
     mapping_data: UserEntityMapCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthenticatedUser = Depends(require_firm_admin)
 ):
     """Grant user access to a specific entity"""
     # Verify user exists in accessible firms
-    accessible_firms = get_user_accessible_firms(db, current_user)
-    user = db.query(User).filter(
+    accessible_firms = await db.run_sync(get_user_accessible_firms, current_user)
+    result = await db.execute(select(User).where(
         User.user_id == user_id,
         User.firm_id.in_(accessible_firms)
-    ).first()
+    ))
+    user = result.scalars().first()
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Verify entity exists in accessible firms
-    entity = db.query(Entity).filter(
-        Entity.company_id == mapping_data.company_id,
-        Entity.firm_id.in_(accessible_firms)
-    ).first()
-    
-    if not entity:
+    if not await db.run_sync(can_access_company, current_user, mapping_data.company_id):
         raise HTTPException(status_code=404, detail="Entity not found")
     
     # Check if mapping already exists
-    existing_mapping = db.query(UserEntityMap).filter(
+    result = await db.execute(select(UserEntityMap).where(
         UserEntityMap.user_id == user_id,
         UserEntityMap.company_id == mapping_data.company_id
-    ).first()
+    ))
+    existing_mapping = result.scalars().first()
     
     if existing_mapping:
         raise HTTPException(
@@ -254,54 +250,59 @@ async def grant_entity_access(
             detail="User already has access to this entity"
         )
     
+    company_firm = await db.run_sync(get_company_firm, mapping_data.company_id)
     mapping = UserEntityMap(**mapping_data.model_dump())
     db.add(mapping)
-    db.commit()
-    db.refresh(mapping)
+    await db.commit()
+    invalidate_access(company_firm)
+    await db.refresh(mapping)
     
     return mapping
 
 @router.get("/{user_id}/entities", response_model=List[UserEntityAccess])
 async def list_user_entities(
     user_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthenticatedUser = Depends(require_staff_access)
 ):
     """List all entities a user has access to"""
     # Verify user exists in accessible firms
-    accessible_firms = get_user_accessible_firms(db, current_user)
-    user = db.query(User).filter(
+    accessible_firms = await db.run_sync(get_user_accessible_firms, current_user)
+    result = await db.execute(select(User).where(
         User.user_id == user_id,
         User.firm_id.in_(accessible_firms)
-    ).first()
+    ))
+    user = result.scalars().first()
 
 @router.put("/{user_id}/entities/{entity_id}", response_model=UserEntityMapResponse)
 async def update_entity_access(
     user_id: str,
     entity_id: str,
     mapping_data: UserEntityMapUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthenticatedUser = Depends(require_firm_admin)
 ):
     """Update user's access level for a specific entity"""
     # Verify user exists in accessible firms
-    accessible_firms = get_user_accessible_firms(db, current_user)
-    user = db.query(User).filter(
+    accessible_firms = await db.run_sync(get_user_accessible_firms, current_user)
+    result = await db.execute(select(User).where(
         User.user_id == user_id,
         User.firm_id.in_(accessible_firms)
-    ).first()
+    ))
+    user = result.scalars().first()
 
 @router.delete("/{user_id}/entities/{entity_id}")
 async def revoke_entity_access(
     user_id: str,
     entity_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthenticatedUser = Depends(require_firm_admin)
 ):
     """Revoke user's access to a specific entity"""
     # Verify user exists in accessible firms
-    accessible_firms = get_user_accessible_firms(db, current_user)
-    user = db.query(User).filter(
+    accessible_firms = await db.run_sync(get_user_accessible_firms, current_user)
+    result = await db.execute(select(User).where(
         User.user_id == user_id,
         User.firm_id.in_(accessible_firms)
-    ).first()
\ No newline at end of file
+    ))
+    user = result.scalars().first()
\ No newline at end of file
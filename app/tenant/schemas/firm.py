@@ -41,9 +41,10 @@ class CAFirmResponse(CAFirmBase):
 class CAFirmList(BaseModel):
     """Schema for listing CA firms"""
     firms: List[CAFirmResponse]
-    total: int
+    total: Optional[int] = None  # Omitted when include_total=false
     page: int
     per_page: int
+    next_cursor: Optional[str] = None
 
 class CAFirmSummary(BaseModel):
     """Schema for CA firm summary statistics"""
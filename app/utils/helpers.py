@@ -2,4 +2,8 @@
 import hashlib
 
 def compute_checksum(content: bytes) -> str:
-    return hashlib.sha256(content).hexdigest()
\ No newline at end of file
+    return hashlib.sha256(content).hexdigest()
+
+def checksum_hasher():
+    """Incremental hasher whose hexdigest() matches compute_checksum"""
+    return hashlib.sha256()
@@ -1,15 +1,19 @@
 # tests/conftest.py
 import pytest
+import asyncio
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from fastapi.testclient import TestClient
 from app.main import app
-from app.core.database import get_db, Base
+from app.core.database import get_db, get_async_db, get_read_db, get_async_read_db, Base
 from app.tenant.models.firm import CAFirm
 from app.tenant.models.user import User
 from app.cdm.models.entity import Entity
-from app.core.auth import create_access_token, get_password_hash, UserRole
+from app.core.auth import create_access_token, create_tokens_for_user, get_password_hash, UserRole
+from app.core.auth_cache import user_cache
+from app.core.tenant_access import invalidate_access
 from datetime import datetime, timedelta
 import uuid
 
@@ -21,6 +25,9 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db")
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 
 def override_get_db():
     try:
@@ -30,7 +37,15 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_read_db] = override_get_db
+app.dependency_overrides[get_async_read_db] = override_get_async_db
 
 
 @pytest.fixture(scope="session")
@@ -55,6 +70,70 @@ def db_session(db_engine):
     connection.close()
 
 
+@pytest.fixture(autouse=True)
+def empty_auth_caches():
+    """Resolved users and access maps must not leak between tests"""
+    user_cache.clear()
+    invalidate_access()
+    yield
+    user_cache.clear()
+    invalidate_access()
+
+
+@pytest.fixture
+def committed_db(tmp_path):
+    """
+    File database shared by the app's sync and async sessions. Rows seeded
+    through the returned sessionmaker are committed, so routes see them
+    (db_session keeps its rows in a transaction no other connection sees).
+    """
+    path = tmp_path / "app.db"
+    sync_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=sync_engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    SeedSession = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
+    RouteAsyncSession = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    def committed_get_db():
+        db = SeedSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def committed_get_async_db():
+        async with RouteAsyncSession() as db:
+            yield db
+
+    previous = dict(app.dependency_overrides)
+    app.dependency_overrides.update({
+        get_db: committed_get_db,
+        get_read_db: committed_get_db,
+        get_async_db: committed_get_async_db,
+        get_async_read_db: committed_get_async_db,
+    })
+    yield SeedSession
+    app.dependency_overrides.clear()
+    app.dependency_overrides.update(previous)
+    asyncio.run(async_engine.dispose())
+    sync_engine.dispose()
+
+
+@pytest.fixture
+def seed_user(committed_db):
+    """Commit a user to committed_db; returns its user_id and bearer headers"""
+    def seed(role, firm_id=None, email=None, password="secret123"):
+        db = committed_db()
+        user = User(name=role.value, email=email or f"{uuid.uuid4().hex}@test.com", role=role,
+                    is_active=True, firm_id=firm_id, password_hash=get_password_hash(password))
+        db.add(user)
+        db.commit()
+        user_id, token = user.user_id, create_tokens_for_user(user).access_token
+        db.close()
+        return user_id, {"Authorization": f"Bearer {token}"}
+    return seed
+
+
 @pytest.fixture(scope="function")
 def client():
     """Create test client"""
@@ -1,8 +1,20 @@
 # tests/test_auth.py
+import asyncio
+import time
 import pytest
-from fastapi import status
+from fastapi import HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
 import json
 
+from app.core.auth import create_access_token, get_current_user, get_password_hash, verify_token
+from app.core.auth_cache import AuthUserCache, invalidate_user, user_cache
+from app.core.database import Base
+from app.tenant.models.firm import CAFirm
+from app.tenant.models.user import User, UserRole
+
 
 class TestAuthenticationEndpoints:
     """Test all authentication endpoints"""
@@ -225,6 +237,29 @@ class TestAuthenticationEndpoints:
         assert response.status_code == status.HTTP_403_FORBIDDEN
 
 
+class TestAsyncAuthRoutes:
+    """Test the auth router end to end on committed async sessions"""
+
+    def test_login_then_profile(self, client, committed_db, seed_user):
+        """Test a seeded user logs in and reads their profile with the issued token"""
+        db = committed_db()
+        db.add(CAFirm(firm_id="f1", firm_name="One"))
+        db.commit()
+        db.close()
+        user_id, _ = seed_user(UserRole.CA_FIRM_ADMIN, firm_id="f1", email="async@trenor.com", password="admin123")
+
+        login = client.post("/api/v1/auth/login", json={"email": "async@trenor.com", "password": "admin123"})
+        assert login.status_code == status.HTTP_200_OK
+        token = login.json()["access_token"]
+
+        profile = client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"})
+        assert profile.status_code == status.HTTP_200_OK
+        assert (profile.json()["user_id"], profile.json()["email"]) == (user_id, "async@trenor.com")
+
+        wrong = client.post("/api/v1/auth/login", json={"email": "async@trenor.com", "password": "wrong-password"})
+        assert wrong.status_code == status.HTTP_401_UNAUTHORIZED
+
+
 class TestRoleBasedAccess:
     """Test role-based access control"""
 
@@ -277,4 +312,93 @@ class TestRoleBasedAccess:
     def test_client_limited_access(self, client, auth_headers_client):
         """Test that client users have very limited access"""
         response = client.get("/api/firms", headers=auth_headers_client)
-        assert response.status_code == status.HTTP_403_FORBIDDEN
\ No newline at end of file
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+class TestAuthenticatedUserCache:
+    """Test resolved users are cached per token and invalidated on change"""
+
+    @staticmethod
+    async def resolve_twice(deactivate: bool):
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        statements = []
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        try:
+            async with async_sessionmaker(bind=engine, expire_on_commit=False)() as db:
+                db.add(User(user_id="u1", name="Staff", email="staff@firm.com", role=UserRole.CA_STAFF,
+                            firm_id="f1", is_active=True, password_hash=get_password_hash("secret")))
+                await db.commit()
+                statements.clear()
+
+                token = create_access_token({"user_id": "u1"})
+                credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+                first = await get_current_user(credentials, db)
+                if deactivate:
+                    user = await db.get(User, "u1")
+                    user.is_active = False
+                    await db.commit()
+                    invalidate_user("u1")
+                    statements.clear()
+                return first, await get_current_user(credentials, db), statements
+        finally:
+            await engine.dispose()
+
+    def test_repeat_requests_skip_user_query(self):
+        """Test only the first request with a token queries the users table"""
+        first, second, statements = asyncio.run(self.resolve_twice(deactivate=False))
+
+        assert second == first and second.firm_id == "f1"
+        assert len(statements) == 1
+
+    def test_invalidation_applies_deactivation(self):
+        """Test a deactivated user is refused once their entries are invalidated"""
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(self.resolve_twice(deactivate=True))
+        assert exc_info.value.status_code == 401
+
+    def test_invalidation_during_read_not_cached(self):
+        """Test a user row read before an invalidation is not cached after it"""
+        async def resolve():
+            engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            try:
+                async with async_sessionmaker(bind=engine, expire_on_commit=False)() as db:
+                    db.add(User(user_id="u1", name="Staff", email="staff@firm.com", role=UserRole.CA_STAFF,
+                                firm_id="f1", is_active=True, password_hash=get_password_hash("secret")))
+                    await db.commit()
+                    # A password change lands while the user row is being read
+                    event.listen(engine.sync_engine, "before_cursor_execute",
+                                 lambda *args: invalidate_user("u1"))
+                    token = create_access_token({"user_id": "u1"})
+                    payload = verify_token(token)
+                    await get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token), db)
+                    return payload["iat"]
+            finally:
+                await engine.dispose()
+
+        issued_at = asyncio.run(resolve())
+        assert user_cache.get("u1", issued_at) is None
+
+        cache = AuthUserCache(ttl_seconds=60, max_entries=10)
+        generation = cache.generation("u1")
+        cache.invalidate_user("u1")
+        cache.set("u1", 1, "stale", generation)
+        assert cache.get("u1", 1) is None
+        cache.set("u1", 1, "fresh", cache.generation("u1"))
+        assert cache.get("u1", 1) == "fresh"
+
+    def test_ttl_and_size_bounds(self):
+        """Test entries expire after the TTL and the oldest are evicted first"""
+        cache = AuthUserCache(ttl_seconds=0.05, max_entries=2)
+        cache.set("u1", 1, "one")
+        cache.set("u2", 1, "two")
+        cache.get("u1", 1)
+        cache.set("u3", 1, "three")
+
+        assert cache.get("u2", 1) is None
+        assert cache.get("u1", 1) == "one"
+        time.sleep(0.06)
+        assert cache.get("u1", 1) is None
+        assert len(cache) == 1
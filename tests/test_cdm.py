@@ -1,8 +1,17 @@
 # tests/test_cdm.py
 import pytest
-from fastapi import status
+from fastapi import HTTPException, Response, status
 import uuid
 from datetime import datetime, date
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.core.pagination import keyset_page, next_cursor, paginate_query
+from app.cdm.models.entity import Entity
+from app.cdm.models.transaction import VoucherHeader
+from app.cdm.routes import VOUCHER_PAGE_KEY
 
 
 class TestEntityCRUD:
@@ -294,4 +303,69 @@ class TestCDMIntegration:
         response = client.post("/api/v1/cdm/entities", json=entity_data, headers=auth_headers_firm_admin)
         assert response.status_code == status.HTTP_201_CREATED
         data = response.json()
-        assert data["firm_id"] == sample_firm.firm_id  # Should auto-assign from user context
\ No newline at end of file
+        assert data["firm_id"] == sample_firm.firm_id  # Should auto-assign from user context
+
+
+class TestKeysetPagination:
+    """Test cursor pagination over a stable (voucher_date, voucher_id) key"""
+
+    @pytest.fixture
+    def voucher_db(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        db.add(Entity(company_id="c1", firm_id="f1", company_name="One",
+                      financial_year_start=date(2024, 4, 1), financial_year_end=date(2025, 3, 31)))
+        # Several vouchers per day so pages split inside a date
+        for i in range(25):
+            db.add(VoucherHeader(voucher_id=f"v{i:02d}", company_id="c1", voucher_type="Payment",
+                                 voucher_date=date(2024, 4, 1 + i // 4), voucher_number=str(i), total_amount=i))
+        db.commit()
+        yield db
+        db.close()
+        engine.dispose()
+
+    @pytest.mark.parametrize("descending", [False, True])
+    def test_pages_cover_every_row_once(self, voucher_db, descending):
+        """Test following X-Next-Cursor visits every voucher once, in key order"""
+        query = voucher_db.query(VoucherHeader).filter(VoucherHeader.company_id == "c1")
+        seen, cursor, pages = [], None, 0
+        while True:
+            response = Response()
+            rows = paginate_query(query, VOUCHER_PAGE_KEY, response, limit=10, cursor=cursor, descending=descending)
+            seen.extend(row.voucher_id for row in rows)
+            pages += 1
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+
+        assert pages == 3
+        expected = [f"v{i:02d}" for i in range(25)]
+        assert seen == (expected[::-1] if descending else expected)
+
+    def test_total_is_optional(self, voucher_db):
+        """Test the count only runs when asked for"""
+        query = voucher_db.query(VoucherHeader)
+        response = Response()
+        paginate_query(query, VOUCHER_PAGE_KEY, response, limit=5)
+        assert "X-Total-Count" not in response.headers
+
+        paginate_query(query, VOUCHER_PAGE_KEY, response, limit=5, include_total=True)
+        assert response.headers["X-Total-Count"] == "25"
+
+    def test_select_statements_and_bad_cursors(self, voucher_db):
+        """Test the same helpers page select() statements and reject tampered cursors"""
+        statement = keyset_page(select(VoucherHeader), VOUCHER_PAGE_KEY, 20)
+        rows, cursor = next_cursor(voucher_db.execute(statement).scalars().all(), VOUCHER_PAGE_KEY, 20)
+        statement = keyset_page(select(VoucherHeader), VOUCHER_PAGE_KEY, 20, cursor)
+        rest, following = next_cursor(voucher_db.execute(statement).scalars().all(), VOUCHER_PAGE_KEY, 20)
+
+        assert len(rows) == 20 and len(rest) == 5 and following is None
+        with pytest.raises(HTTPException) as exc_info:
+            keyset_page(select(VoucherHeader), VOUCHER_PAGE_KEY, 20, "not-a-cursor")
+        assert exc_info.value.status_code == 400
+
+    def test_nullable_key_rejected(self):
+        """Test a nullable key column is refused rather than silently skipping NULL rows"""
+        with pytest.raises(ValueError):
+            keyset_page(select(VoucherHeader), (VoucherHeader.narration, VoucherHeader.voucher_id), 20)
@@ -0,0 +1,123 @@
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.requests import Request
+
+from app.core import database
+from app.core.tenant_access import can_access_company
+from app.tenant.models.user import UserRole
+from app.core.auth import create_access_token
+from app.core.database import Base, RecentWrites, get_read_db, request_tenant_keys
+from app.cdm.models.entity import Entity
+from app.cdm.models.master import Ledger
+
+
+def make_request(headers=None, query=""):
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/cdm/vouchers",
+        "query_string": query.encode(),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "path_params": {},
+    }
+    return Request(scope)
+
+
+class TestReadReplicaRouting:
+    """Test read-your-writes routing between the primary and the replica"""
+
+    @pytest.fixture
+    def primary(self, monkeypatch):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        replica = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        db = sessionmaker(bind=engine)()
+        # Seeded before the replica is switched on, so no write is recent yet
+        db.add(Entity(company_id="c1", firm_id="f1", company_name="One",
+                      financial_year_start=date(2024, 4, 1), financial_year_end=date(2025, 3, 31)))
+        db.commit()
+        monkeypatch.setattr(database, "recent_writes", RecentWrites(window=60))
+        monkeypatch.setattr(database, "read_engine", replica)
+        monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=engine))
+        monkeypatch.setattr(database, "ReadSessionLocal", sessionmaker(bind=replica, info=database.REPLICA_INFO))
+        yield engine, replica, db
+        db.close()
+        engine.dispose()
+        replica.dispose()
+
+    @staticmethod
+    def bound_engine(request):
+        dependency = get_read_db(request)
+        db = next(dependency)
+        bind = db.get_bind()
+        dependency.close()
+        return bind
+
+    def test_reads_go_to_replica_until_tenant_writes(self, primary):
+        """Test a company's reads stick to the primary after its write, other tenants stay on the replica"""
+        engine, replica, db = primary
+        request = make_request({"X-Company-ID": "c1"})
+        assert self.bound_engine(request) is replica
+
+        db.add(Ledger(ledger_id="l1", company_id="c1", ledger_name="Cash"))
+        db.commit()
+
+        assert self.bound_engine(request) is engine
+        assert self.bound_engine(make_request({"X-Company-ID": "c2"})) is replica
+        assert self.bound_engine(make_request(query="company_id=c1")) is engine
+
+    def test_write_seen_by_other_workers(self, primary):
+        """Test a write pins the tenant's reads to the primary in a process that did not serve it"""
+        engine, replica, db = primary
+        request = make_request({"X-Company-ID": "c1"})
+        db.add(Ledger(ledger_id="l1", company_id="c1", ledger_name="Cash"))
+        db.commit()
+
+        database.recent_writes.clear()  # Another worker: nothing in its process-local window
+        assert self.bound_engine(request) is engine
+        assert self.bound_engine(make_request({"X-Company-ID": "c2"})) is replica
+        marks = db.execute(select(database.tenant_write_marks.c.tenant_key)).scalars().all()
+        assert sorted(marks) == ["company_id:c1"]
+
+    def test_access_map_built_from_primary(self, primary):
+        """Test a lagging replica cannot hide a company from the access map"""
+        _, replica, _ = primary
+        Base.metadata.create_all(bind=replica)  # schema but none of the primary's rows yet
+        dependency = get_read_db(make_request({"X-Company-ID": "c1"}))
+        db = next(dependency)
+        assert db.get_bind() is replica
+
+        staff = SimpleNamespace(role=UserRole.CA_STAFF, firm_id="f1", user_id="u1")
+        assert can_access_company(db, staff, "c1")
+        dependency.close()
+
+    def test_core_inserts_are_tracked_and_rollbacks_are_not(self, primary):
+        """Test executemany inserts mark their companies; rolled back writes mark nothing"""
+        _, _, db = primary
+        db.add(Ledger(ledger_id="l2", company_id="c1", ledger_name="Bank"))
+        db.flush()
+        db.rollback()
+        assert not database.recent_writes.any_recent({("company_id", "c1")})
+
+        db.execute(insert(Ledger), [
+            {"ledger_id": "l3", "company_id": "c1", "ledger_name": "Sales"},
+            {"ledger_id": "l4", "company_id": "c1", "ledger_name": "Purchases"},
+        ])
+        db.commit()
+        assert database.recent_writes.any_recent({("company_id", "c1")})
+
+    def test_sticky_window_expires(self):
+        """Test a write stops pinning reads once the window has passed"""
+        writes = RecentWrites(window=0)
+        writes.mark({("firm_id", "f1")})
+        assert not writes.any_recent({("firm_id", "f1")})
+
+    def test_token_firm_is_a_tenant_key(self):
+        """Test the bearer token's firm is used when the request names no company"""
+        token = create_access_token({"user_id": "u1", "firm_id": "f1"})
+        assert request_tenant_keys(make_request({"Authorization": f"Bearer {token}"})) == {("firm_id", "f1")}
@@ -2,6 +2,25 @@
 import pytest
 from fastapi import status
 import uuid
+from datetime import date
+from types import SimpleNamespace
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import tenant_access
+from app.core.database import Base
+from app.core.tenant_access import (
+    can_access_company,
+    get_assigned_companies,
+    get_company_firm,
+    get_user_accessible_companies,
+    get_user_accessible_firms,
+    invalidate_access
+)
+from app.cdm.models.entity import Entity
+from app.tenant.models.firm import CAFirm
+from app.tenant.models.user import UserEntityMap, UserRole
 
 
 class TestFirmCRUD:
@@ -249,4 +268,145 @@ class TestFirmValidation:
         }
         
         response = client.post("/api/v1/tenant/firms", json=firm_data, headers=auth_headers_trenor_admin)
-        assert response.status_code == status.HTTP_400_BAD_REQUEST
\ No newline at end of file
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+class TestAsyncFirmRoutes:
+    """Test the firm router end to end on committed async sessions"""
+
+    def test_soft_delete_and_access_check(self, client, committed_db, seed_user):
+        """Test a Trenor admin deactivates a firm and another firm's admin is refused"""
+        db = committed_db()
+        db.add_all([CAFirm(firm_id="f1", firm_name="One"), CAFirm(firm_id="f2", firm_name="Two")])
+        db.commit()
+        db.close()
+        _, admin_headers = seed_user(UserRole.TRENOR_ADMIN)
+        _, other_headers = seed_user(UserRole.CA_FIRM_ADMIN, firm_id="f2")
+
+        refused = client.delete("/api/v1/tenant/firms/f1", headers=other_headers)
+        assert refused.status_code == status.HTTP_403_FORBIDDEN
+
+        response = client.delete("/api/v1/tenant/firms/f1", headers=admin_headers)
+        assert response.status_code == status.HTTP_200_OK
+        db = committed_db()
+        assert db.get(CAFirm, "f1").is_active is False
+        db.close()
+
+
+class TestTenantAccessMap:
+    """Test the cached firm/company access service"""
+
+    @pytest.fixture
+    def access_db(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        db = sessionmaker(bind=engine)()
+        db.add_all([CAFirm(firm_id="f1", firm_name="One"), CAFirm(firm_id="f2", firm_name="Two")])
+        for company_id, firm_id, active in [("c1", "f1", True), ("c2", "f2", True), ("c3", "f1", False)]:
+            db.add(Entity(company_id=company_id, firm_id=firm_id, company_name=company_id, is_active=active,
+                          financial_year_start=date(2024, 4, 1), financial_year_end=date(2025, 3, 31)))
+        db.commit()
+        statements.clear()
+        yield db, statements
+        db.close()
+        engine.dispose()
+
+    @staticmethod
+    def user(role, firm_id=None):
+        return SimpleNamespace(role=getattr(UserRole, role), firm_id=firm_id, user_id="u1")
+
+    def test_checks_answered_from_one_snapshot(self, access_db):
+        """Test repeated access checks load the map once"""
+        db, statements = access_db
+        staff, admin = self.user("CA_STAFF", "f1"), self.user("TRENOR_ADMIN")
+
+        assert can_access_company(db, staff, "c1")
+        assert not can_access_company(db, staff, "c2")
+        assert not can_access_company(db, staff, "c3", active_only=True)
+        assert can_access_company(db, admin, "c2")
+        assert sorted(get_user_accessible_firms(db, admin)) == ["f1", "f2"]
+        assert get_company_firm(db, "c3") == "f1" and get_company_firm(db, "c3", active_only=True) is None
+        loads = len(statements)
+
+        for _ in range(20):
+            can_access_company(db, staff, "c1")
+        assert len(statements) == loads
+
+    def test_invalidation_picks_up_new_company(self, access_db):
+        """Test a company created after the snapshot is visible once access is invalidated"""
+        db, _ = access_db
+        staff = self.user("CA_STAFF", "f1")
+        assert get_user_accessible_companies(db, staff) == {"c1", "c3"}
+
+        db.add(Entity(company_id="c4", firm_id="f1", company_name="c4",
+                      financial_year_start=date(2024, 4, 1), financial_year_end=date(2025, 3, 31)))
+        db.commit()
+        assert not can_access_company(db, staff, "c4")
+
+        invalidate_access()
+        assert can_access_company(db, staff, "c4")
+
+    def test_firm_invalidation_reloads_only_that_firm(self, access_db):
+        """Test invalidating one firm reloads its rows and keeps the other firms' entries"""
+        db, statements = access_db
+        admin = self.user("TRENOR_ADMIN")
+        db.add(UserEntityMap(user_id="u2", company_id="c2"))
+        db.commit()
+        assert get_user_accessible_companies(db, admin) == {"c1", "c2", "c3"}
+
+        db.add(Entity(company_id="c4", firm_id="f1", company_name="c4",
+                      financial_year_start=date(2024, 4, 1), financial_year_end=date(2025, 3, 31)))
+        db.add(UserEntityMap(user_id="u1", company_id="c4"))
+        db.get(Entity, "c3").is_active = True
+        db.commit()
+        statements.clear()
+
+        invalidate_access("f1")
+        assert get_company_firm(db, "c4") == "f1"
+        assert get_company_firm(db, "c3", active_only=True) == "f1"
+        assert get_company_firm(db, "c2") == "f2"
+        assert get_assigned_companies(db, "u1") == {"c4"}
+        assert get_assigned_companies(db, "u2") == {"c2"}
+        assert len(statements) == 3
+        assert all("WHERE" in statement for statement in statements)
+
+    def test_concurrent_firm_patches_both_kept(self, access_db, monkeypatch):
+        """Test a patch finishing second does not overwrite another firm's patch"""
+        db, _ = access_db
+        admin = self.user("TRENOR_ADMIN")
+        assert get_user_accessible_companies(db, admin) == {"c1", "c2", "c3"}
+        for company_id, firm_id in [("c4", "f1"), ("c5", "f2")]:
+            db.add(Entity(company_id=company_id, firm_id=firm_id, company_name=company_id,
+                          financial_year_start=date(2024, 4, 1), financial_year_end=date(2025, 3, 31)))
+        db.commit()
+
+        patch = tenant_access._patch
+
+        def patch_racing_f2(session, snapshot, firm_ids):
+            if "f1" in firm_ids:
+                # Another request patches and installs f2 while this one is loading f1
+                invalidate_access("f2")
+                assert get_company_firm(session, "c5") == "f2"
+            return patch(session, snapshot, firm_ids)
+
+        monkeypatch.setattr(tenant_access, "_patch", patch_racing_f2)
+        invalidate_access("f1")
+        assert get_company_firm(db, "c4") == "f1"
+        monkeypatch.setattr(tenant_access, "_patch", patch)
+
+        assert get_company_firm(db, "c4") == "f1"
+        assert get_company_firm(db, "c5") == "f2"
+
+    def test_inactive_firms_not_accessible(self, access_db):
+        """Test a deactivated firm drops out of a Trenor admin's firms"""
+        db, _ = access_db
+        admin = self.user("TRENOR_ADMIN")
+        db.get(CAFirm, "f2").is_active = False
+        db.commit()
+
+        assert get_user_accessible_firms(db, admin) == ["f1"]
+        db.get(CAFirm, "f2").is_active = True
+        db.commit()
+        invalidate_access("f2")
+        assert sorted(get_user_accessible_firms(db, admin)) == ["f1", "f2"]
@@ -0,0 +1,739 @@
+import asyncio
+import io
+import os
+import time
+import pytest
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.cdm.models.master import Ledger
+from app.cdm.models.external import BankStatement, GSTSales
+from app.cdm.models.reconciliation import IngestionJob, IngestionQuarantine, StatementTemplate
+from app.ingestion import file_parser
+from app.ingestion import excel_reader
+from app.ingestion.coercion import coerce_amounts, coerce_dates, coerce_frame
+from app.ingestion import schema_detector
+from app.ingestion.schema_detector import detect_schema
+from app.ingestion.file_parser import detect_encoding, iter_file_chunks, spool_upload
+from app.ingestion.loader import map_columns, build_rows, ColumnMappingError
+from app.ingestion.parser_pool import (
+    ParserTimeoutError, run_in_parser_pool, shutdown_parser_pool
+)
+from app.ingestion import parser_pool
+from app.ingestion.file_parser import parse_path, iter_pdf_chunks
+from app.ingestion.service import process_file
+from app.ingestion.templates import delete_template, list_templates
+from app.utils.helpers import compute_checksum
+
+
+CONTEXT = SimpleNamespace(firm_id="f1", company_id="c1", user_id="u1")
+
+
+@pytest.fixture
+def ingest_db():
+    """In-memory database with the full schema and one bank ledger"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    db.add(Ledger(ledger_id="bank-1", company_id="c1", ledger_name="HDFC Current A/c"))
+    db.commit()
+    yield db
+    db.close()
+    engine.dispose()
+
+
+class FakeUpload:
+    """UploadFile stand-in that serves its content in small reads"""
+
+    def __init__(self, filename, content: bytes):
+        self.filename = filename
+        self._buffer = io.BytesIO(content)
+        self.reads = 0
+
+    async def read(self, size=-1):
+        self.reads += 1
+        return self._buffer.read(size)
+
+
+def make_pdf(pages):
+    """
+    Build a minimal text PDF. `pages` is a list of pages; each page is a list
+    of rows, and each row either a string or a list of (x, text) cells.
+    """
+    def escape(text):
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    for rows in pages:
+        ops = []
+        for i, row in enumerate(rows):
+            cells = [(50, row)] if isinstance(row, str) else row
+            y = 800 - 14 * i
+            for x, text in cells:
+                ops.append(f"BT /F1 9 Tf 1 0 0 1 {x} {y} Tm ({escape(text)}) Tj ET")
+        stream = "\n".join(ops)
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_ref} 0 R >>"
+        )
+        page_refs.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {len(page_refs)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def write_csv(tmp_path, text, encoding="utf-8", name="statement.csv"):
+    path = tmp_path / name
+    path.write_bytes(text.encode(encoding))
+    return str(path)
+
+
+class TestStreamingIngestion:
+    """Test spooling, sampled encoding detection and chunked parsing"""
+
+    def test_spool_upload_copies_in_blocks(self):
+        """Test the upload is copied to disk without a single full read"""
+        content = b"date,amount\n" + b"2024-04-01,100.00\n" * 200
+        upload = FakeUpload("statement.csv", content)
+
+        path, file_hash = asyncio.run(spool_upload(upload, block_size=256))
+        try:
+            assert path.endswith(".csv")
+            assert file_hash == compute_checksum(content)
+            with open(path, "rb") as f:
+                assert f.read() == content
+            assert upload.reads > 2
+        finally:
+            os.remove(path)
+
+    def test_detect_encoding_from_sample(self, tmp_path):
+        """Test encoding is detected and ASCII samples widen to UTF-8"""
+        ascii_path = write_csv(tmp_path, "date,amount\n2024-04-01,100\n", name="ascii.csv")
+        assert detect_encoding(ascii_path) == "utf-8"
+
+        narration = "Paiement reçu de société générale à Paris, référence numéro "
+        latin_path = write_csv(
+            tmp_path, "narration,amount\n" + f"{narration},100\n" * 50, encoding="latin-1", name="latin.csv"
+        )
+        assert detect_encoding(latin_path, sample_size=4096).lower() in {"iso-8859-1", "windows-1252"}
+
+    def test_csv_parsed_in_chunks(self, tmp_path):
+        """Test CSV rows come back in bounded batches with blank rows dropped"""
+        rows = "".join(f"2024-04-{(i % 28) + 1:02d},{i}.00\n" for i in range(25))
+        path = write_csv(tmp_path, "date,amount\n" + rows + ",\n")
+
+        chunks = list(iter_file_chunks(path, "statement.csv", chunksize=10))
+        assert [len(c) for c in chunks] == [10, 10, 5]
+        assert list(chunks[0].columns) == ["date", "amount"]
+
+    def test_process_file_streams_and_cleans_up(self, ingest_db, monkeypatch):
+        """Test the pipeline counts rows across chunks and removes the spool file"""
+        monkeypatch.setattr(file_parser.settings, "INGEST_CHUNK_ROWS", 7)
+        content = ("Txn Date,Amount,Dr/Cr\n" + "".join(
+            f"{(i % 28) + 1:02d}/04/2024,{100 + i}.00,Dr\n" for i in range(30)
+        )).encode()
+        spooled = []
+        original_spool = file_parser.spool_upload
+
+        async def recording_spool(upload, block_size=None):
+            path, file_hash = await original_spool(upload, block_size)
+            spooled.append(path)
+            return path, file_hash
+
+        monkeypatch.setattr("app.ingestion.service.spool_upload", recording_spool)
+        result = asyncio.run(process_file(
+            FakeUpload("statement.csv", content), ingest_db, CONTEXT, bank_id="bank-1"
+        ))
+
+        assert result["records_ingested"] == 30
+        assert result["schema"]["Txn Date"] == "datetime"
+        assert not os.path.exists(spooled[0])
+
+
+class TestBulkLoading:
+    """Test column mapping, vectorized hashing and deduplicating bulk inserts"""
+
+    def test_bank_hash_matches_model_generate_hash(self):
+        """Test column-wise hashes agree with BankStatement.generate_hash()"""
+        chunk = pd.DataFrame({
+            "Date": ["01/04/2024", "02/04/2024"],
+            "Narration": ["NEFT-ACME", None],
+            "Withdrawal Amt.": ["1,500.50", ""],
+            "Deposit Amt.": ["", "200"],
+        })
+        mapping = map_columns(list(chunk.columns), "bank_statements")
+        rows, rejected = build_rows("bank_statements", chunk, mapping, "c1", "bank-1")
+
+        assert rejected.empty
+        assert list(rows["dr_cr"]) == ["Dr", "Cr"]
+        expected = [
+            BankStatement(bank_id="bank-1", txn_date=date(2024, 4, 1), amount=Decimal("1500.50"),
+                          dr_cr="Dr", narration="NEFT-ACME").generate_hash(),
+            BankStatement(bank_id="bank-1", txn_date=date(2024, 4, 2), amount=Decimal("200.00"),
+                          dr_cr="Cr", narration=None).generate_hash(),
+        ]
+        assert list(rows["txn_hash"]) == expected
+
+    def test_missing_required_columns_rejected(self):
+        """Test a file without a usable date column is refused up front"""
+        with pytest.raises(ColumnMappingError):
+            map_columns(["Narration", "Amount"], "bank_statements")
+
+    def test_reupload_skips_duplicates(self, ingest_db):
+        """Test rows are persisted once and a re-upload only counts duplicates"""
+        content = (
+            b"Date,Narration,Chq./Ref.No.,Withdrawal Amt.,Deposit Amt.,Closing Balance\n"
+            b"01/04/2024,UPI-SWIGGY,,450.00,,9550.00\n"
+            b"02/04/2024,NEFT-ACME CORP,N123,,12000.00,21550.00\n"
+            b"not a date,junk,,1.00,,\n"
+        )
+
+        # A trailing blank line makes the file differ byte-wise but not row-wise
+        first = asyncio.run(process_file(FakeUpload("stmt.csv", content), ingest_db, CONTEXT, bank_id="bank-1"))
+        second = asyncio.run(process_file(
+            FakeUpload("stmt.csv", content + b"\n"), ingest_db, CONTEXT, bank_id="bank-1"
+        ))
+
+        assert (first["records_ingested"], first["records_failed"]) == (2, 1)
+        assert (second["records_ingested"], second["duplicates_skipped"]) == (0, 2)
+        assert ingest_db.query(BankStatement).count() == 2
+        stored = ingest_db.query(BankStatement).filter_by(cheque_ref="N123").one()
+        assert (stored.amount, stored.dr_cr, stored.company_id) == (Decimal("12000.00"), "Cr", "c1")
+
+        job = ingest_db.query(IngestionJob).filter_by(job_id=second["job_id"]).one()
+        assert job.status == "Completed"
+        assert job.error_details["duplicates_skipped"] == 2
+
+    def test_identical_file_short_circuits(self, ingest_db, monkeypatch):
+        """Test a byte-identical re-upload returns the earlier result without parsing"""
+        content = b"Date,Narration,Amount,Dr/Cr\n01/04/2024,CHQ DEP,500.00,Cr\n"
+        first = asyncio.run(process_file(FakeUpload("a.csv", content), ingest_db, CONTEXT, bank_id="bank-1"))
+
+        def fail_parse(*args, **kwargs):
+            raise AssertionError("file was parsed again")
+        monkeypatch.setattr("app.ingestion.service.iter_file_chunks", fail_parse)
+        again = asyncio.run(process_file(FakeUpload("renamed.csv", content), ingest_db, CONTEXT, bank_id="bank-1"))
+
+        assert again["duplicate_upload"] is True
+        assert again["original_job_id"] == first["job_id"]
+        assert again["records_ingested"] == first["records_ingested"] == 1
+        assert ingest_db.query(IngestionJob).count() == 1
+
+    def test_identical_file_for_another_bank_is_ingested(self, ingest_db):
+        """Test the same statement loaded against a second bank ledger is not a duplicate"""
+        ingest_db.add(Ledger(ledger_id="bank-2", company_id="c1", ledger_name="ICICI Current A/c"))
+        ingest_db.commit()
+        content = b"Date,Narration,Amount,Dr/Cr\n01/04/2024,CHQ DEP,500.00,Cr\n"
+        first = asyncio.run(process_file(FakeUpload("a.csv", content), ingest_db, CONTEXT, bank_id="bank-1"))
+        second = asyncio.run(process_file(FakeUpload("a.csv", content), ingest_db, CONTEXT, bank_id="bank-2"))
+
+        assert "duplicate_upload" not in second
+        assert first["records_ingested"] == second["records_ingested"] == 1
+        assert {row.bank_id for row in ingest_db.query(BankStatement)} == {"bank-1", "bank-2"}
+        assert {job.bank_id for job in ingest_db.query(IngestionJob)} == {"bank-1", "bank-2"}
+
+    def test_spool_removed_when_duplicate_lookup_fails(self, ingest_db, monkeypatch):
+        """Test the spooled upload is deleted if the lookup raises before a job exists"""
+        spooled = []
+        original_spool = file_parser.spool_upload
+
+        async def recording_spool(upload, block_size=None):
+            path, file_hash = await original_spool(upload, block_size)
+            spooled.append(path)
+            return path, file_hash
+
+        def failing_lookup(*args, **kwargs):
+            raise RuntimeError("database unavailable")
+
+        monkeypatch.setattr("app.ingestion.service.spool_upload", recording_spool)
+        monkeypatch.setattr("app.ingestion.service.find_completed_job", failing_lookup)
+        with pytest.raises(RuntimeError):
+            asyncio.run(process_file(
+                FakeUpload("a.csv", b"Date,Amount\n01/04/2024,1.00\n"), ingest_db, CONTEXT, bank_id="bank-1"
+            ))
+
+        assert not os.path.exists(spooled[0])
+        assert ingest_db.query(IngestionJob).count() == 0
+
+    def test_gst_sales_loaded(self, ingest_db):
+        """Test GST sales rows are mapped and stored with invoice hashes"""
+        content = (
+            b"GSTIN of Recipient,Invoice Number,Invoice Date,Taxable Value,Invoice Value\n"
+            b"27aapfu0939f1zv,INV-001,05/04/2024,\"1,000.00\",\"1,180.00\"\n"
+        )
+
+        result = asyncio.run(process_file(FakeUpload("gstr1.csv", content), ingest_db, CONTEXT, target="gst_sales"))
+
+        assert result["records_ingested"] == 1
+        invoice = ingest_db.query(GSTSales).one()
+        assert invoice.gstin_customer == "27AAPFU0939F1ZV"
+        assert invoice.tax_amount == Decimal("180.00")
+        assert invoice.invoice_hash == invoice.generate_hash()
+
+    def test_bank_target_requires_company_ledger(self, ingest_db):
+        """Test bank statements cannot be loaded against another company's ledger"""
+        with pytest.raises(ValueError):
+            asyncio.run(process_file(FakeUpload("stmt.csv", b"Date,Amount\n"), ingest_db, CONTEXT, bank_id="other"))
+
+
+class TestTypedCoercion:
+    """Test vectorized date/amount coercion and per-column error counts"""
+
+    def test_indian_date_formats(self):
+        """Test day-first dates in mixed layouts parse, unparseable values are counted"""
+        values = pd.Series(["01/04/2024", "13/04/2024", "05-Apr-24", "", None, "sometime"])
+        parsed, errors = coerce_dates(values)
+
+        assert list(parsed.dt.date[:3]) == [date(2024, 4, 1), date(2024, 4, 13), date(2024, 4, 5)]
+        assert parsed[3:].isna().all()
+        assert errors == 1
+
+    def test_remembered_format_rechecked_per_value(self):
+        """Test a format remembered for a value shape is re-inferred when it stops parsing"""
+        known = {"99/99/9999": "%m/%d/%Y"}  # e.g. left by a month-first column
+        parsed, errors = coerce_dates(pd.Series(["13/04/2024", "14/04/2024"]), known)
+
+        assert list(parsed.dt.date) == [date(2024, 4, 13), date(2024, 4, 14)]
+        assert errors == 0
+        assert known == {"99/99/9999": "%d/%m/%Y"}
+
+    def test_date_formats_kept_per_column(self):
+        """Test coerce_frame remembers formats per column across chunks, not globally"""
+        formats = {}
+        chunk = pd.DataFrame({"Txn Date": ["01/04/2024"], "Value Date": ["2024-04-02"]})
+        coerce_frame(chunk, {"Txn Date": "datetime", "Value Date": "datetime"}, date_formats=formats)
+
+        assert formats == {"Txn Date": {"99/99/9999": "%d/%m/%Y"}, "Value Date": {"9999-99-99": "%Y-%m-%d"}}
+
+    def test_indian_amounts_and_dr_cr_suffixes(self):
+        """Test lakh grouping, currency prefixes, brackets and Dr/Cr suffixes"""
+        values = pd.Series(["1,23,456.00", "750.00 Dr", "500.00Cr", "(200.00)", "Rs. 1,000", "-", "n/a", "abc"])
+        parsed, errors = coerce_amounts(values)
+
+        assert list(parsed[:5]) == [123456.0, -750.0, 500.0, -200.0, 1000.0]
+        assert parsed[5:].isna().all()
+        assert errors == 1
+
+    def test_frame_coerced_by_schema_labels(self):
+        """Test schema labels drive dtypes and a mislabelled column is left intact"""
+        chunk = pd.DataFrame({
+            "Txn Date": ["01/04/2024", "02/04/2024", "31/04/2024"],
+            "Amount": ["1,000.00", "250.50", "75"],
+            "Type": ["Dr", "Cr", "Dr"],
+            "Particulars": ["UPI/ACME", "NEFT/XYZ", "ATM WDL"],
+        })
+        schema = {"Txn Date": "datetime", "Amount": "float", "Type": "category", "Particulars": "float"}
+        typed, errors = coerce_frame(chunk, schema)
+
+        assert str(typed["Txn Date"].dtype).startswith("datetime64")
+        assert list(typed["Amount"]) == [1000.0, 250.5, 75.0]
+        assert isinstance(typed["Type"].dtype, pd.CategoricalDtype)
+        assert list(typed["Particulars"]) == ["UPI/ACME", "NEFT/XYZ", "ATM WDL"]
+        assert errors == {"Txn Date": 1, "Particulars": 3}
+
+    def test_coercion_errors_reported_and_raw_row_kept(self, ingest_db):
+        """Test the ingestion result carries error counts and raw_json keeps the file's text"""
+        content = b"Txn Date,Amount,Dr/Cr\n01/04/2024,\"1,500.00\",Dr\nnot a date,20.00,Cr\n"
+        result = asyncio.run(process_file(FakeUpload("stmt.csv", content), ingest_db, CONTEXT, bank_id="bank-1"))
+
+        assert result["records_ingested"] == 1
+        assert result["records_failed"] == 1
+        assert result["coercion_errors"] == {"Txn Date": 1}
+        row = ingest_db.query(BankStatement).one()
+        assert row.raw_json["Txn Date"] == "01/04/2024"
+        assert row.raw_json["Amount"] == "1,500.00"
+
+
+class TestSchemaDetection:
+    """Test content-sampled column typing and the per-layout schema cache"""
+
+    @pytest.fixture(autouse=True)
+    def empty_cache(self):
+        schema_detector.clear_schema_cache()
+        yield
+        schema_detector.clear_schema_cache()
+
+    def test_types_scored_from_values(self):
+        """Test values decide the type where headers mislead or are missing"""
+        chunk = pd.DataFrame({
+            "Value Dt": ["01/04/24", "02/04/24", "03/04/24"],
+            "Particulars": ["UPI/ACME/123", "NEFT-XYZ LTD", "ATM WDL"],
+            "Chq./Ref.No.": ["000123", "000124", "000125"],
+            "Withdrawal Amt.": ["1,00,000.00", "", "250.00"],
+            "Closing Balance": ["9,000.00 Cr", "8,750.00 Cr", "1,250.00 Dr"],
+            "Unnamed: 5": ["12.5", "3", "(4.00)"],
+            "Dr/Cr": ["Dr", "Cr", "Dr"],
+        })
+        assert detect_schema(chunk) == {
+            "Value Dt": "datetime",
+            "Particulars": "string",
+            "Chq./Ref.No.": "string",
+            "Withdrawal Amt.": "float",
+            "Closing Balance": "float",
+            "Unnamed: 5": "float",
+            "Dr/Cr": "category",
+        }
+
+    def test_schema_cached_per_company_and_header(self, monkeypatch):
+        """Test a repeat layout skips detection, other companies and headers do not"""
+        chunk = pd.DataFrame({"Date": ["01/04/2024"], "Amount": ["10.00"]})
+        first = detect_schema(chunk, company_id="c1")
+
+        calls = []
+        original = schema_detector.classify_column
+        monkeypatch.setattr(
+            schema_detector, "classify_column", lambda *args: calls.append(args[0]) or original(*args)
+        )
+        assert detect_schema(chunk, company_id="c1") == first
+        assert detect_schema(chunk.rename(columns={"Date": " DATE"}), company_id="c1") == {
+            " DATE": "datetime", "Amount": "float"
+        }
+        assert calls == []
+        detect_schema(chunk, company_id="c2")
+        assert calls == ["Date", "Amount"]
+
+
+class TestStatementTemplates:
+    """Test bank layouts are learned once and reused for later files"""
+
+    HEADER = "Date,Narration,Chq./Ref.No.,Withdrawal Amt.,Deposit Amt.,Closing Balance\n"
+
+    def test_layout_learned_then_reused(self, ingest_db, monkeypatch):
+        """Test a second file with the same header skips detection and mapping"""
+        first = asyncio.run(process_file(FakeUpload("apr.csv", (
+            self.HEADER + "01/04/2024,NEFT-ACME,000123,\"1,500.00\",,\"8,500.00\"\n"
+        ).encode()), ingest_db, CONTEXT, bank_id="bank-1"))
+
+        assert first["template_reused"] is False
+        template = ingest_db.query(StatementTemplate).one()
+        assert first["template_id"] == template.template_id
+        assert template.column_mapping["debit"] == 3
+
+        def fail(*args, **kwargs):
+            raise AssertionError("layout was detected again")
+        monkeypatch.setattr("app.ingestion.service.detect_schema", fail)
+        monkeypatch.setattr("app.ingestion.service.map_columns", fail)
+
+        second = asyncio.run(process_file(FakeUpload("may.csv", (
+            self.HEADER.upper() + "02/05/2024,UPI-XYZ,000124,,200.00,\"8,700.00\"\n"
+        ).encode()), ingest_db, CONTEXT, bank_id="bank-1"))
+
+        assert second["template_reused"] is True
+        assert second["template_id"] == template.template_id
+        assert second["records_ingested"] == 1
+        assert second["column_mapping"]["narration"] == "NARRATION"
+        ingest_db.refresh(template)
+        assert template.use_count == 1
+        deposit = ingest_db.query(BankStatement).filter(BankStatement.dr_cr == "Cr").one()
+        assert deposit.amount == Decimal("200.00")
+
+    def test_templates_kept_per_firm_and_deletable(self, ingest_db):
+        """Test another firm's upload learns its own template and a deleted one is relearned"""
+        def upload(day, context):
+            return asyncio.run(process_file(FakeUpload(f"{day}.csv", (
+                self.HEADER + f"{day:02d}/04/2024,NEFT-ACME,000123,\"1,500.00\",,\"8,500.00\"\n"
+            ).encode()), ingest_db, context, bank_id="bank-1"))
+
+        ours = upload(1, CONTEXT)
+        theirs = upload(2, SimpleNamespace(firm_id="f2", company_id="c1", user_id="u2"))
+        assert theirs["template_reused"] is False
+        assert theirs["template_id"] != ours["template_id"]
+        assert [t.template_id for t in list_templates(ingest_db, "f1")] == [ours["template_id"]]
+
+        assert not delete_template(ingest_db, "f2", ours["template_id"])
+        assert delete_template(ingest_db, "f1", ours["template_id"])
+        assert list_templates(ingest_db, "f1") == []
+        relearned = upload(3, CONTEXT)
+        assert relearned["template_reused"] is False and relearned["template_id"] is not None
+
+    def test_failed_layout_not_learned(self, ingest_db):
+        """Test a file with no loadable rows does not register its layout"""
+        asyncio.run(process_file(FakeUpload("bad.csv", (
+            self.HEADER + "not a date,NEFT-ACME,000123,abc,,\n"
+        ).encode()), ingest_db, CONTEXT, bank_id="bank-1"))
+
+        assert ingest_db.query(StatementTemplate).count() == 0
+
+
+class TestQuarantine:
+    """Test malformed lines and invalid rows are kept against the job"""
+
+    def test_bad_lines_reported_with_text(self, tmp_path):
+        """Test skipped CSV lines come back with line number, text and reason"""
+        path = write_csv(tmp_path, "a,b,c\n1,2,3\n4,5,6,7\n8,9,10\n11,12,13\n14,15,16,17,18\n19,20,21\n")
+
+        chunks = list(iter_file_chunks(path, "statement.csv", chunksize=2))
+        bad = [line for chunk in chunks for line in chunk.attrs.get("bad_lines", [])]
+        assert sum(len(c) for c in chunks) == 4
+        assert bad == [
+            (3, "4,5,6,7", "expected 3 fields, saw 4"),
+            (6, "14,15,16,17,18", "expected 3 fields, saw 5"),
+        ]
+
+    def test_bad_rows_quarantined_good_rows_loaded(self, ingest_db):
+        """Test a file with a few bad rows still loads the rest and keeps the bad ones"""
+        content = (
+            b"Txn Date,Narration,Amount,Dr/Cr\n"
+            b"01/04/2024,NEFT-ACME,500.00,Cr\n"
+            b"02/04/2024,UPI,XYZ,20.00,Dr\n"
+            b"??,CASH DEP,300.00,Cr\n"
+            b"03/04/2024,ATM WDL,100.00,Dr\n"
+        )
+        result = asyncio.run(process_file(FakeUpload("stmt.csv", content), ingest_db, CONTEXT, bank_id="bank-1"))
+
+        assert result["records_ingested"] == 2
+        assert result["records_failed"] == 1
+        assert result["records_quarantined"] == 2
+        rows = ingest_db.query(IngestionQuarantine).order_by(IngestionQuarantine.kind).all()
+        assert [(r.kind, r.line_number, r.row_number, r.raw_text) for r in rows] == [
+            ("invalid_row", None, 2, "??,CASH DEP,300.0,Cr"),
+            ("malformed_line", 3, None, "02/04/2024,UPI,XYZ,20.00,Dr"),
+        ]
+        assert rows[0].reason == "missing or unparseable txn_date"
+        job = ingest_db.get(IngestionJob, result["job_id"])
+        assert job.error_details["quarantine"]["by_kind"] == {"malformed_line": 1, "invalid_row": 1}
+
+    def test_stored_rows_capped_per_job(self, ingest_db, monkeypatch):
+        """Test rows past the cap are counted but not stored"""
+        monkeypatch.setattr("app.ingestion.quarantine.settings.INGEST_QUARANTINE_MAX_ROWS", 3)
+        content = b"Txn Date,Amount,Dr/Cr\n" + b"bad,1.00,Cr\n" * 5 + b"01/04/2024,2.00,Cr\n"
+        result = asyncio.run(process_file(FakeUpload("stmt.csv", content), ingest_db, CONTEXT, bank_id="bank-1"))
+
+        assert result["records_quarantined"] == 5
+        assert ingest_db.query(IngestionQuarantine).count() == 3
+
+
+class TestExcelStreaming:
+    """Test workbooks are streamed in chunks from the table's header row"""
+
+    SHEETS = [
+        [("Summary",), ("Total", 1200.0)],
+        [
+            ("HDFC BANK LTD", None, None, None),
+            ("Account No: 50100012345678", None, None, None),
+            (None, None, None, None),
+            ("Date", "Narration", None, "Withdrawal Amt.", "Deposit Amt."),
+            (date(2024, 4, 1), "NEFT-ACME", None, 1500.5, None),
+            (None, None, None, None, None),
+            (date(2024, 4, 2), "UPI-XYZ", "x", None, 200.0),
+            (date(2024, 4, 3), "ATM WDL", None, 100.0, None),
+        ],
+        [("Date", "Narration", None, "Withdrawal Amt.", "Deposit Amt."), (date(2024, 5, 1), "CHQ DEP", None, None, 50.0)],
+        [("Voucher", "Party", "Amount"), ("V1", "ACME", 10.0)],
+    ]
+
+    def test_header_found_and_matching_sheets_chunked(self, monkeypatch):
+        """Test preamble rows, unnamed columns and unrelated sheets are skipped"""
+        monkeypatch.setattr(excel_reader, "excel_engine", lambda ext: "openpyxl")
+        monkeypatch.setattr(excel_reader, "_iter_sheets", lambda path, engine: (iter(s) for s in self.SHEETS))
+
+        chunks = list(excel_reader.iter_excel_chunks("book.xlsx", "xlsx", chunksize=2))
+
+        assert [len(c) for c in chunks] == [2, 1, 1]
+        assert list(chunks[0].columns) == ["Date", "Narration", "Withdrawal Amt.", "Deposit Amt."]
+        assert [list(c.index) for c in chunks] == [[0, 1], [2], [3]]
+        assert list(pd.concat(chunks)["Narration"]) == ["NEFT-ACME", "UPI-XYZ", "ATM WDL", "CHQ DEP"]
+
+    def test_xlsx_ingested_through_streaming_reader(self, ingest_db, monkeypatch, tmp_path):
+        """Test an .xlsx upload is read in read-only mode and loaded like a CSV"""
+        openpyxl = pytest.importorskip("openpyxl")
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet("Statement")
+        for row in self.SHEETS[1]:
+            sheet.append(row)
+        path = tmp_path / "statement.xlsx"
+        workbook.save(path)
+
+        monkeypatch.setattr(
+            "app.ingestion.service.run_in_parser_pool",
+            lambda *args, **kwargs: pytest.fail("workbook was parsed whole")
+        )
+        result = asyncio.run(process_file(
+            FakeUpload("statement.xlsx", path.read_bytes()), ingest_db, CONTEXT, bank_id="bank-1"
+        ))
+
+        assert result["records_ingested"] == 3
+        assert ingest_db.query(BankStatement).filter(BankStatement.dr_cr == "Dr").count() == 2
+
+
+    def test_real_xlsx_streamed_by_iter_file_chunks(self, tmp_path):
+        """Test a real workbook goes to the Excel reader in the parser pool, not read_csv"""
+        openpyxl = pytest.importorskip("openpyxl")
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet("Statement")
+        for row in self.SHEETS[1]:
+            sheet.append(row)
+        path = tmp_path / "statement.xlsx"
+        workbook.save(path)
+
+        try:
+            chunks = list(iter_file_chunks(str(path), "statement.xlsx", chunksize=2))
+        finally:
+            shutdown_parser_pool(kill=True)
+
+        assert [len(c) for c in chunks] == [2, 1]
+        assert list(chunks[0].columns) == ["Date", "Narration", "Withdrawal Amt.", "Deposit Amt."]
+        assert list(pd.concat(chunks)["Narration"]) == ["NEFT-ACME", "UPI-XYZ", "ATM WDL"]
+
+
+class TestParserPool:
+    """Test the process pool that keeps blocking parsers off the event loop"""
+
+    @pytest.fixture(autouse=True)
+    def fresh_pool(self):
+        shutdown_parser_pool(kill=True)
+        yield
+        shutdown_parser_pool(kill=True)
+
+    def test_parse_runs_in_worker_process(self, tmp_path):
+        """Test a file parses in the pool and the DataFrame comes back"""
+        path = write_csv(tmp_path, "date,amount\n2024-04-01,100\n2024-04-02,200\n")
+
+        df = asyncio.run(run_in_parser_pool(parse_path, path, "statement.csv", timeout=60))
+        assert list(df["amount"]) == [100, 200]
+
+    def test_timeout_kills_worker_and_pool_recovers(self):
+        """Test a hung parse times out and later calls get a fresh pool"""
+        with pytest.raises(ParserTimeoutError):
+            asyncio.run(run_in_parser_pool(time.sleep, 30, timeout=1))
+
+        assert asyncio.run(run_in_parser_pool(abs, -3, timeout=60)) == 3
+
+    def test_timeout_does_not_fail_other_parses(self):
+        """Test a parse in flight when another call's timeout kills the pool is run again, not failed"""
+        async def both():
+            return await asyncio.gather(
+                run_in_parser_pool(time.sleep, 30, timeout=1),
+                run_in_parser_pool(time.sleep, 3, timeout=60),
+                return_exceptions=True
+            )
+
+        hung, innocent = asyncio.run(both())
+        assert isinstance(hung, ParserTimeoutError)
+        assert innocent is None
+
+    def test_memory_cap_enforced(self, monkeypatch):
+        """Test a worker cannot allocate past the configured cap"""
+        monkeypatch.setattr(parser_pool.settings, "INGEST_PARSER_MEMORY_MB", 512)
+        with pytest.raises(MemoryError):
+            asyncio.run(run_in_parser_pool(bytearray, 1024 * 1024 * 1024, timeout=60))
+
+    def test_pdf_pages_extracted_in_parallel_in_order(self, tmp_path):
+        """Test page ranges fan out to workers and come back in page order"""
+        path = tmp_path / "statement.pdf"
+        path.write_bytes(make_pdf([[f"Page {p} line {i}" for i in range(3)] for p in range(7)]))
+
+        chunks = list(iter_pdf_chunks(str(path), pages_per_task=2, timeout=60))
+
+        assert len(chunks) == 4
+        lines = [line for chunk in chunks for line in chunk["text"]]
+        assert lines == [f"Page {p} line {i}" for p in range(7) for i in range(3)]
+        assert list(pd.concat(chunks).index) == list(range(21))
+
+
+HEADER = [(40, "Date"), (100, "Narration"), (300, "Chq./Ref.No."), (360, "Value Dt"),
+          (410, "Withdrawal Amt."), (480, "Deposit Amt."), (540, "Closing Balance")]
+
+
+def statement_pages():
+    """Two-page HDFC-style statement: wrapped narration, page header, footer"""
+    page_one = [
+        "HDFC BANK LTD - Statement of account",
+        HEADER,
+        [(40, "01/04/24"), (100, "UPI-SWIGGY-BLR"), (300, "0000412345"), (360, "01/04/24"),
+         (410, "450.00"), (540, "9,550.00")],
+        [(100, "FOOD ORDER")],
+        [(40, "02/04/24"), (100, "NEFT CR-ACME CORP"), (300, "N092345"), (360, "02/04/24"),
+         (480, "1,20,000.00"), (540, "1,29,550.00")],
+    ]
+    page_two = [
+        "Page 2 of 2",
+        [(40, "05/04/24"), (100, "ATW-CASH"), (360, "05/04/24"), (410, "2,000.00"), (540, "1,27,550.00")],
+        [(40, "STATEMENT SUMMARY"), (540, "1,27,550.00")],
+        [(100, "Generated on 06/04/24")],
+    ]
+    return page_one, page_two
+
+
+def statement_pdf():
+    return make_pdf(list(statement_pages()))
+
+
+class TestPdfTableExtraction:
+    """Test layout-aware extraction of bank statement tables from PDFs"""
+
+    @pytest.fixture(autouse=True)
+    def fresh_pool(self):
+        shutdown_parser_pool(kill=True)
+        yield
+        shutdown_parser_pool(kill=True)
+
+    def test_transactions_extracted_as_typed_rows(self, tmp_path):
+        """Test one typed row per transaction across pages, narration unwrapped"""
+        path = tmp_path / "statement.pdf"
+        path.write_bytes(statement_pdf())
+
+        frame = pd.concat(list(iter_pdf_chunks(str(path), pages_per_task=1, timeout=60)))
+
+        assert list(frame["Txn Date"]) == [date(2024, 4, 1), date(2024, 4, 2), date(2024, 4, 5)]
+        assert list(frame["Narration"]) == ["UPI-SWIGGY-BLR FOOD ORDER", "NEFT CR-ACME CORP", "ATW-CASH"]
+        assert list(frame["Debit"].fillna(0)) == [450.0, 0, 2000.0]
+        assert list(frame["Credit"].fillna(0)) == [0, 120000.0, 0]
+        assert list(frame["Balance"]) == [9550.0, 129550.0, 127550.0]
+        assert frame["Ref No"].iloc[1] == "N092345"
+
+    def test_row_index_continues_across_chunks(self, tmp_path):
+        """Test typed rows from several page ranges are numbered once per file, for quarantine row numbers"""
+        path = tmp_path / "statement.pdf"
+        path.write_bytes(statement_pdf())
+
+        chunks = list(iter_pdf_chunks(str(path), pages_per_task=1, timeout=60))
+
+        assert len(chunks) > 1
+        assert list(pd.concat(chunks).index) == [0, 1, 2]
+
+    def test_table_found_after_cover_page(self, tmp_path):
+        """Test a header on a later page range still switches the whole file to typed rows"""
+        cover = ["HDFC BANK LTD", "Dear Customer, your statement for April 2024 follows."]
+        path = tmp_path / "statement.pdf"
+        path.write_bytes(make_pdf([cover, cover] + list(statement_pages())))
+
+        chunks = list(iter_pdf_chunks(str(path), pages_per_task=1, timeout=60, sample_ranges=3))
+
+        assert all("text" not in chunk.columns for chunk in chunks)
+        assert list(pd.concat(chunks)["Narration"]) == ["UPI-SWIGGY-BLR FOOD ORDER", "NEFT CR-ACME CORP", "ATW-CASH"]
+
+    def test_pdf_statement_ingested_into_bank_statements(self, ingest_db):
+        """Test a PDF statement lands in BankStatement without any text post-processing"""
+        result = asyncio.run(process_file(
+            FakeUpload("statement.pdf", statement_pdf()), ingest_db, CONTEXT, bank_id="bank-1"
+        ))
+
+        assert result["records_ingested"] == 3
+        stored = {s.narration: (s.amount, s.dr_cr) for s in ingest_db.query(BankStatement)}
+        assert stored["NEFT CR-ACME CORP"] == (Decimal("120000.00"), "Cr")
+        assert stored["ATW-CASH"] == (Decimal("2000.00"), "Dr")
@@ -0,0 +1,73 @@
+import json
+import os
+import time
+
+from app.core import logger
+from app.core.logger import JsonlLogWriter, _entry
+
+
+def read_entries(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+class TestErrorLogWriter:
+    """Test the queue-backed, batching, rotating error log"""
+
+    def test_entries_written_with_structured_fields(self, tmp_path, monkeypatch):
+        """Test log_error returns immediately and the writer persists tenant/job fields"""
+        writer = JsonlLogWriter(str(tmp_path / "error_log.jsonl"), flush_interval=0.05)
+        monkeypatch.setattr(logger, "_writer", writer)
+
+        logger.log_error("IngestionPipeline", "ValueError", "bad file", sample_row="a.csv",
+                         company_id="c1", job_id="job-1", rows=3)
+        logger.log_error("ReconciliationJob", "TimeoutError", "slow")
+        writer.stop()
+
+        first, second = read_entries(tmp_path / "error_log.jsonl")
+        assert first["company_id"] == "c1" and first["job_id"] == "job-1" and first["rows"] == 3
+        assert first["sample_row"] == "a.csv"
+        assert "company_id" not in second
+
+    def test_size_rotation_keeps_backups(self, tmp_path):
+        """Test the file rolls over past max_bytes and old backups are discarded"""
+        path = str(tmp_path / "error_log.jsonl")
+        writer = JsonlLogWriter(path, max_bytes=400, backup_count=2, batch_size=1, flush_interval=0.05)
+        for i in range(20):
+            writer.write(_entry("Test", "Error", f"message {i}"))
+        writer.stop()
+
+        assert sorted(os.listdir(tmp_path)) == ["error_log.jsonl", "error_log.jsonl.1", "error_log.jsonl.2"]
+        assert all(os.path.getsize(tmp_path / name) <= 400 for name in os.listdir(tmp_path))
+        assert read_entries(path)[-1]["message"] == "message 19"
+
+    def test_time_rotation(self, tmp_path):
+        """Test a file older than rotate_seconds is rolled over on the next batch"""
+        path = str(tmp_path / "error_log.jsonl")
+        writer = JsonlLogWriter(path, max_bytes=0, rotate_seconds=0.1, flush_interval=0.02)
+        writer.write(_entry("Test", "Error", "old"))
+        time.sleep(0.3)
+        writer.write(_entry("Test", "Error", "new"))
+        writer.stop()
+
+        assert [e["message"] for e in read_entries(path)] == ["new"]
+        assert [e["message"] for e in read_entries(path + ".1")] == ["old"]
+
+    def test_full_queue_drops_without_blocking(self, tmp_path):
+        """Test a storm beyond the queue size is dropped, counted and reported"""
+        path = str(tmp_path / "error_log.jsonl")
+        writer = JsonlLogWriter(path, queue_size=5, flush_interval=0.05)
+        writer._ensure_started = lambda: None  # keep the writer idle while flooding
+
+        started = time.perf_counter()
+        accepted = [writer.write(_entry("Test", "Error", str(i))) for i in range(50)]
+        assert time.perf_counter() - started < 0.5
+        assert accepted.count(True) == 5 and writer.dropped == 45
+
+        del writer._ensure_started
+        writer._ensure_started()
+        writer.stop()
+        entries = read_entries(path)
+        assert len(entries) == 6
+        assert entries[-1]["error_type"] == "LogQueueFull"
+        assert entries[-1]["message"] == "45 log entries dropped"
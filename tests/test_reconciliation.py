@@ -0,0 +1,746 @@
+import asyncio
+import json
+import time
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+from app.services.candidate_blocking import CandidateIndex, expected_dr_cr
+from app.services.rule_reconciler import match_by_rules
+from app.services.llm_executor import LLMExecutor, TokenBucket, pack_by_token_budget
+from app.services import ai_reconciliation
+from app.services.ai_reconciliation import AIReconciliationService
+from app.services.llm_cache import LLMResponseCache
+from app.cdm.models.reconciliation import (
+    LLMCacheEntry, ReconciliationJob, ReconciliationLog, ReconciliationWatermark
+)
+from app.cdm.models.transaction import VoucherHeader, ReconciliationStatus
+from app.cdm.models.external import BankStatement
+from app.cdm.models.entity import Entity
+from app.tenant.models.firm import CAFirm
+from app.tenant.models.user import UserRole
+from app.core import logger
+from app.core.database import Base
+from app.core.tenant_context import TenantContext
+from app.services import reconciliation_jobs
+from app.services.reconciliation_jobs import recover_interrupted_jobs, run_bank_reconciliation_job
+from app.services.reconciliation_writer import ReconciliationWriter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+
+def make_voucher(voucher_id, amount, voucher_date, voucher_type="Sales", ref=None):
+    return SimpleNamespace(
+        voucher_id=voucher_id,
+        voucher_type=voucher_type,
+        voucher_number=f"INV-{voucher_id}",
+        voucher_date=voucher_date,
+        total_amount=Decimal(str(amount)),
+        ref_document=ref,
+        narration=None,
+        party_ledger_id=None
+    )
+
+
+def make_statement(bank_txn_id, amount, txn_date, dr_cr="Cr", cheque_ref=None):
+    return SimpleNamespace(
+        bank_txn_id=bank_txn_id,
+        txn_date=txn_date,
+        amount=Decimal(str(amount)),
+        dr_cr=dr_cr,
+        cheque_ref=cheque_ref,
+        narration=f"Txn {bank_txn_id}"
+    )
+
+
+class TestCandidateBlocking:
+    """Test deterministic candidate blocking ahead of the LLM"""
+
+    def test_expected_dr_cr(self):
+        """Test voucher type maps to bank direction"""
+        assert expected_dr_cr("Sales") == "CR"
+        assert expected_dr_cr("Payment") == "DR"
+        assert expected_dr_cr("Journal") is None
+
+    def test_candidates_filtered_by_amount_direction_and_date(self):
+        """Test only statements within tolerance, direction and window survive"""
+        statements = [
+            make_statement("exact", "1000.00", date(2024, 5, 2)),
+            make_statement("near", "1010.00", date(2024, 5, 6)),
+            make_statement("wrong-side", "1000.00", date(2024, 5, 2), dr_cr="Dr"),
+            make_statement("too-late", "1000.00", date(2024, 7, 1)),
+            make_statement("too-big", "5000.00", date(2024, 5, 2)),
+        ]
+        index = CandidateIndex(statements, amount_tolerance=25, date_window_days=10)
+        voucher = make_voucher("1", "1000.00", date(2024, 5, 1))
+
+        ids = [s.bank_txn_id for s in index.candidates(voucher, limit=5)]
+        assert ids == ["exact", "near"]
+
+    def test_candidates_respect_limit_and_claims(self):
+        """Test the K cap and that claimed statements are not offered again"""
+        statements = [
+            make_statement(f"s{i}", "1000.00", date(2024, 5, 1 + i)) for i in range(6)
+        ]
+        index = CandidateIndex(statements, amount_tolerance=25, date_window_days=10)
+        voucher = make_voucher("1", "1000.00", date(2024, 5, 1))
+
+        first = index.candidates(voucher, limit=3)
+        assert [s.bank_txn_id for s in first] == ["s0", "s1", "s2"]
+
+        index.claim("s0")
+        assert "s0" not in [s.bank_txn_id for s in index.candidates(voucher, limit=3)]
+        assert len(index) == 5
+
+    def test_cheque_reference_ranks_first(self):
+        """Test a cheque reference match beats amount/date closeness"""
+        statements = [
+            make_statement("closest", "1000.00", date(2024, 5, 1)),
+            make_statement("by-ref", "1020.00", date(2024, 5, 9), cheque_ref="chq-4521"),
+        ]
+        index = CandidateIndex(statements, amount_tolerance=25, date_window_days=10)
+        voucher = make_voucher("1", "1000.00", date(2024, 5, 1), ref="CHQ4521")
+
+        ids = [s.bank_txn_id for s in index.candidates(voucher, limit=5)]
+        assert ids == ["by-ref", "closest"]
+
+
+class TestRuleReconciler:
+    """Test the vectorized EXACT/NEAR pre-pass"""
+
+    def match(self, vouchers, statements):
+        return match_by_rules(
+            vouchers,
+            statements,
+            exact_date_window_days=3,
+            near_date_window_days=7,
+            near_amount_tolerance=10
+        )
+
+    def test_exact_and_near_matches(self):
+        """Test exact pairs are tagged EXACT and small variances NEAR"""
+        vouchers = [
+            make_voucher("exact", "1180.00", date(2024, 6, 10)),
+            make_voucher("near", "2360.00", date(2024, 6, 10), voucher_type="Purchase"),
+            make_voucher("orphan", "999.00", date(2024, 6, 10)),
+        ]
+        statements = [
+            make_statement("b-exact", "1180.00", date(2024, 6, 12)),
+            make_statement("b-near", "2355.50", date(2024, 6, 15), dr_cr="Dr"),
+        ]
+
+        results = {m["voucher_id"]: m for m in self.match(vouchers, statements)}
+        assert set(results) == {"exact", "near"}
+        assert results["exact"]["match_rule"] == "EXACT"
+        assert results["exact"]["bank_record_id"] == "b-exact"
+        assert results["near"]["match_rule"] == "NEAR"
+        assert results["near"]["amount_variance"] == pytest.approx(-4.5)
+        assert Decimal("0.80") <= results["near"]["confidence_score"] < Decimal("0.95")
+
+    def test_each_statement_used_once(self):
+        """Test two identical vouchers cannot claim the same bank line"""
+        vouchers = [
+            make_voucher("a", "500.00", date(2024, 6, 1)),
+            make_voucher("b", "500.00", date(2024, 6, 2)),
+        ]
+        statements = [make_statement("only", "500.00", date(2024, 6, 1))]
+
+        results = self.match(vouchers, statements)
+        assert len(results) == 1
+        assert results[0]["voucher_id"] == "a"
+
+    def test_conflicting_references_block_match(self):
+        """Test different cheque numbers on both sides prevent an auto-match"""
+        vouchers = [make_voucher("a", "500.00", date(2024, 6, 1), ref="111")]
+        statements = [make_statement("b", "500.00", date(2024, 6, 1), cheque_ref="222")]
+
+        assert self.match(vouchers, statements) == []
+
+
+class FakeAsyncLLM:
+    """Async LLM stand-in that records how many calls overlap"""
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def ainvoke(self, prompt):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return SimpleNamespace(content=prompt.upper())
+
+
+class TestLLMExecutor:
+    """Test concurrent, rate-limited LLM fan-out"""
+
+    def test_fan_out_respects_concurrency_cap(self):
+        """Test calls overlap but never exceed the cap, results keep order"""
+        llm = FakeAsyncLLM()
+        executor = LLMExecutor(
+            llm,
+            max_concurrency=3,
+            timeout_seconds=5,
+            rate_limiter=TokenBucket(rate_per_second=1000, capacity=100)
+        )
+
+        async def run():
+            return await executor.map(lambda p: executor.ainvoke(p), [f"p{i}" for i in range(10)])
+
+        responses = asyncio.run(run())
+        assert [r.content for r in responses] == [f"P{i}" for i in range(10)]
+        assert 1 < llm.max_in_flight <= 3
+
+    def test_call_timeout(self):
+        """Test a slow call raises instead of hanging the batch"""
+        executor = LLMExecutor(
+            FakeAsyncLLM(delay=1),
+            max_concurrency=1,
+            timeout_seconds=0.05,
+            rate_limiter=TokenBucket(rate_per_second=1000, capacity=1)
+        )
+
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(executor.ainvoke("slow"))
+
+    def test_token_bucket_throttles_after_burst(self):
+        """Test the bucket lets a burst through, then paces calls"""
+        bucket = TokenBucket(rate_per_second=50, capacity=2)
+
+        async def run():
+            start = time.monotonic()
+            for _ in range(5):
+                await bucket.acquire()
+            return time.monotonic() - start
+
+        # 2 free tokens, then 3 more at 50/s => ~0.06s
+        assert asyncio.run(run()) >= 0.05
+
+    def test_pack_by_token_budget(self):
+        """Test packing honours both the token budget and the item cap"""
+        batches = pack_by_token_budget([5, 5, 5, 20, 1, 1, 1], cost=lambda n: n, token_budget=12, max_items=2)
+        assert batches == [[5, 5], [5], [20], [1, 1], [1]]
+
+
+class ScriptedLLM:
+    """Async LLM stand-in that replays canned responses and records prompts"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.prompts = []
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        return SimpleNamespace(content=self.responses.pop(0))
+
+
+class RecordingSession:
+    """Minimal Session stand-in that records executed bulk statements"""
+
+    def __init__(self):
+        self.executed = []
+        self.commits = 0
+
+    def execute(self, statement, params=None):
+        self.executed.append((statement.table.name, statement.is_insert, params))
+
+    def rows(self, table_name, is_insert):
+        return [
+            row for name, insert, params in self.executed
+            if name == table_name and insert == is_insert for row in params
+        ]
+
+    def commit(self):
+        self.commits += 1
+
+
+@pytest.fixture
+def recon_service(monkeypatch):
+    """Build an AIReconciliationService around a scripted LLM"""
+    def build(responses):
+        llm = ScriptedLLM(responses)
+        monkeypatch.setattr(ai_reconciliation, "make_llm", lambda **kwargs: llm)
+        monkeypatch.setattr(ai_reconciliation.settings, "LLM_CACHE_ENABLED", False)
+        context = SimpleNamespace(company_id="company-1", firm_id="firm-1", user_id="user-1")
+        service = AIReconciliationService(RecordingSession(), context)
+        service.llm_executor.rate_limiter = TokenBucket(rate_per_second=1000, capacity=100)
+        return service, llm
+    return build
+
+
+class TestBatchedReconciliation:
+    """Test rule pass + batched LLM prompts end to end"""
+
+    def test_rule_matches_skip_llm_and_residue_is_batched(self, recon_service, monkeypatch):
+        """Test only the residue reaches the LLM, in a single batched prompt"""
+        monkeypatch.setattr(ai_reconciliation.settings, "RECON_LLM_BATCH_MODE", True)
+        vouchers = [
+            make_voucher("exact", "1000.00", date(2024, 6, 1)),
+            make_voucher("fuzzy-1", "2000.00", date(2024, 6, 1)),
+            make_voucher("fuzzy-2", "3000.00", date(2024, 6, 1)),
+        ]
+        statements = [
+            make_statement("b-exact", "1000.00", date(2024, 6, 1)),
+            make_statement("b-fuzzy-1", "2020.00", date(2024, 6, 9)),
+            make_statement("b-fuzzy-2", "3020.00", date(2024, 6, 9)),
+        ]
+        response = json.dumps({
+            "fuzzy-1": [{"bank_record_id": "b-fuzzy-1", "confidence_score": 0.9, "reasoning": "close"}],
+            "fuzzy-2": [{"bank_record_id": "not-a-candidate", "confidence_score": 0.99, "reasoning": "bogus"}],
+        })
+        service, llm = recon_service([response])
+
+        results = asyncio.run(service.intelligent_bank_reconciliation(vouchers, statements))
+
+        assert len(llm.prompts) == 1
+        assert "fuzzy-1" in llm.prompts[0] and "fuzzy-2" in llm.prompts[0]
+        assert {r["voucher_id"]: r["match_rule"] for r in results} == {
+            "exact": "EXACT",
+            "fuzzy-1": "AI_LLM_Analysis",
+        }
+        assert len(service.db.rows("reconciliation_log", is_insert=True)) == 2
+        assert {
+            row["bank_txn_id"]: row["linked_voucher_id"]
+            for row in service.db.rows("bank_statements", is_insert=False)
+        } == {"b-exact": "exact", "b-fuzzy-1": "fuzzy-1"}
+        assert service.db.commits == 1
+
+
+    def test_auto_match_threshold_decides_review(self, recon_service, monkeypatch):
+        """Test matches at or below the requested threshold are flagged for review"""
+        monkeypatch.setattr(ai_reconciliation.settings, "RECON_LLM_BATCH_MODE", True)
+        vouchers = [make_voucher("exact", "1000.00", date(2024, 6, 1)),
+                    make_voucher("fuzzy-1", "2000.00", date(2024, 6, 1))]
+        statements = [make_statement("b-exact", "1000.00", date(2024, 6, 1)),
+                      make_statement("b-fuzzy-1", "2020.00", date(2024, 6, 9))]
+        response = json.dumps({
+            "fuzzy-1": [{"bank_record_id": "b-fuzzy-1", "confidence_score": 0.9, "reasoning": "close"}]
+        })
+
+        service, _ = recon_service([response, response])
+        default = asyncio.run(service.intelligent_bank_reconciliation(vouchers, statements))
+        strict = asyncio.run(service.intelligent_bank_reconciliation(
+            vouchers, statements, auto_match_threshold=0.95
+        ))
+
+        assert {r["voucher_id"]: r["requires_review"] for r in default} == {"exact": False, "fuzzy-1": False}
+        assert {r["voucher_id"]: r["requires_review"] for r in strict} == {"exact": False, "fuzzy-1": True}
+
+    def test_failed_batch_logged(self, recon_service, monkeypatch, tmp_error_log):
+        """Test an unparseable batch response is recorded in the error log with its vouchers"""
+        monkeypatch.setattr(ai_reconciliation.settings, "RECON_LLM_BATCH_MODE", True)
+        vouchers = [make_voucher("fuzzy-1", "2000.00", date(2024, 6, 1))]
+        statements = [make_statement("b-fuzzy-1", "2020.00", date(2024, 6, 9))]
+        service, _ = recon_service(["not json"])
+
+        assert asyncio.run(service.intelligent_bank_reconciliation(vouchers, statements)) == []
+        logger.shutdown_error_logger()
+        entry = json.loads(tmp_error_log.read_text().splitlines()[-1])
+        assert entry["module"] == "AIReconciliation"
+        assert entry["company_id"] == "company-1" and entry["voucher_ids"] == ["fuzzy-1"]
+
+
+    def test_failed_single_match_logged(self, recon_service, monkeypatch, tmp_error_log):
+        """Test an unparseable per-voucher response is recorded in the error log"""
+        monkeypatch.setattr(ai_reconciliation.settings, "RECON_LLM_BATCH_MODE", False)
+        vouchers = [make_voucher("fuzzy-1", "2000.00", date(2024, 6, 1))]
+        statements = [make_statement("b-fuzzy-1", "2020.00", date(2024, 6, 9))]
+        service, _ = recon_service(["not json"])
+
+        assert asyncio.run(service.intelligent_bank_reconciliation(vouchers, statements)) == []
+        logger.shutdown_error_logger()
+        entry = json.loads(tmp_error_log.read_text().splitlines()[-1])
+        assert entry["module"] == "AIReconciliation" and entry["voucher_ids"] == ["fuzzy-1"]
+
+
+@pytest.fixture
+def cache_session_factory():
+    """In-memory database holding just the LLM cache table"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    LLMCacheEntry.__table__.create(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def tmp_error_log(tmp_path, monkeypatch):
+    """Send log_error entries to a temporary error_log.jsonl instead of logs/"""
+    monkeypatch.setattr(logger.settings, "LOG_DIR", str(tmp_path))
+    logger.shutdown_error_logger()
+    yield tmp_path / "error_log.jsonl"
+    logger.shutdown_error_logger()
+
+
+class TestLLMResponseCache:
+    """Test the persistent prompt-fingerprint cache"""
+
+    def test_repeat_prompt_served_from_cache(self, cache_session_factory):
+        """Test a repeated (re-indented) prompt does not reach the model again"""
+        llm = ScriptedLLM(["first answer", "second answer"])
+        cache = LLMResponseCache("gpt-4", 0.2, company_id="c1", session_factory=cache_session_factory)
+        executor = LLMExecutor(
+            llm,
+            rate_limiter=TokenBucket(rate_per_second=1000, capacity=10),
+            cache=cache
+        )
+
+        async def run():
+            first = await executor.ainvoke("Match   this\n   voucher")
+            second = await executor.ainvoke("Match this voucher")
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert first.content == second.content == "first answer"
+        assert len(llm.prompts) == 1
+
+        db = cache_session_factory()
+        assert db.query(LLMCacheEntry).one().hit_count == 1
+        db.close()
+
+    def test_rejected_responses_not_cached(self, cache_session_factory, tmp_error_log):
+        """Test a response the caller cannot parse is not cached, and a cached one it rejects is dropped"""
+        llm = ScriptedLLM(["not json", "[1]", "[2]"])
+        cache = LLMResponseCache("gpt-4", 0.2, company_id="c1", session_factory=cache_session_factory)
+        executor = LLMExecutor(
+            llm,
+            rate_limiter=TokenBucket(rate_per_second=1000, capacity=10),
+            cache=cache
+        )
+        with pytest.raises(json.JSONDecodeError):
+            asyncio.run(executor.ainvoke_parsed("prompt", json.loads))
+        assert cache.get("prompt") is None
+
+        assert asyncio.run(executor.ainvoke_parsed("prompt", json.loads)) == [1]
+        assert cache.get("prompt").content == "[1]"
+
+        def reject(content):
+            if content == "[1]":
+                raise ValueError("stale format")
+            return json.loads(content)
+        assert asyncio.run(executor.ainvoke_parsed("prompt", reject)) == [2]
+        assert cache.get("prompt").content == "[2]"
+        assert len(llm.prompts) == 3
+
+        logger.shutdown_error_logger()
+        assert "stale format" in tmp_error_log.read_text()
+
+    def test_key_depends_on_model_temperature_and_company(self):
+        """Test cache keys never collide across models, temperatures or tenants"""
+        keys = {
+            LLMResponseCache("gpt-4", 0.2, company_id="c1").key_for("p"),
+            LLMResponseCache("gpt-4", 0.5, company_id="c1").key_for("p"),
+            LLMResponseCache("gpt-4o", 0.2, company_id="c1").key_for("p"),
+            LLMResponseCache("gpt-4", 0.2, company_id="c2").key_for("p"),
+        }
+        assert len(keys) == 4
+
+    def test_expired_entries_miss(self, cache_session_factory):
+        """Test entries past their TTL are not served"""
+        cache = LLMResponseCache("gpt-4", 0.2, ttl_seconds=1, session_factory=cache_session_factory)
+        cache.set("prompt", "answer")
+        assert cache.get("prompt").content == "answer"
+
+        db = cache_session_factory()
+        entry = db.query(LLMCacheEntry).one()
+        entry.expires_at = entry.created_at
+        db.commit()
+        db.close()
+        assert cache.get("prompt") is None
+
+    def test_lru_eviction(self, cache_session_factory):
+        """Test eviction keeps the most recently used entries"""
+        cache = LLMResponseCache("gpt-4", 0.2, max_entries=2, session_factory=cache_session_factory)
+        for prompt in ("a", "b", "c"):
+            cache.set(prompt, prompt.upper())
+            time.sleep(0.01)
+        cache.get("a")  # refresh "a" so "b" is now least recently used
+
+        db = cache_session_factory()
+        cache.evict(db)
+        db.close()
+
+        assert cache.get("b") is None
+        assert cache.get("a").content == "A"
+        assert cache.get("c").content == "C"
+
+
+@pytest.fixture
+def recon_session_factory():
+    """In-memory database with the full schema"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+class TestReconciliationJobs:
+    """Test background execution of reconciliation runs"""
+
+    def test_job_runs_to_completion_with_progress(self, recon_session_factory, monkeypatch):
+        """Test a queued job is processed and its counters/result are stored"""
+        monkeypatch.setattr(ai_reconciliation, "make_llm", lambda **kwargs: ScriptedLLM([]))
+        monkeypatch.setattr(ai_reconciliation.settings, "LLM_CACHE_ENABLED", False)
+
+        db = recon_session_factory()
+        for i in range(3):
+            db.add(VoucherHeader(
+                voucher_id=f"v{i}", company_id="c1", voucher_type="Sales",
+                voucher_date=date(2024, 6, 1 + i), voucher_number=f"INV-{i}",
+                total_amount=Decimal("100.00") * (i + 1)
+            ))
+            db.add(BankStatement(
+                bank_txn_id=f"b{i}", company_id="c1", bank_id="bank-1",
+                txn_date=date(2024, 6, 2 + i), amount=Decimal("100.00") * (i + 1),
+                dr_cr="Cr", reconciliation_status="Unmatched"
+            ))
+        db.add(ReconciliationJob(
+            job_id="job-1", company_id="c1", requested_by="u1", job_type="bank_reconciliation",
+            parameters={"start_date": "2024-06-01", "end_date": "2024-06-30", "incremental": True},
+            status="Queued"
+        ))
+        db.commit()
+        db.close()
+
+        run_bank_reconciliation_job("job-1", session_factory=recon_session_factory)
+
+        db = recon_session_factory()
+        job = db.query(ReconciliationJob).filter_by(job_id="job-1").one()
+        assert job.status == "Completed"
+        assert (job.progress_total, job.progress_done) == (3, 3)
+        assert job.result["matched_count"] == 3
+        assert job.processing_duration is not None
+        assert db.query(ReconciliationLog).filter_by(match_rule="EXACT").count() == 3
+        watermark = db.query(ReconciliationWatermark).filter_by(company_id="c1").one()
+        assert watermark.last_job_id == "job-1"
+        db.close()
+
+    def test_job_passes_auto_match_threshold(self, recon_session_factory, monkeypatch):
+        """Test the threshold stored with the job reaches the reconciliation run"""
+        monkeypatch.setattr(ai_reconciliation, "make_llm", lambda **kwargs: ScriptedLLM([]))
+        seen = {}
+
+        async def reconcile(self, vouchers, statements, progress_callback=None, auto_match_threshold=None):
+            seen["threshold"] = auto_match_threshold
+            return []
+        monkeypatch.setattr(AIReconciliationService, "intelligent_bank_reconciliation", reconcile)
+
+        db = recon_session_factory()
+        db.add(ReconciliationJob(
+            job_id="job-3", company_id="c1", job_type="bank_reconciliation", status="Queued",
+            parameters={"start_date": "2024-06-01", "end_date": "2024-06-30", "auto_match_threshold": 0.7}
+        ))
+        db.commit()
+        db.close()
+
+        run_bank_reconciliation_job("job-3", session_factory=recon_session_factory)
+        assert seen == {"threshold": 0.7}
+
+    def test_failed_job_records_error(self, recon_session_factory, monkeypatch, tmp_error_log):
+        """Test an exception inside the job marks it Failed with details"""
+        def broken_llm(**kwargs):
+            raise RuntimeError("OPENAI_API_KEY is not set")
+        monkeypatch.setattr(ai_reconciliation, "make_llm", broken_llm)
+
+        db = recon_session_factory()
+        db.add(ReconciliationJob(
+            job_id="job-2", company_id="c1", job_type="bank_reconciliation",
+            parameters={"start_date": "2024-06-01", "end_date": "2024-06-30"}, status="Queued"
+        ))
+        db.commit()
+        db.close()
+
+        run_bank_reconciliation_job("job-2", session_factory=recon_session_factory)
+
+        db = recon_session_factory()
+        job = db.query(ReconciliationJob).filter_by(job_id="job-2").one()
+        assert job.status == "Failed"
+        assert job.error_details["error_type"] == "RuntimeError"
+        db.close()
+
+        logger.shutdown_error_logger()
+        assert "OPENAI_API_KEY is not set" in tmp_error_log.read_text()
+
+    def test_startup_recovery(self, recon_session_factory, monkeypatch):
+        """Test queued jobs are resubmitted and only jobs with a stale heartbeat are failed"""
+        submitted = []
+        monkeypatch.setattr(reconciliation_jobs, "get_job_executor",
+                            lambda: SimpleNamespace(submit=lambda func, job_id: submitted.append(job_id)))
+        now = datetime.now(timezone.utc)
+        db = recon_session_factory()
+        for job_id, status, heartbeat in [
+            ("queued", "Queued", None),
+            ("stale", "Processing", now - timedelta(hours=2)),
+            ("live", "Processing", now),
+            ("done", "Completed", None),
+        ]:
+            db.add(ReconciliationJob(job_id=job_id, company_id="c1", status=status, heartbeat_at=heartbeat,
+                                     parameters={"start_date": "2024-06-01", "end_date": "2024-06-30"}))
+        db.commit()
+        db.close()
+
+        assert recover_interrupted_jobs(recon_session_factory) == {"requeued": 1, "failed": 1}
+        assert submitted == ["queued"]
+
+        db = recon_session_factory()
+        statuses = {job.job_id: job.status for job in db.query(ReconciliationJob)}
+        assert statuses == {"queued": "Queued", "stale": "Failed", "live": "Processing", "done": "Completed"}
+        assert db.query(ReconciliationJob).filter_by(job_id="stale").one().error_details["error_type"] == "Interrupted"
+        db.close()
+
+        # A job resubmitted by two processes runs once
+        run_bank_reconciliation_job("live", session_factory=recon_session_factory)
+        db = recon_session_factory()
+        assert db.query(ReconciliationJob).filter_by(job_id="live").one().status == "Processing"
+        db.close()
+
+
+OLD = datetime(2024, 6, 1, tzinfo=timezone.utc)
+NEW = datetime(2024, 7, 1, tzinfo=timezone.utc)
+
+
+class TestIncrementalReconciliation:
+    """Test linked-pair skipping and watermark-based delta loading"""
+
+    @pytest.fixture
+    def service(self, recon_session_factory, monkeypatch):
+        monkeypatch.setattr(ai_reconciliation, "make_llm", lambda **kwargs: ScriptedLLM([]))
+        monkeypatch.setattr(ai_reconciliation.settings, "LLM_CACHE_ENABLED", False)
+        db = recon_session_factory()
+        yield AIReconciliationService(db, TenantContext(firm_id=None, company_id="c1", user_id="u1"))
+        db.close()
+
+    @staticmethod
+    def add_voucher(db, voucher_id, amount, voucher_date, created_at=OLD):
+        db.add(VoucherHeader(
+            voucher_id=voucher_id, company_id="c1", voucher_type="Sales",
+            voucher_date=voucher_date, voucher_number=f"INV-{voucher_id}",
+            total_amount=Decimal(amount), created_at=created_at
+        ))
+
+    @staticmethod
+    def add_statement(db, bank_txn_id, amount, txn_date, created_at=OLD):
+        db.add(BankStatement(
+            bank_txn_id=bank_txn_id, company_id="c1", bank_id="bank-1",
+            txn_date=txn_date, amount=Decimal(amount), dr_cr="Cr",
+            reconciliation_status="Unmatched", created_at=created_at
+        ))
+
+    def test_matches_are_linked_and_skipped_next_run(self, service):
+        """Test a match writes the link back and the pair is not reloaded"""
+        db = service.db
+        self.add_voucher(db, "v1", "500.00", date(2024, 5, 10))
+        self.add_statement(db, "b1", "500.00", date(2024, 5, 11))
+        db.commit()
+
+        vouchers, statements = service.load_bank_reconciliation_inputs(date(2024, 4, 1), date(2025, 3, 31))
+        asyncio.run(service.intelligent_bank_reconciliation(vouchers, statements))
+
+        statement = db.get(BankStatement, "b1")
+        voucher = db.get(VoucherHeader, "v1")
+        assert statement.linked_voucher_id == "v1"
+        assert statement.reconciliation_status == "Matched"
+        assert voucher.reconciliation_status == ReconciliationStatus.AUTO_MATCHED
+        assert voucher.reconciliation_source == "EXACT"
+
+        assert service.load_bank_reconciliation_inputs(date(2024, 4, 1), date(2025, 3, 31)) == ([], [])
+
+    def test_incremental_loads_only_deltas(self, service):
+        """Test only new vouchers and old vouchers near new statements are loaded"""
+        db = service.db
+        self.add_voucher(db, "stale", "100.00", date(2024, 4, 5))
+        self.add_voucher(db, "old-near-new-stmt", "200.00", date(2024, 9, 1))
+        self.add_voucher(db, "new", "300.00", date(2024, 12, 1), created_at=NEW)
+        self.add_statement(db, "old-stmt", "999.00", date(2024, 4, 6))
+        self.add_statement(db, "new-stmt", "200.00", date(2024, 9, 3), created_at=NEW)
+        db.commit()
+        service.advance_watermark(datetime(2024, 6, 15, tzinfo=timezone.utc))
+        db.commit()
+
+        vouchers, statements = service.load_bank_reconciliation_inputs(
+            date(2024, 4, 1), date(2025, 3, 31), incremental=True
+        )
+        assert {v.voucher_id for v in vouchers} == {"old-near-new-stmt", "new"}
+        assert {s.bank_txn_id for s in statements} == {"new-stmt"}
+
+        full, _ = service.load_bank_reconciliation_inputs(date(2024, 4, 1), date(2025, 3, 31))
+        assert len(full) == 3
+
+
+class TestReconciliationWriter:
+    """Test the chunked bulk write path for reconciliation outcomes"""
+
+    def test_flush_writes_logs_and_links_in_chunks(self, recon_session_factory):
+        """Test logs are inserted and both sides updated across several chunks"""
+        db = recon_session_factory()
+        for i in range(5):
+            TestIncrementalReconciliation.add_voucher(db, f"v{i}", "100.00", date(2024, 5, 1))
+            TestIncrementalReconciliation.add_statement(db, f"b{i}", "100.00", date(2024, 5, 1))
+        db.commit()
+
+        writer = ReconciliationWriter("c1", chunk_size=2)
+        for i in range(5):
+            match = {"bank_record_id": f"b{i}", "confidence_score": Decimal("0.9"), "reasoning": "rule"}
+            writer.stage(f"v{i}", f"b{i}", match, "EXACT", requires_review=(i == 4))
+        assert len(writer) == 5
+        writer.flush(db)
+        db.commit()
+        assert len(writer) == 0
+
+        logs = db.query(ReconciliationLog).all()
+        assert len(logs) == 5 and all(log.recon_id for log in logs)
+        assert db.get(BankStatement, "b0").linked_voucher_id == "v0"
+        assert db.get(BankStatement, "b4").reconciliation_status == "Near_Match"
+        assert db.get(VoucherHeader, "v0").reconciliation_status == ReconciliationStatus.AUTO_MATCHED
+        assert db.get(VoucherHeader, "v4").reconciliation_status == ReconciliationStatus.UNMATCHED
+        assert db.get(VoucherHeader, "v4").reconciliation_confidence == Decimal("0.9000")
+        db.close()
+
+
+class TestAsyncAIRoutes:
+    """Test the AI router end to end on committed async sessions"""
+
+    @pytest.fixture
+    def staff_headers(self, committed_db, seed_user):
+        db = committed_db()
+        db.add(CAFirm(firm_id="f1", firm_name="One"))
+        db.add(Entity(company_id="c1", firm_id="f1", company_name="One Ltd",
+                      financial_year_start=date(2024, 4, 1), financial_year_end=date(2025, 3, 31)))
+        db.add(ReconciliationLog(company_id="c1", source_table="voucher_header", target_table="bank_statements",
+                                 source_record_id="v1", status="Matched", match_score=Decimal("0.9500"),
+                                 created_at=datetime(2024, 6, 15, tzinfo=timezone.utc)))
+        db.commit()
+        db.close()
+        _, headers = seed_user(UserRole.CA_STAFF, firm_id="f1")
+        return {**headers, "X-Company-ID": "c1"}
+
+    def test_reports_and_anomalies_read_through_async_session(self, client, staff_headers, monkeypatch):
+        """Test insights see the period's logs and anomaly analysis short-circuits without vouchers"""
+        llm = ScriptedLLM(["# Reconciliation Report"])
+        monkeypatch.setattr(ai_reconciliation, "make_llm", lambda **kwargs: llm)
+        monkeypatch.setattr(ai_reconciliation.settings, "LLM_CACHE_ENABLED", False)
+
+        report = client.get("/api/v1/ai/reports/reconciliation-insights",
+                            params={"start_date": "2024-06-01", "end_date": "2024-06-30"}, headers=staff_headers)
+        assert report.status_code == 200
+        assert report.json()["report_content"] == "# Reconciliation Report"
+        assert '"status": "Matched"' in llm.prompts[0]
+
+        anomalies = client.post("/api/v1/ai/analyze/anomalies", json={"start_date": "2024-06-01"},
+                                headers=staff_headers)
+        assert anomalies.status_code == 200
+        assert anomalies.json()["risk_level"] == "none"
+        assert len(llm.prompts) == 1
+
+        assert client.get("/api/v1/ai/jobs/missing", headers=staff_headers).status_code == 404
@@ -3,6 +3,9 @@ import pytest
 from fastapi import status
 import uuid
 
+from app.tenant.models.firm import CAFirm
+from app.tenant.models.user import User, UserRole
+
 
 class TestUserCRUD:
     """Test user CRUD operations"""
@@ -334,4 +337,28 @@ class TestUserValidation:
         }
         
         response = client.post("/api/v1/tenant/users", json=user_data, headers=auth_headers_firm_admin)
-        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
\ No newline at end of file
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+class TestAsyncUserRoutes:
+    """Test the user router end to end on committed async sessions"""
+
+    def test_soft_delete_within_own_firm_only(self, client, committed_db, seed_user):
+        """Test a firm admin deactivates their own staff but cannot see another firm's users"""
+        db = committed_db()
+        db.add_all([CAFirm(firm_id="f1", firm_name="One"), CAFirm(firm_id="f2", firm_name="Two")])
+        db.commit()
+        db.close()
+        _, admin_headers = seed_user(UserRole.CA_FIRM_ADMIN, firm_id="f1")
+        staff_id, _ = seed_user(UserRole.CA_STAFF, firm_id="f1")
+        outsider_id, _ = seed_user(UserRole.CA_STAFF, firm_id="f2")
+
+        missing = client.delete(f"/api/v1/tenant/users/{outsider_id}", headers=admin_headers)
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+        response = client.delete(f"/api/v1/tenant/users/{staff_id}", headers=admin_headers)
+        assert response.status_code == status.HTTP_200_OK
+        db = committed_db()
+        assert db.get(User, staff_id).is_active is False
+        assert db.get(User, outsider_id).is_active is True
+        db.close()